@@ -1,15 +1,27 @@
 import random
 import json
+import hashlib
+import math
 import re
 import numpy as np
 from datetime import datetime, timedelta, date, time
-from collections import defaultdict
+from collections import defaultdict, OrderedDict, deque
+import copy
+from functools import wraps
 import logging
 import mysql.connector
 from mysql.connector import Error
 from contextlib import contextmanager
 import io
-from itertools import groupby, cycle
+import csv
+import os
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from itertools import groupby, cycle, islice
+from heapq import merge
+from bisect import bisect_left
+from mysql.connector import pooling
 
 class DBConfig:
     DB_HOST = '127.0.0.1'
@@ -17,6 +29,11 @@ class DBConfig:
     DB_PASSWORD = ''
     DB_NAME = 'reclassify'
     SECRET_KEY = 'nmims_timetable_secret_key_2025'
+    # mysql.connector caps a single pool at 32 connections
+    DB_POOL_SIZE = 10
+    DB_POOL_TIMEOUT = 5
+    # Worker processes for bulk generation of independent section groups
+    GENERATION_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,37 +45,700 @@ db_config = {
     'database': DBConfig.DB_NAME
 }
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(
-            host=db_config['host'],
-            user=db_config['user'],
-            password=db_config['password'],
-            database=db_config['database'],
+class PooledConnection:
+    """
+    Thin proxy around a connection borrowed from ConnectionPool. `close()` hands the
+    connection back to the pool instead of closing the socket, and it can be used
+    as a context manager like a plain mysql.connector connection.
+    """
+    def __init__(self, pool, cnx):
+        self._pool = pool
+        self._cnx = cnx
+        self._borrowed_at = datetime.now()
+
+    def __getattr__(self, name):
+        return getattr(self._cnx, name)
+
+    def close(self):
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool._release(cnx, self._borrowed_at)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+class ConnectionPool:
+    """
+    Shared MySQL connection pool with a bounded checkout timeout, a health check
+    on borrow and basic usage metrics.
+    """
+    def __init__(self, config, pool_size=DBConfig.DB_POOL_SIZE, checkout_timeout=DBConfig.DB_POOL_TIMEOUT, pool_name='reclassify_pool'):
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name=pool_name,
+            pool_size=pool_size,
+            pool_reset_session=True,
             autocommit=False,
             charset='utf8mb4',
-            collation='utf8mb4_unicode_ci'
+            collation='utf8mb4_unicode_ci',
+            **config
         )
-        if conn.is_connected():
-            return conn
-        else:
-            print("Failed to establish database connection")
-            return None
+        # MySQLConnectionPool raises immediately when exhausted; the slots turn that into a bounded
+        # wait, handed out first come, first served (see _acquire_slot)
+        self._free_slots = pool_size
+        self._waiting = deque()
+        self._slot_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._metrics = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'reconnects': 0,
+            'errors': 0,
+            'in_use': 0,
+            'peak_in_use': 0,
+            'total_wait_seconds': 0.0,
+            'total_hold_seconds': 0.0,
+        }
+
+    def get_connection(self):
+        """Borrows a healthy connection, waiting up to `checkout_timeout` seconds for a free one."""
+        wait_start = datetime.now()
+        if not self._acquire_slot(self.checkout_timeout):
+            with self._lock:
+                self._metrics['timeouts'] += 1
+            raise pooling.PoolError(f"Timed out after {self.checkout_timeout}s waiting for a database connection")
+
+        cnx = None
+        try:
+            cnx = self._pool.get_connection()
+            if not cnx.is_connected():
+                cnx.reconnect(attempts=2, delay=0)
+                with self._lock:
+                    self._metrics['reconnects'] += 1
+        except Error:
+            if cnx is not None:
+                # Hand the broken connection back, or the underlying pool loses a slot for good;
+                # the next borrower reconnects it
+                try:
+                    cnx.close()
+                except Error as e:
+                    logger.error(f"Error returning connection to pool: {e}", exc_info=True)
+            self._release_slot()
+            with self._lock:
+                self._metrics['errors'] += 1
+            raise
+
+        with self._lock:
+            self._metrics['checkouts'] += 1
+            self._metrics['in_use'] += 1
+            self._metrics['peak_in_use'] = max(self._metrics['peak_in_use'], self._metrics['in_use'])
+            self._metrics['total_wait_seconds'] += (datetime.now() - wait_start).total_seconds()
+        return PooledConnection(self, cnx)
+
+    def _release(self, cnx, borrowed_at):
+        try:
+            cnx.close()
+        except Error as e:
+            logger.error(f"Error returning connection to pool: {e}", exc_info=True)
+        finally:
+            with self._lock:
+                self._metrics['in_use'] -= 1
+                self._metrics['total_hold_seconds'] += (datetime.now() - borrowed_at).total_seconds()
+            self._release_slot()
+
+    def _acquire_slot(self, timeout):
+        """
+        Takes a checkout slot, waiting up to `timeout` seconds behind earlier callers.
+        A plain semaphore lets a thread that just released a connection take it straight
+        back ahead of those already waiting, which starves some requests under load.
+        """
+        with self._slot_lock:
+            if self._free_slots and not self._waiting:
+                self._free_slots -= 1
+                return True
+            turn = threading.Event()
+            self._waiting.append(turn)
+        if turn.wait(timeout):
+            return True
+        with self._slot_lock:
+            # A slot may have been handed over just as the wait timed out
+            if turn.is_set():
+                return True
+            self._waiting.remove(turn)
+        return False
+
+    def _release_slot(self):
+        with self._slot_lock:
+            if self._waiting:
+                # Straight to the longest waiter, so nobody can take the slot in between
+                self._waiting.popleft().set()
+            else:
+                self._free_slots += 1
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+        checkouts = metrics['checkouts'] or 1
+        metrics['pool_size'] = self.pool_size
+        metrics['checkout_timeout'] = self.checkout_timeout
+        metrics['avg_wait_ms'] = round(metrics.pop('total_wait_seconds') * 1000 / checkouts, 3)
+        metrics['avg_hold_ms'] = round(metrics.pop('total_hold_seconds') * 1000 / checkouts, 3)
+        return metrics
+
+_connection_pool = None
+_connection_pool_pid = None
+_connection_pool_lock = threading.Lock()
+
+def get_connection_pool():
+    """Returns the process-wide pool, creating it lazily (and again after a fork)."""
+    global _connection_pool, _connection_pool_pid
+    if _connection_pool is None or _connection_pool_pid != os.getpid():
+        with _connection_pool_lock:
+            if _connection_pool is None or _connection_pool_pid != os.getpid():
+                _connection_pool = ConnectionPool(db_config)
+                _connection_pool_pid = os.getpid()
+    return _connection_pool
+
+def get_db_connection():
+    try:
+        return get_connection_pool().get_connection()
     except Error as e:
         print(f"Error connecting to MySQL: {e}")
         return None
 
+def get_pool_metrics():
+    return get_connection_pool().metrics()
+
+class SlotOccupancy:
+    """
+    Tracks section, faculty and room busy-ness as integer bitmasks indexed by a
+    precomputed (day, timeslot) ordinal, so finding a free block is a few bitwise ops.
+    Registered faculty additionally carry a forbidden-slot mask (unavailable days and
+    windows) and running daily/weekly hour counters checked against their limits.
+    """
+    DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+
+    def __init__(self, all_timeslots):
+        slots_by_day = defaultdict(list)
+        for ts in all_timeslots:
+            if isinstance(ts['start_time'], timedelta):
+                ts['start_time'] = (datetime.min + ts['start_time']).time()
+            if isinstance(ts['end_time'], timedelta):
+                ts['end_time'] = (datetime.min + ts['end_time']).time()
+            slots_by_day[ts['day_of_week']].append(ts)
+
+        # Ordinals run day by day in start-time order, so consecutive bits within
+        # a day are consecutive periods.
+        self.slot_keys = []
+        self.slot_times = []
+        self.ordinal_of = {}
+        self.day_masks = []
+        same_day_next = 0   # bit i set when ordinal i+1 is the next period on the same day
+        touching_next = 0   # ...and it starts exactly when ordinal i ends
+        for day_index, day_of_week in enumerate(self.DAYS_ORDER):
+            day_slots = sorted(slots_by_day[day_of_week], key=lambda x: x['start_time'])
+            day_mask = 0
+            for position, ts in enumerate(day_slots):
+                ordinal = len(self.slot_keys)
+                slot_key = (day_index, ts['timeslot_id'])
+                self.slot_keys.append(slot_key)
+                self.slot_times.append((ts['start_time'], ts['end_time']))
+                self.ordinal_of[slot_key] = ordinal
+                day_mask |= 1 << ordinal
+                if position + 1 < len(day_slots):
+                    same_day_next |= 1 << ordinal
+                    if ts['end_time'] == day_slots[position + 1]['start_time']:
+                        touching_next |= 1 << ordinal
+            self.day_masks.append(day_mask)
+
+        self.full_mask = (1 << len(self.slot_keys)) - 1
+        self._same_day_next = same_day_next
+        self._touching_next = touching_next
+        self._start_masks = {}
+
+        self.section = {}
+        self.faculty = {}
+        self.room = {}
+
+        self.faculty_forbidden = {}
+        self.faculty_limits = {}
+        self.faculty_day_hours = {}
+        self.faculty_week_hours = {}
+
+    def register_faculty(self, faculty_id, constraints, unavailability=()):
+        """
+        Precomputes the slots a faculty member may never take and their hour limits.
+        `unavailability` is an iterable of (day_of_week, start_time, end_time).
+        """
+        forbidden = 0
+        available_days = constraints.get('available_days')
+        if available_days:
+            for day_index, day_of_week in enumerate(self.DAYS_ORDER):
+                if day_of_week not in available_days:
+                    forbidden |= self.day_masks[day_index]
+
+        for day_of_week, start_time, end_time in unavailability:
+            if day_of_week not in self.DAYS_ORDER:
+                continue
+            day_mask = self.day_masks[self.DAYS_ORDER.index(day_of_week)]
+            for ordinal in self.iter_bits(day_mask):
+                slot_start, slot_end = self.slot_times[ordinal]
+                if slot_start < end_time and start_time < slot_end:
+                    forbidden |= 1 << ordinal
+
+        weekly_limits = [limit for limit in (constraints.get('max_hours_per_week'), constraints.get('max_weekly_hours')) if limit is not None]
+        self.faculty_forbidden[faculty_id] = forbidden
+        self.faculty_limits[faculty_id] = (constraints.get('max_hours_per_day'), min(weekly_limits) if weekly_limits else None)
+        self.faculty_day_hours.setdefault(faculty_id, [0] * len(self.DAYS_ORDER))
+        self.faculty_week_hours.setdefault(faculty_id, 0)
+
+    def is_registered(self, faculty_id):
+        return faculty_id in self.faculty_limits
+
+    def faculty_blocked(self, faculty_id, duration):
+        """Mask of slots the faculty member cannot take a `duration`-period block in, from constraints alone."""
+        blocked = self.faculty_forbidden.get(faculty_id, 0)
+        max_per_day, max_per_week = self.faculty_limits.get(faculty_id, (None, None))
+        if max_per_week is not None and self.faculty_week_hours[faculty_id] + duration > max_per_week:
+            return self.full_mask
+        if max_per_day is not None:
+            for day_index, hours in enumerate(self.faculty_day_hours[faculty_id]):
+                if hours + duration > max_per_day:
+                    blocked |= self.day_masks[day_index]
+        return blocked
+
+    def _valid_starts(self, duration, continuous):
+        """Bitmask of ordinals where a block of `duration` periods fits inside one day."""
+        cache_key = (duration, continuous)
+        starts = self._start_masks.get(cache_key)
+        if starts is None:
+            link = self._touching_next if continuous else self._same_day_next
+            starts = self.full_mask
+            for k in range(duration - 1):
+                starts &= link >> k
+            self._start_masks[cache_key] = starts
+        return starts
+
+    def free_starts(self, section_id, faculty_id, room_id, duration, continuous=False, enforce_constraints=True):
+        """Returns a bitmask of start ordinals where the whole block is free for all three resources."""
+        busy = self.section.get(section_id, 0) | self.faculty.get(faculty_id, 0) | self.room.get(room_id, 0)
+        if enforce_constraints:
+            busy |= self.faculty_blocked(faculty_id, duration)
+        free = ~busy & self.full_mask
+        starts = self._valid_starts(duration, continuous) & free
+        for k in range(1, duration):
+            starts &= free >> k
+        return starts
+
+    def block_mask(self, start, duration):
+        return ((1 << duration) - 1) << start
+
+    def block(self, start, duration):
+        """Returns the (day_idx, timeslot_id) keys covered by a block."""
+        return self.slot_keys[start:start + duration]
+
+    def occupy(self, section_id, faculty_id, room_id, start, duration):
+        mask = self.block_mask(start, duration)
+        self.section[section_id] = self.section.get(section_id, 0) | mask
+        self.faculty[faculty_id] = self.faculty.get(faculty_id, 0) | mask
+        self.room[room_id] = self.room.get(room_id, 0) | mask
+        if faculty_id in self.faculty_limits:
+            day_index = self.slot_keys[start][0]
+            self.faculty_day_hours[faculty_id][day_index] += duration
+            self.faculty_week_hours[faculty_id] += duration
+
+    def release(self, section_id, faculty_id, room_id, start, duration):
+        """Undoes an occupy() of the same block."""
+        mask = ~self.block_mask(start, duration)
+        self.section[section_id] &= mask
+        self.faculty[faculty_id] &= mask
+        self.room[room_id] &= mask
+        if faculty_id in self.faculty_limits:
+            day_index = self.slot_keys[start][0]
+            self.faculty_day_hours[faculty_id][day_index] -= duration
+            self.faculty_week_hours[faculty_id] -= duration
+
+    @staticmethod
+    def popcount(mask):
+        return bin(mask).count('1')
+
+    @staticmethod
+    def iter_bits(mask):
+        while mask:
+            low_bit = mask & -mask
+            yield low_bit.bit_length() - 1
+            mask ^= low_bit
+
+class SoftScore:
+    """
+    Soft-constraint penalty of the placements in a SlotOccupancy, split into small
+    components so a move only re-evaluates the few it touches:
+    idle periods inside a section's or a faculty member's day, the same subject more
+    than once a day, and a subject's lab sessions spread over several rooms.
+    """
+    def __init__(self, occupancy, weights):
+        self.occupancy = occupancy
+        self.weights = weights
+        self.subject_day_counts = defaultdict(int)
+        self.lab_room_counts = defaultdict(lambda: defaultdict(int))
+
+    def _day_gaps(self, mask, day_index):
+        day_mask = mask & self.occupancy.day_masks[day_index]
+        if not day_mask:
+            return 0
+        low = (day_mask & -day_mask).bit_length() - 1
+        high = day_mask.bit_length() - 1
+        return high - low + 1 - self.occupancy.popcount(day_mask)
+
+    def add(self, section_id, assignment, room_id, start):
+        day_index = self.occupancy.slot_keys[start][0]
+        self.subject_day_counts[(section_id, assignment['batch_subject_id'], day_index)] += 1
+        if assignment['is_lab']:
+            self.lab_room_counts[(section_id, assignment['batch_subject_id'])][room_id] += 1
+
+    def remove(self, section_id, assignment, room_id, start):
+        day_index = self.occupancy.slot_keys[start][0]
+        self.subject_day_counts[(section_id, assignment['batch_subject_id'], day_index)] -= 1
+        if assignment['is_lab']:
+            rooms = self.lab_room_counts[(section_id, assignment['batch_subject_id'])]
+            rooms[room_id] -= 1
+            if not rooms[room_id]:
+                del rooms[room_id]
+
+    def component(self, key):
+        kind = key[0]
+        if kind == 'section_gap':
+            return self.weights['section_gap'] * self._day_gaps(self.occupancy.section.get(key[1], 0), key[2])
+        if kind == 'faculty_gap':
+            return self.weights['faculty_gap'] * self._day_gaps(self.occupancy.faculty.get(key[1], 0), key[2])
+        if kind == 'same_subject_day':
+            return self.weights['same_subject_day'] * max(self.subject_day_counts[key[1:]] - 1, 0)
+        return self.weights['lab_room_change'] * max(len(self.lab_room_counts[key[1:]]) - 1, 0)
+
+    def keys_for(self, section_id, assignment, start):
+        day_index = self.occupancy.slot_keys[start][0]
+        keys = {
+            ('section_gap', section_id, day_index),
+            ('faculty_gap', assignment['faculty_id'], day_index),
+            ('same_subject_day', section_id, assignment['batch_subject_id'], day_index),
+        }
+        if assignment['is_lab']:
+            keys.add(('lab_room_change', section_id, assignment['batch_subject_id']))
+        return keys
+
+    def score(self, keys):
+        return sum(self.component(key) for key in keys)
+
+    def breakdown(self, keys):
+        totals = defaultdict(int)
+        for key in keys:
+            totals[key[0]] += self.component(key)
+        return dict(totals)
+
+# Bumped whenever a reference table changes; snapshots built against older versions are rebuilt.
+_reference_versions = defaultdict(int)
+_reference_versions_lock = threading.Lock()
+
+def invalidate_reference_data(table_name):
+    """Marks cached reference data for `table_name` as stale in this process."""
+    with _reference_versions_lock:
+        _reference_versions[table_name] += 1
+
+def get_reference_version(table_name):
+    return _reference_versions[table_name]
+
+def _to_time(value):
+    if isinstance(value, timedelta):
+        return (datetime.min + value).time()
+    return value
+
+def semester_week_count(start_date, end_date):
+    """Number of timetable weeks from start_date to end_date, counting a part week as a week."""
+    return (end_date - start_date).days // 7 + 1
+
+class SemesterCalendar:
+    """
+    The teaching dates of a semester: start_date..end_date minus the holidays that
+    affect the timetable. A generated timetable stores one row per weekly session,
+    dated in the first teaching week; the calendar turns those rows into dated
+    occurrences when they are read.
+    """
+    def __init__(self, start_date, end_date, holidays=()):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.holidays = frozenset(holidays)
+
+    def first_date(self, day_of_week):
+        """Date of the first `day_of_week` on or after the semester start."""
+        offset = (DAYS_OF_WEEK.index(day_of_week) - self.start_date.weekday()) % 7
+        return self.start_date + timedelta(days=offset)
+
+    def week_number(self, day):
+        return (day - self.start_date).days // 7 + 1
+
+    def dates(self, day_of_week, start_date=None, end_date=None):
+        """Yields the teaching dates on `day_of_week`, optionally limited to start_date..end_date."""
+        first = max(self.start_date, start_date) if start_date else self.start_date
+        last = min(self.end_date, end_date) if end_date else self.end_date
+        day = first + timedelta(days=(DAYS_OF_WEEK.index(day_of_week) - first.weekday()) % 7)
+        while day <= last:
+            if day not in self.holidays:
+                yield day
+            day += timedelta(days=7)
+
+def timetable_occurrence_key(entry):
+    """Sort key of a dated timetable occurrence: (date, start time, entry_id)."""
+    return entry['entry_date'], _to_time(entry['start_time']), entry['entry_id']
+
+def expand_weekly_entries(entries, start_date=None, end_date=None):
+    """
+    Expands weekly timetable rows into one occurrence per teaching date, limited to
+    start_date..end_date when given, in timetable_occurrence_key order. Rows carry
+    `entry_date` (their stored date), `day_of_week` and the calendar_start/
+    calendar_end of their generation log, and optionally the effective_from/
+    effective_until dates they are limited to. Rows of logs saved without a
+    calendar occur only on their stored date. Occurrences are copies of their row; per-date
+    state is overlaid from timetable_exception by TimetableGenerator.resolve_timetable.
+    """
+    return list(iter_weekly_entries(entries, start_date, end_date))
+
+def iter_weekly_entries(entries, start_date=None, end_date=None):
+    """
+    Lazy expand_weekly_entries: each row's dates are generated as they are consumed
+    and merged in timetable_occurrence_key order, so reading the first n occurrences
+    of a window costs n plus one pending occurrence per row.
+    """
+    calendar_bounds = [(entry['calendar_start'], entry['calendar_end']) for entry in entries if entry.get('calendar_start')]
+    holidays = ()
+    if calendar_bounds:
+        # Loaded for the whole semester span, so every window of it shares one cached lookup
+        holidays = load_holidays(min(bound[0] for bound in calendar_bounds), max(bound[1] for bound in calendar_bounds))
+    calendars = {bounds: SemesterCalendar(bounds[0], bounds[1], holidays) for bounds in set(calendar_bounds)}
+
+    def occurrences_of(entry):
+        stored_date = entry['entry_date']
+        first = max(filter(None, (start_date, entry.get('effective_from'))), default=None)
+        last = min(filter(None, (end_date, entry.get('effective_until'))), default=None)
+        calendar = calendars.get((entry.get('calendar_start'), entry.get('calendar_end')))
+        if calendar:
+            dates = calendar.dates(entry['day_of_week'], first, last)
+        elif stored_date and (not first or stored_date >= first) and (not last or stored_date <= last):
+            dates = [stored_date]
+        else:
+            dates = []
+        for occurrence_date in dates:
+            occurrence = dict(entry)
+            occurrence['entry_date'] = occurrence_date
+            if calendar:
+                occurrence['week_number'] = calendar.week_number(occurrence_date)
+            yield occurrence
+
+    # A row's dates ascend, so its occurrences are already in key order
+    return merge(*(occurrences_of(entry) for entry in entries), key=timetable_occurrence_key)
+
+class ProblemSnapshot:
+    """
+    Read-only, pre-indexed copy of the reference tables the generator needs
+    (timeslots, rooms, faculty unavailability and faculty constraints), shared
+    across generations until one of those tables changes.
+    """
+    TABLES = ('timeslots', 'rooms', 'faculty_unavailability', 'faculty_constraints')
+    # Upper bound on staleness for edits made through another process
+    MAX_AGE = timedelta(minutes=10)
+
+    def __init__(self, versions, timeslots, rooms, unavailability):
+        self.versions = versions
+        self.loaded_at = datetime.now()
+
+        for ts in timeslots:
+            ts['start_time'] = _to_time(ts['start_time'])
+            ts['end_time'] = _to_time(ts['end_time'])
+        self.timeslots = timeslots
+        self.timeslots_by_day = defaultdict(list)
+        for ts in sorted(timeslots, key=lambda x: x['start_time']):
+            self.timeslots_by_day[ts['day_of_week']].append(ts)
+
+        self.rooms = rooms
+        self.rooms_by_id = {room['room_id']: room for room in rooms}
+        self.rooms_by_type = defaultdict(list)
+        for room in sorted(rooms, key=lambda x: (x['capacity'] or 0, x['room_id'])):
+            self.rooms_by_type[room['room_type']].append(room)
+        self.room_capacities_by_type = {
+            room_type: [room['capacity'] or 0 for room in type_rooms] for room_type, type_rooms in self.rooms_by_type.items()
+        }
+
+        # Kept as raw rows keyed by (faculty_id, day) for existing callers, plus sorted intervals
+        self.faculty_unavailability = defaultdict(list)
+        self.unavailability_intervals = defaultdict(list)
+        for ua in unavailability:
+            key = (ua['faculty_id'], ua['day_of_week'])
+            self.faculty_unavailability[key].append(ua)
+            self.unavailability_intervals[key].append((_to_time(ua['start_time']), _to_time(ua['end_time'])))
+        for intervals in self.unavailability_intervals.values():
+            intervals.sort()
+
+        self._faculty_constraints = {}
+        self._lock = threading.Lock()
+
+    def is_current(self):
+        if datetime.now() - self.loaded_at > self.MAX_AGE:
+            return False
+        return all(get_reference_version(table) == version for table, version in self.versions.items())
+
+    def faculty_constraints_for(self, faculty_ids, loader):
+        """Returns {faculty_id: constraints}, calling `loader(missing_ids)` once for faculty not cached yet."""
+        with self._lock:
+            missing = [faculty_id for faculty_id in faculty_ids if faculty_id not in self._faculty_constraints]
+        loaded = loader(missing) if missing else {}
+        with self._lock:
+            self._faculty_constraints.update(loaded)
+            return {faculty_id: self._faculty_constraints[faculty_id] for faculty_id in faculty_ids}
+
+_problem_snapshot = None
+_problem_snapshot_lock = threading.Lock()
+
+def get_problem_snapshot(execute_query):
+    """Returns the shared ProblemSnapshot, reloading it through `execute_query` when stale."""
+    global _problem_snapshot
+    snapshot = _problem_snapshot
+    if snapshot is not None and snapshot.is_current():
+        return snapshot
+    with _problem_snapshot_lock:
+        if _problem_snapshot is None or not _problem_snapshot.is_current():
+            logger.info("Loading reference data snapshot for timetable generation.")
+            # Versions are read before querying so an edit made mid-load forces another reload
+            versions = {table: get_reference_version(table) for table in ProblemSnapshot.TABLES}
+            _problem_snapshot = ProblemSnapshot(
+                versions,
+                execute_query("SELECT * FROM timeslots WHERE is_active = 1"),
+                execute_query("SELECT * FROM rooms WHERE is_active = 1"),
+                execute_query("SELECT * FROM faculty_unavailability")
+            )
+        return _problem_snapshot
+
+class ReferenceCache:
+    """
+    Bounded LRU cache for small reference lookups (schools, departments, years...).
+    Each entry records the versions of the tables it was read from and is dropped
+    when one of them is invalidated or when it is older than `ttl`.
+    """
+    def __init__(self, max_entries=256, ttl=timedelta(minutes=5)):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'expired': 0, 'evictions': 0}
+
+    def get_or_load(self, key, tables, loader):
+        """Returns the cached value for `key`, calling `loader()` on a miss. Callers get their own copy."""
+        now = datetime.now()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, versions, loaded_at = entry
+                if now - loaded_at > self.ttl:
+                    self._stats['expired'] += 1
+                    del self._entries[key]
+                elif any(get_reference_version(table) != version for table, version in versions.items()):
+                    self._stats['stale'] += 1
+                    del self._entries[key]
+                else:
+                    self._stats['hits'] += 1
+                    self._entries.move_to_end(key)
+                    return copy.deepcopy(value)
+            self._stats['misses'] += 1
+
+        # Versions are read before loading so an edit made mid-load is not cached as current
+        versions = {table: get_reference_version(table) for table in tables}
+        value = loader()
+        with self._lock:
+            self._entries[key] = (value, versions, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return copy.deepcopy(value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['max_entries'] = self.max_entries
+        stats['ttl_seconds'] = self.ttl.total_seconds()
+        return stats
+
+reference_cache = ReferenceCache()
+
+def cached_reference(*tables):
+    """Caches a lookup helper in `reference_cache`, keyed by its name and arguments."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args):
+            return reference_cache.get_or_load((func.__name__,) + args, tables, lambda: func(*args))
+        return wrapper
+    return decorator
+
+def get_reference_cache_stats():
+    return reference_cache.stats()
+
 class TimetableGenerator:
     """
     Generates and manages timetables based on various constraints using a heuristic-based approach.
     """
-    def __init__(self):
+    # Bulk runs smaller than this are solved in-process even when workers are configured
+    PARALLEL_MIN_SECTIONS = 20
+
+    # Backtracking search used when greedy placement leaves sessions unplaced; 0 disables it
+    SEARCH_TIME_BUDGET_SECONDS = 2.0
+    SEARCH_NODE_LIMIT = 200000
+
+    # Simulated-annealing pass over soft constraints after placement; 0 iterations disables it
+    OPTIMIZE_ITERATIONS = 3000
+    OPTIMIZE_TIME_BUDGET_SECONDS = 0.5
+
+    # Portfolio mode: seeded attempts per section, capped, and the wall-clock budget for all of them
+    PORTFOLIO_ATTEMPTS = 8
+    PORTFOLIO_MAX_ATTEMPTS = 32
+    PORTFOLIO_TIME_BUDGET_SECONDS = 30.0
+
+    # Seed used when none is given, so identical input reproduces the stored timetable
+    DEFAULT_SEED = 0
+    # Bump when a change to the solver makes stored results differ from a rerun
+    PROBLEM_HASH_VERSION = 1
+
+    def __init__(self, search_time_budget=None, optimize_iterations=None, optimize_time_budget=None, seed=None):
         logger.info("TimetableGenerator initialized with heuristic-based algorithm.")
         self.problem_data = {}
-        # Penalty weights are no longer used by the heuristic, but are kept for logging purposes
+        self.seed = self.DEFAULT_SEED if seed is None else seed
+        self.rng = random.Random(self.seed)
+        # Set by portfolio runs; the search and optimizer stop early once it is set
+        self.stop_event = None
+        self.search_time_budget = self.SEARCH_TIME_BUDGET_SECONDS if search_time_budget is None else search_time_budget
+        self.optimize_iterations = self.OPTIMIZE_ITERATIONS if optimize_iterations is None else optimize_iterations
+        self.optimize_time_budget = self.OPTIMIZE_TIME_BUDGET_SECONDS if optimize_time_budget is None else optimize_time_budget
+        self.solver_stats = {}
+        self.calendar = self._semester_calendar(None, 1)
+        # Unplaced sessions are hard violations; the rest weight the soft score used by the optimizer
         self.PENALTY_HARD = 1000
         self.PENALTY_MEDIUM = 50
         self.PENALTY_SOFT = 1
+        self.SOFT_WEIGHTS = {
+            'section_gap': self.PENALTY_SOFT * 5,
+            'faculty_gap': self.PENALTY_SOFT,
+            'same_subject_day': self.PENALTY_MEDIUM,
+            'lab_room_change': self.PENALTY_MEDIUM,
+        }
 
     def __del__(self):
         pass
@@ -109,27 +789,61 @@ class TimetableGenerator:
             logger.error(f"Unexpected error in _execute_dml: {e}", exc_info=True)
             return False
 
-    def save_generation_log(self, section_id, log_data):
-        """Save timetable generation log to the database and return the log_id."""
-        query = """
-            INSERT INTO timetable_generation_log
-            (section_id, status, constraints_violated, total_slots_assigned, total_slots_required, generation_time_seconds)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        status = log_data.get('generation_status', 'Failed')
-        constraints_violated = json.dumps(log_data.get('constraints_violated', []))
-        total_slots_assigned = log_data.get('total_slots_assigned', 0)
-        total_slots_required = log_data.get('total_slots_required', 0)
-        generation_time_seconds = log_data.get('generation_time_seconds', 0)
+    GENERATION_LOG_INSERT = """
+        INSERT INTO timetable_generation_log
+        (section_id, status, constraints_violated, total_slots_assigned, total_slots_required, generation_time_seconds, solver_stats,
+         calendar_start, calendar_end, problem_hash)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
 
-        params = (
+    TIMETABLE_INSERT = """
+        INSERT INTO timetable
+        (section_id, faculty_id, batch_subject_id, timeslot_id, day_of_week, room_id,
+         subsection_id, week_number, date, is_rescheduled, is_lab_session, log_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+
+    # current_timetable points each section at the log whose rows are in `timetable`
+    CURRENT_TIMETABLE_UPSERT = """
+        INSERT INTO current_timetable (section_id, log_id, status)
+        VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE log_id = VALUES(log_id), status = VALUES(status), updated_at = NOW()
+    """
+
+    def _generation_log_params(self, section_id, log_data):
+        return (
             section_id,
-            status,
-            constraints_violated,
-            total_slots_assigned,
-            total_slots_required,
-            generation_time_seconds
+            log_data.get('generation_status', 'Failed'),
+            json.dumps(log_data.get('constraints_violated', [])),
+            log_data.get('total_slots_assigned', 0),
+            log_data.get('total_slots_required', 0),
+            log_data.get('generation_time_seconds', 0),
+            json.dumps(log_data.get('solver_stats') or {}),
+            log_data.get('calendar_start'),
+            log_data.get('calendar_end'),
+            log_data.get('problem_hash')
         )
+
+    def _timetable_insert_rows(self, log_id, raw_timetable):
+        return [(
+            entry['section_id'],
+            entry['faculty_id'],
+            entry['batch_subject_id'],
+            entry['timeslot_id'],
+            entry['day_of_week'],
+            entry['room_id'],
+            entry['subsection_id'],
+            entry['week_number'],
+            entry['date'],
+            entry.get('is_rescheduled', 0),
+            entry.get('is_lab_session', 0),
+            log_id
+        ) for entry in raw_timetable]
+
+    def save_generation_log(self, section_id, log_data):
+        """Save timetable generation log to the database and return the log_id."""
+        query = self.GENERATION_LOG_INSERT
+        params = self._generation_log_params(section_id, log_data)
         try:
             log_id = self._execute_dml(query, params)
             if log_id:
@@ -147,30 +861,10 @@ class TimetableGenerator:
         """
         try:
             logger.info(f"Attempting to save timetable entries for log_id {log_id}")
-            insert_data = []
-            for entry in timetable_data['raw_timetable']:
-                insert_data.append((
-                    entry['section_id'],
-                    entry['faculty_id'],
-                    entry['batch_subject_id'],
-                    entry['timeslot_id'],
-                    entry['day_of_week'],
-                    entry['room_id'],
-                    entry['subsection_id'],
-                    entry['week_number'],
-                    entry['date'],
-                    entry.get('is_rescheduled', 0),
-                    entry.get('is_lab_session', 0),
-                    log_id
-                ))
+            insert_data = self._timetable_insert_rows(log_id, timetable_data['raw_timetable'])
 
             if insert_data:
-                query = """
-                    INSERT INTO timetable
-                    (section_id, faculty_id, batch_subject_id, timeslot_id, day_of_week, room_id,
-                     subsection_id, week_number, date, is_rescheduled, is_lab_session, log_id)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """
+                query = self.TIMETABLE_INSERT
                 self._execute_dml(query, insert_data, many=True)
                 logger.info(f"Successfully saved timetable entries for log_id {log_id}")
             else:
@@ -193,6 +887,49 @@ class TimetableGenerator:
             logger.error(f"Failed to delete old timetable for section {section_id}: {e}", exc_info=True)
             return False
 
+    def save_batch_results(self, section_results):
+        """
+        Replaces the timetables of several sections in a single transaction and moves
+        their current_timetable pointers to the new logs.
+        `section_results` is a list of (section_id, generation_log, raw_timetable) tuples.
+        Returns a {section_id: log_id} dict, or None if the transaction was rolled back.
+        """
+        section_ids = [section_id for section_id, _, _ in section_results]
+        if not section_ids:
+            return {}
+
+        log_ids = {}
+        conn = get_db_connection()
+        if not conn:
+            return None
+        cursor = conn.cursor(buffered=True)
+        try:
+            placeholders = ', '.join(['%s'] * len(section_ids))
+            cursor.execute(f"DELETE FROM timetable WHERE section_id IN ({placeholders})", tuple(section_ids))
+
+            insert_data = []
+            pointers = []
+            for section_id, generation_log, raw_timetable in section_results:
+                log_params = self._generation_log_params(section_id, generation_log)
+                cursor.execute(self.GENERATION_LOG_INSERT, log_params)
+                log_ids[section_id] = cursor.lastrowid
+                pointers.append((section_id, cursor.lastrowid, log_params[1]))
+                insert_data.extend(self._timetable_insert_rows(cursor.lastrowid, raw_timetable))
+
+            if insert_data:
+                cursor.executemany(self.TIMETABLE_INSERT, insert_data)
+            cursor.executemany(self.CURRENT_TIMETABLE_UPSERT, pointers)
+            conn.commit()
+            logger.info(f"Saved {len(insert_data)} timetable entries for {len(section_ids)} sections in one transaction.")
+            return log_ids
+        except mysql.connector.Error as e:
+            conn.rollback()
+            logger.error(f"Database error saving batch timetables: {e}", exc_info=True)
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
     def _capture_completed_sessions(self, section_id):
         """
         Captures the count of completed sessions (entries with date <= today)
@@ -238,50 +975,26 @@ class TimetableGenerator:
 
     def get_faculty_constraints(self, faculty_id):
         """Retrieves specific constraints for a given faculty member."""
-        query = "SELECT * FROM faculty_constraints WHERE faculty_id = %s"
-        constraints = self._execute_query(query, (faculty_id,), fetch_one=True, dictionary_cursor=True)
-        
-        if not constraints:
-            return {
-                'max_hours_per_week': 20,
-                'max_hours_per_day': 4,
-                'is_visiting_faculty': False,
-                'available_days': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'],
-                'min_weekly_hours': 0,
-                'max_weekly_hours': 20
-            }
+        return self.load_faculty_constraints_map([faculty_id])[faculty_id]
 
-        available_days_raw = constraints.get('available_days')
-        if isinstance(available_days_raw, bytes):
-            try:
-                available_days_raw = available_days_raw.decode('utf-8')
-            except UnicodeDecodeError:
-                logger.error(f"Failed to decode available_days for faculty {faculty_id}: {available_days_raw}")
-                available_days_raw = None
-
-        if available_days_raw:
-            try:
-                constraints['available_days'] = json.loads(available_days_raw)
-                if not isinstance(constraints['available_days'], list):
-                    constraints['available_days'] = None
-            except json.JSONDecodeError:
-                logger.warning(f"Invalid JSON in available_days for faculty {faculty_id}: {available_days_raw}. Setting to None.")
-                constraints['available_days'] = None
-        else:
-            constraints['available_days'] = None
-        
-        defaults = {
-            'max_hours_per_week': 20,
-            'max_hours_per_day': 4,
-            'is_visiting_faculty': 0,
-            'available_days': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'],
-            'min_weekly_hours': 0,
-            'max_weekly_hours': 20
-        }
-        for key, default_value in defaults.items():
-            if key not in constraints or constraints[key] is None:
-                constraints[key] = default_value
-        return constraints
+    def load_faculty_constraints_map(self, faculty_ids):
+        """
+        Returns {faculty_id: constraints} for every requested faculty in one query,
+        with defaults applied and falling back to the defaults for faculty without a row.
+        """
+        constraints_by_faculty = {}
+        for row in load_faculty_constraints(faculty_ids):
+            # faculty_id is not unique in faculty_constraints; the oldest row wins
+            constraints_by_faculty.setdefault(row['faculty_id'], {
+                key: row[key] for key in FACULTY_CONSTRAINT_DEFAULTS
+            })
+        for faculty_id in faculty_ids:
+            if faculty_id not in constraints_by_faculty:
+                constraints_by_faculty[faculty_id] = {
+                    key: list(value) if isinstance(value, list) else value
+                    for key, value in FACULTY_CONSTRAINT_DEFAULTS.items()
+                }
+        return constraints_by_faculty
 
     def get_all_generation_logs(self, status_filter=None):
         """Retrieves a list of all timetable generation logs."""
@@ -296,11 +1009,8 @@ class TimetableGenerator:
             JOIN batch_departments bd ON b.batch_id = bd.batch_id
             JOIN departments d ON bd.department_id = d.department_id
             JOIN schools sch ON d.school_id = sch.school_id
-            WHERE tgl.log_id IN (
-                SELECT MAX(log_id)
-                FROM timetable_generation_log
-                GROUP BY section_id
-            )
+            JOIN current_timetable ct ON ct.log_id = tgl.log_id
+            WHERE 1=1
         """
         params = []
         if status_filter:
@@ -406,21 +1116,26 @@ class TimetableGenerator:
             logger.error(f"Error loading specific timetable for log_id {log_id}: {str(e)}", exc_info=True)
             return {"error": f"Unexpected error: {str(e)}"}
            
+    RAW_TIMETABLE_COLUMNS = """
+        SELECT t.*, ts.day_of_week, ts.start_time as timeslot_start_time, ts.end_time as timeslot_end_time,
+               s.subject_id, s.name AS subject_name, s.subject_code, s.has_lab AS is_lab_session,
+               u.name AS faculty_name, r.room_number, sec.name as section_name,
+               bs.batch_subject_id, b.year as academic_year_int, b.semester as semester_int
+    """
+    # Joins from timetable `t` to everything the raw entries need
+    RAW_TIMETABLE_JOINS = """
+        JOIN timeslots ts ON t.timeslot_id = ts.timeslot_id
+        JOIN batch_subjects bs ON t.batch_subject_id = bs.batch_subject_id
+        JOIN subjects s ON bs.subject_id = s.subject_id
+        JOIN users u ON t.faculty_id = u.user_id
+        LEFT JOIN rooms r ON t.room_id = r.room_id
+        JOIN sections sec ON t.section_id = sec.section_id
+        JOIN batches b ON sec.batch_id = b.batch_id
+    """
+
     def load_specific_timetable_raw(self, log_id):
         """Loads a previously saved timetable for display using its log_id."""
-        query = """
-            SELECT t.*, ts.day_of_week, ts.start_time as timeslot_start_time, ts.end_time as timeslot_end_time,
-                   s.subject_id, s.name AS subject_name, s.subject_code, s.has_lab AS is_lab_session,
-                   u.name AS faculty_name, r.room_number, sec.name as section_name,
-                   bs.batch_subject_id, b.year as academic_year_int, b.semester as semester_int
-            FROM timetable t
-            JOIN timeslots ts ON t.timeslot_id = ts.timeslot_id
-            JOIN batch_subjects bs ON t.batch_subject_id = bs.batch_subject_id
-            JOIN subjects s ON bs.subject_id = s.subject_id
-            JOIN users u ON t.faculty_id = u.user_id
-            LEFT JOIN rooms r ON t.room_id = r.room_id
-            JOIN sections sec ON t.section_id = sec.section_id
-            JOIN batches b ON sec.batch_id = b.batch_id
+        query = self.RAW_TIMETABLE_COLUMNS + "FROM timetable t" + self.RAW_TIMETABLE_JOINS + """
             WHERE t.log_id = %s
             ORDER BY t.date, ts.start_time
         """
@@ -428,45 +1143,202 @@ class TimetableGenerator:
         rows = self._execute_query(query, (log_id,), dictionary_cursor=True)
         if not rows:
             return []
+        return [self._raw_timetable_entry(row) for row in rows]
 
-        timetable_data_for_processing = []
-        for row in rows:
-            start_time_obj = row['timeslot_start_time']
-            end_time_obj = row['timeslot_end_time']
-            
-            # This part correctly converts timedelta from the DB to datetime.time
-            if isinstance(start_time_obj, timedelta):
-                start_time_obj = (datetime.min + start_time_obj).time()
-            
-            if isinstance(end_time_obj, timedelta):
-                end_time_obj = (datetime.min + end_time_obj).time()
+    def load_latest_timetables_raw(self, section_ids, statuses=('Success', 'Partial')):
+        """
+        Yields (section_id, log_id, raw_entries) for each section whose current
+        timetable has a status in `statuses`, in section_id order. All rows come back
+        from one query joined through current_timetable and read with an unbuffered
+        cursor, so only one section is held in memory at a time.
+        Sections without a matching timetable are skipped.
+        """
+        if not section_ids:
+            return
+        section_placeholders = ','.join(['%s'] * len(section_ids))
+        status_placeholders = ','.join(['%s'] * len(statuses))
+        query = self.RAW_TIMETABLE_COLUMNS + """
+            FROM current_timetable ct
+            JOIN timetable t ON t.section_id = ct.section_id AND t.log_id = ct.log_id
+        """ + self.RAW_TIMETABLE_JOINS + f"""
+            WHERE ct.section_id IN ({section_placeholders}) AND ct.status IN ({status_placeholders})
+            ORDER BY t.section_id, t.date, ts.start_time
+        """
 
-            timetable_data_for_processing.append({
-                'entry_id': row['entry_id'],
-                'section_id': row['section_id'],
-                'section_name': row['section_name'],
-                'faculty_id': row['faculty_id'],
-                'faculty_name': row['faculty_name'],
-                'subject_id': row['subject_id'],
-                'subject_name': row['subject_name'],
-                'subject_code': row['subject_code'],
-                'batch_subject_id': row['batch_subject_id'],
-                'timeslot_id': row['timeslot_id'],
-                'day_of_week': row['day_of_week'],
-                'room_id': row['room_id'],
-                'room_number': row.get('room_number', 'N/A'),
-                'date': row['date'],
-                'is_rescheduled': row.get('is_rescheduled', 0),
-                'is_lab_session': row['is_lab_session'],
-                'subsection_id': row.get('subsection_id'),
-                'week_number': row['week_number'],
-                'is_rescheduled': row['is_rescheduled'],
-                'academic_year_int': row['academic_year_int'],
-                'semester_int': row['semester_int'],
-                'start_time': start_time_obj,
-                'end_time': end_time_obj
-            })
-        return timetable_data_for_processing
+        with get_db_connection() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                cursor.execute(query, tuple(section_ids) + tuple(statuses))
+                for (section_id, log_id), rows in groupby(cursor, key=lambda row: (row['section_id'], row['log_id'])):
+                    yield section_id, log_id, [self._raw_timetable_entry(row) for row in rows]
+            except mysql.connector.Error as e:
+                logger.error(f"Database error loading latest timetables for sections {section_ids}: {e}", exc_info=True)
+                raise
+            finally:
+                # An abandoned generator leaves rows unread on the connection; drain them
+                # before it goes back to the pool
+                try:
+                    cursor.fetchall()
+                except mysql.connector.Error:
+                    pass
+                cursor.close()
+
+    def _raw_timetable_entry(self, row):
+        start_time_obj = row['timeslot_start_time']
+        end_time_obj = row['timeslot_end_time']
+
+        # This part correctly converts timedelta from the DB to datetime.time
+        if isinstance(start_time_obj, timedelta):
+            start_time_obj = (datetime.min + start_time_obj).time()
+
+        if isinstance(end_time_obj, timedelta):
+            end_time_obj = (datetime.min + end_time_obj).time()
+
+        return {
+            'entry_id': row['entry_id'],
+            'section_id': row['section_id'],
+            'section_name': row['section_name'],
+            'faculty_id': row['faculty_id'],
+            'faculty_name': row['faculty_name'],
+            'subject_id': row['subject_id'],
+            'subject_name': row['subject_name'],
+            'subject_code': row['subject_code'],
+            'batch_subject_id': row['batch_subject_id'],
+            'timeslot_id': row['timeslot_id'],
+            'day_of_week': row['day_of_week'],
+            'room_id': row['room_id'],
+            'room_number': row.get('room_number', 'N/A'),
+            'date': row['date'],
+            'is_lab_session': row['is_lab_session'],
+            'subsection_id': row.get('subsection_id'),
+            'week_number': row['week_number'],
+            'is_rescheduled': row['is_rescheduled'],
+            'academic_year_int': row['academic_year_int'],
+            'semester_int': row['semester_int'],
+            'start_time': start_time_obj,
+            'end_time': end_time_obj
+        }
+
+    # Weekly template rows of each section's current timetable, plus the rows an
+    # incremental repair end-dated, with the semester span they repeat over;
+    # resolve_timetable appends its filters
+    TIMETABLE_TEMPLATE_QUERY = """
+        SELECT t.entry_id, t.section_id, t.subsection_id, t.batch_subject_id, t.faculty_id, t.room_id, t.timeslot_id,
+               t.date AS entry_date, t.day_of_week, t.is_lab_session, ts.start_time, ts.end_time,
+               s.subject_id, s.name AS subject_name, u.name AS faculty_name, sec.name AS section_name,
+               r.room_number, b.year, b.semester, tgl.calendar_start, tgl.calendar_end,
+               t.effective_from, t.effective_until
+        FROM current_timetable ct
+        JOIN timetable t ON t.section_id = ct.section_id AND (t.log_id = ct.log_id OR t.effective_until IS NOT NULL)
+        JOIN timetable_generation_log tgl ON tgl.log_id = ct.log_id
+        JOIN timeslots ts ON t.timeslot_id = ts.timeslot_id
+        JOIN batch_subjects bs ON t.batch_subject_id = bs.batch_subject_id
+        JOIN subjects s ON bs.subject_id = s.subject_id
+        JOIN users u ON t.faculty_id = u.user_id
+        JOIN sections sec ON t.section_id = sec.section_id
+        JOIN batches b ON sec.batch_id = b.batch_id
+        LEFT JOIN rooms r ON t.room_id = r.room_id
+    """
+
+    # Occurrences resolved per exception query when no page limit sets the size
+    RESOLVE_CHUNK_SIZE = 1000
+
+    def resolve_timetable(self, start_date=None, end_date=None, section_id=None, subsection_id=None,
+                          faculty_id=None, department_id=None, year=None, semester=None,
+                          statuses=('Success', 'Partial'), after=None, limit=None):
+        """
+        Resolves the current timetables into dated occurrences for start_date..end_date
+        (either bound may be None). The weekly template rows in `timetable` are
+        expanded over their semester calendar and the timetable_exception rows for
+        those dates are overlaid: is_cancelled, is_completed, is_rescheduled, the
+        cancellation's `status_reason` and a substitute's faculty_id/faculty_name.
+        `faculty_id` keeps the occurrences that faculty teaches on the day, so
+        substitutions count; `subsection_id` keeps whole-section rows as well.
+        Returns the occurrences in timetable_occurrence_key order; `after` (a
+        timetable_occurrence_key) and `limit` select one page of them, and only that
+        page is expanded and overlaid.
+        """
+        return list(islice(self.iter_resolved_timetable(
+            start_date, end_date, section_id=section_id, subsection_id=subsection_id, faculty_id=faculty_id,
+            department_id=department_id, year=year, semester=semester, statuses=statuses,
+            after=after, chunk_size=limit
+        ), limit))
+
+    def iter_resolved_timetable(self, start_date=None, end_date=None, section_id=None, subsection_id=None,
+                                faculty_id=None, department_id=None, year=None, semester=None,
+                                statuses=('Success', 'Partial'), after=None, chunk_size=None):
+        """
+        Generator behind resolve_timetable, for readers that stream the occurrences.
+        The template rows are read up front; occurrences are then expanded lazily and
+        their exceptions loaded `chunk_size` occurrences at a time, so memory and
+        exception reads grow with what is consumed rather than with the window.
+        """
+        faculty_id = int(faculty_id) if faculty_id is not None else None
+        if after is not None and (start_date is None or after[0] > start_date):
+            # Dates before the cursor's are never expanded
+            start_date = after[0]
+        query = self.TIMETABLE_TEMPLATE_QUERY
+        if department_id is not None:
+            query += " JOIN batch_departments bd ON b.batch_id = bd.batch_id"
+        query += f" WHERE ct.status IN ({','.join(['%s'] * len(statuses))})"
+        params = list(statuses)
+        exception_bounds, exception_params = "", []
+        if start_date:
+            query += " AND (tgl.calendar_end >= %s OR tgl.calendar_start IS NULL AND t.date >= %s)"
+            params += [start_date, start_date]
+            exception_bounds += " AND te.exception_date >= %s"; exception_params.append(start_date)
+        if end_date:
+            query += " AND (tgl.calendar_start <= %s OR tgl.calendar_start IS NULL AND t.date <= %s)"
+            params += [end_date, end_date]
+            exception_bounds += " AND te.exception_date <= %s"; exception_params.append(end_date)
+        if department_id is not None: query += " AND bd.department_id = %s"; params.append(department_id)
+        if year is not None: query += " AND b.year = %s"; params.append(year)
+        if semester is not None: query += " AND b.semester = %s"; params.append(semester)
+        if section_id is not None: query += " AND t.section_id = %s"; params.append(section_id)
+        if subsection_id is not None:
+            query += " AND (t.subsection_id = %s OR t.subsection_id IS NULL)"; params.append(subsection_id)
+        if faculty_id is not None:
+            query += f"""
+                AND (t.faculty_id = %s OR t.entry_id IN (
+                    SELECT te.entry_id FROM timetable_exception te WHERE te.faculty_id = %s{exception_bounds}
+                ))
+            """
+            params += [faculty_id, faculty_id] + exception_params
+
+        template_rows = self._execute_query(query, tuple(params))
+        if not template_rows:
+            return
+
+        occurrences = iter_weekly_entries(template_rows, start_date, end_date)
+        if after is not None:
+            occurrences = (occurrence for occurrence in occurrences if timetable_occurrence_key(occurrence) > after)
+        chunk_size = max(1, chunk_size or self.RESOLVE_CHUNK_SIZE)
+        while True:
+            chunk = list(islice(occurrences, chunk_size))
+            if not chunk:
+                return
+            entry_ids = sorted({occurrence['entry_id'] for occurrence in chunk})
+            exception_rows = self._execute_query(f"""
+                SELECT te.entry_id, te.exception_date, te.is_cancelled, te.is_completed, te.is_rescheduled,
+                       te.faculty_id, u.name AS faculty_name, c.reason AS status_reason
+                FROM timetable_exception te
+                LEFT JOIN users u ON te.faculty_id = u.user_id
+                LEFT JOIN cancellations c ON te.cancellation_id = c.cancellation_id
+                WHERE te.entry_id IN ({','.join(['%s'] * len(entry_ids))})
+                  AND te.exception_date >= %s AND te.exception_date <= %s
+            """, tuple(entry_ids) + (chunk[0]['entry_date'], chunk[-1]['entry_date']))
+            exceptions = {(row['entry_id'], row['exception_date']): row for row in exception_rows or []}
+
+            for occurrence in chunk:
+                exception = exceptions.get((occurrence['entry_id'], occurrence['entry_date']))
+                for flag in ('is_cancelled', 'is_completed', 'is_rescheduled'):
+                    occurrence[flag] = exception[flag] if exception else 0
+                occurrence['status_reason'] = exception['status_reason'] if exception and exception['is_cancelled'] else None
+                if exception and exception['faculty_id']:
+                    occurrence['faculty_id'] = exception['faculty_id']
+                    occurrence['faculty_name'] = exception['faculty_name']
+                if faculty_id is None or occurrence['faculty_id'] == faculty_id:
+                    yield occurrence
 
     def format_timetable_by_day(self, timetable):
         """Organizes the raw timetable data into a dictionary grouped by day of the week."""
@@ -533,124 +1405,1385 @@ class TimetableGenerator:
         
         return grid, timeslot_labels
 
-    def generate_timetable_for_section(self, section_id, start_date=None, semester_weeks=1):
+    def generate_timetable_for_section(self, section_id, start_date=None, semester_weeks=1):
+        """
+        Main function to generate a timetable using a heuristic-based approach.
+        """
+        generation_start = datetime.now()
+        logger.info(f"Starting heuristic timetable generation for section {section_id}")
+        
+        try:
+            self.calendar = self._semester_calendar(start_date, semester_weeks)
+            data = self._fetch_problem_data(section_id)
+            if "error" in data:
+                return data
+
+            problem_hash = self._problem_hash([data])
+            cached = self._cached_results({section_id: data}, {section_id: problem_hash})
+            if section_id in cached:
+                logger.info(f"Section {section_id} is unchanged since log {cached[section_id]['log_id']}; returning the stored timetable.")
+                result = cached[section_id]
+                result['grid'], result['timeslot_labels'] = self.format_timetable_grid(result['raw_timetable'], data['all_timeslots'])
+                result['generation_seconds'] = (datetime.now() - generation_start).total_seconds()
+                result['generated_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                return result
+
+            attempt = self._solve_single_section(section_id, data)
+            if "error" in attempt:
+                return attempt
+
+            # --- Finalize and save results ---
+            generation_log = self._build_generation_log(
+                attempt['raw_timetable'], attempt['violations'], (datetime.now() - generation_start).total_seconds()
+            )
+            generation_log['problem_hash'] = None if self._stopped_on_time(attempt['solver_stats']) else problem_hash
+            return self._save_single_result(section_id, data, generation_log, attempt['raw_timetable'], generation_start)
+
+        except Exception as e:
+            logger.error(f"Unexpected error in heuristic generation: {str(e)}", exc_info=True)
+            return {"error": f"Unexpected error: {str(e)}"}     
+    
+    def _solve_single_section(self, section_id, data):
+        """
+        Solves one section against its own occupancy with the current seed. Does not
+        touch the database. Returns the entries, violations and solver stats, or an error.
+        """
+        self._reseed([section_id])
+        self.problem_data = self._prepare_problem_data(data)
+        if "error" in self.problem_data:
+            return self.problem_data
+
+        # Section, faculty and room busy-ness as bitmasks over (day, timeslot) ordinals
+        occupancy = SlotOccupancy(self.problem_data['all_timeslots'].values())
+        final_timetable, violations = self._schedule_assignments(occupancy)
+        return {'raw_timetable': final_timetable, 'violations': violations, 'solver_stats': self.solver_stats}
+
+    def _save_single_result(self, section_id, data, generation_log, final_timetable, generation_start):
+        # Old rows, the new log and entries, and the current_timetable pointer change together
+        log_ids = self.save_batch_results([(section_id, generation_log, final_timetable)])
+        if log_ids is None:
+            return {"error": "Failed to save the generated timetable. No changes were made."}
+
+        grid, timeslot_labels = self.format_timetable_grid(final_timetable, self.problem_data['all_timeslots'].values())
+
+        return {
+            'status': generation_log['generation_status'],
+            'section_id': section_id,
+            'section_name': data['section_info']['name'],
+            'batch_id': data['section_info']['batch_id'],
+            'department': data['section_info']['department_name'],
+            'generation_log': generation_log,
+            'raw_timetable': final_timetable,
+            'grid': grid,
+            'timeslot_labels': timeslot_labels,
+            'generation_seconds': (datetime.now() - generation_start).total_seconds(),
+            'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'start_date': self.calendar.start_date,
+            'end_date': self.calendar.end_date,
+            'log_id': log_ids[section_id]
+        }
+
+    def generate_timetable_portfolio(self, section_id, start_date=None, semester_weeks=1, attempts=None, time_budget=None, max_workers=None):
+        """
+        Runs `attempts` independent attempts of the single-section solver, seeded seed,
+        seed + 1, ..., in worker processes (default: one per core) and saves only the best:
+        most slots placed, then fewest violations, then lowest soft penalty.
+        Once an attempt is perfect, or `time_budget` seconds (None for PORTFOLIO_TIME_BUDGET_SECONDS,
+        negative is an error) have passed and at least one attempt has finished, attempts not yet
+        started are cancelled and running ones stop at their next search/optimizer budget check.
+        The winner is what generate_timetable_for_section returns for its seed, so unless it
+        was cut short its log carries that seed's problem_hash.
+        """
+        generation_start = datetime.now()
+        attempts = max(1, min(attempts or self.PORTFOLIO_ATTEMPTS, self.PORTFOLIO_MAX_ATTEMPTS))
+        if time_budget is None:
+            time_budget = self.PORTFOLIO_TIME_BUDGET_SECONDS
+        elif time_budget < 0:
+            return {"error": f"time_budget must not be negative, got {time_budget}."}
+        deadline = generation_start + timedelta(seconds=time_budget)
+        logger.info(f"Starting portfolio generation for section {section_id}: {attempts} attempts, {time_budget}s budget")
+
+        try:
+            self.calendar = self._semester_calendar(start_date, semester_weeks)
+            data = self._fetch_problem_data(section_id)
+            if "error" in data:
+                return data
+
+            seeds = [self.seed + index for index in range(attempts)]
+            solver_limits = self._solver_limits()
+            finished = []
+            failed = 0
+            worker_count = min(attempts, max_workers or os.cpu_count() or 1)
+            if worker_count > 1:
+                # spawn, not fork: the parent may be a web worker holding threads and pooled sockets
+                context = multiprocessing.get_context('spawn')
+                stop_event = context.Event()
+                with ProcessPoolExecutor(max_workers=worker_count, mp_context=context,
+                                         initializer=_init_portfolio_worker, initargs=(stop_event,)) as executor:
+                    futures = [
+                        executor.submit(solve_section_attempt, section_id, data, self.calendar, self.faculty_constraints, seed, solver_limits)
+                        for seed in seeds
+                    ]
+                    pending = set(futures)
+                    perfect = False
+                    while pending and not perfect:
+                        # Like the sequential path, wait for one attempt to finish whatever the
+                        # budget, so even a zero budget ends with a result
+                        timeout = max(0.0, (deadline - datetime.now()).total_seconds()) if finished else None
+                        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                        if not done:
+                            logger.info(f"Portfolio time budget of {time_budget}s reached for section {section_id}")
+                            break
+                        for future in done:
+                            try:
+                                finished.append(future.result())
+                            except Exception as e:
+                                failed += 1
+                                logger.error(f"Portfolio attempt for section {section_id} failed: {e}", exc_info=True)
+                                continue
+                            perfect = perfect or self._attempt_is_perfect(finished[-1][1])
+                    stop_event.set()
+                    cancelled = sum(1 for future in pending if future.cancel())
+                    # Attempts already running wind down at their next budget check; keep what they found
+                    for future in pending:
+                        if future.cancelled():
+                            continue
+                        try:
+                            finished.append(future.result())
+                        except Exception as e:
+                            failed += 1
+                            logger.error(f"Portfolio attempt for section {section_id} failed: {e}", exc_info=True)
+            else:
+                cancelled = 0
+                for index, seed in enumerate(seeds):
+                    if finished and (datetime.now() > deadline or self._attempt_is_perfect(finished[-1][1])):
+                        cancelled = attempts - index
+                        break
+                    finished.append(solve_section_attempt(section_id, data, self.calendar, self.faculty_constraints, seed, solver_limits))
+
+            if not finished:
+                return {"error": f"All {attempts} generation attempts failed. No changes were made."}
+            for seed, attempt in finished:
+                if "error" in attempt:
+                    return attempt
+
+            winner_seed, winner = min(finished, key=lambda item: (self._attempt_score(item[1]), item[0]))
+            self.seed = winner_seed
+            self._reseed([section_id])
+            self.problem_data = self._prepare_problem_data(data)
+            self.solver_stats = winner['solver_stats']
+            self.solver_stats['portfolio'] = {
+                'attempts': attempts,
+                'finished': len(finished),
+                'cancelled': cancelled,
+                'failed': failed,
+                'workers': worker_count,
+                'winner_seed': winner_seed,
+                'seconds': round((datetime.now() - generation_start).total_seconds(), 3),
+                'scores': [self._attempt_summary(seed, attempt) for seed, attempt in sorted(finished, key=lambda item: item[0])],
+            }
+            logger.info(f"Portfolio for section {section_id}: seed {winner_seed} won out of {len(finished)} finished attempts "
+                        f"({cancelled} cancelled, {failed} failed)")
+
+            generation_log = self._build_generation_log(
+                winner['raw_timetable'], winner['violations'], (datetime.now() - generation_start).total_seconds()
+            )
+            # An attempt cut short by the stop signal or a time budget would not be reproduced by its seed
+            stopped = winner['stopped'] or self._stopped_on_time(winner['solver_stats'])
+            generation_log['problem_hash'] = None if stopped else self._problem_hash([data])
+            result = self._save_single_result(section_id, data, generation_log, winner['raw_timetable'], generation_start)
+            if "error" not in result:
+                result['portfolio'] = self.solver_stats['portfolio']
+            return result
+
+        except Exception as e:
+            logger.error(f"Unexpected error in portfolio generation: {str(e)}", exc_info=True)
+            return {"error": f"Unexpected error: {str(e)}"}
+
+    def _attempt_score(self, attempt):
+        """Sort key for portfolio attempts, best first."""
+        soft_score = (attempt['solver_stats'].get('optimizer') or {}).get('final_score', 0)
+        return (-len(attempt['raw_timetable']), len(attempt['violations']), soft_score)
+
+    def _attempt_summary(self, seed, attempt):
+        slots, violations, soft_score = self._attempt_score(attempt)
+        return {'seed': seed, 'slots': -slots, 'violations': violations, 'soft_score': soft_score, 'stopped': attempt['stopped']}
+
+    def _attempt_is_perfect(self, attempt):
+        """Every session placed and no soft penalty left: no other attempt can beat it."""
+        return "error" not in attempt and not attempt['violations'] and self._attempt_score(attempt)[2] == 0
+
+    def _stop_requested(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
+    def generate_timetables_for_sections(self, section_ids, start_date=None, semester_weeks=1, progress_callback=None, max_workers=None):
+        """
+        Generates timetables for many sections in one pass. The problem is loaded once,
+        faculty and room occupancy is shared so nobody is double-booked across sections,
+        and all results are written in a single transaction.
+        Sections that share no faculty or rooms are solved as independent groups, in
+        parallel worker processes when `max_workers` (default DBConfig.GENERATION_WORKERS) > 1.
+        `progress_callback(result, sections_done, total_sections)` is called after each section is solved.
+        """
+        generation_start = datetime.now()
+        logger.info(f"Starting batch timetable generation for {len(section_ids)} sections")
+
+        try:
+            calendar = self._semester_calendar(start_date, semester_weeks)
+            batch = self._fetch_problem_data_for_sections(section_ids)
+            if "error" in batch:
+                return batch
+
+            if max_workers is None:
+                max_workers = DBConfig.GENERATION_WORKERS
+            groups = self._partition_sections(batch)
+            results = {}
+            to_save = []
+
+            # A group is reused only as a whole: its sections were solved against each other
+            self.calendar = calendar
+            section_hashes = {}
+            for group in groups:
+                group_hash = self._problem_hash([batch['sections'][section_id] for section_id in group])
+                section_hashes.update((section_id, group_hash) for section_id in group)
+            cached = self._cached_results(batch['sections'], section_hashes)
+            cached_groups = [group for group in groups if all(section_id in cached for section_id in group)]
+            groups = [group for group in groups if group not in cached_groups]
+
+            def collect(group_results, group_to_save):
+                to_save.extend(group_to_save)
+                for result in group_results:
+                    results[result['section_id']] = result
+                    if progress_callback:
+                        progress_callback(result, len(results), len(section_ids))
+
+            collect([{'section_id': section_id, 'error': error} for section_id, error in batch['errors'].items()], [])
+            collect([cached[section_id] for group in cached_groups for section_id in group], [])
+
+            # Spawning workers costs ~0.5s, which only pays off on larger runs
+            sections_to_solve = sum(len(group) for group in groups)
+            worker_count = min(max_workers, len(groups)) if sections_to_solve >= self.PARALLEL_MIN_SECTIONS else 1
+            logger.info(f"Solving {len(groups)} independent section groups with {max(worker_count, 1)} worker(s), "
+                        f"{len(cached_groups)} unchanged groups reused")
+            if worker_count > 1:
+                # spawn, not fork: the parent may be a web worker holding threads and pooled sockets
+                with ProcessPoolExecutor(max_workers=worker_count, mp_context=multiprocessing.get_context('spawn')) as executor:
+                    futures = [
+                        executor.submit(
+                            solve_section_group, group, {section_id: batch['sections'][section_id] for section_id in group},
+                            batch['all_timeslots'], self.faculty_constraints, calendar, self.seed, self._solver_limits()
+                        )
+                        for group in groups
+                    ]
+                    for future in as_completed(futures):
+                        collect(*future.result())
+            else:
+                for group in groups:
+                    collect(*self._solve_section_group(group, batch['sections'], batch['all_timeslots'], calendar))
+
+            # Groups are reused as a whole, so one section cut short by the clock leaves its group unhashed
+            timed_out_hashes = {section_hashes[section_id] for section_id, generation_log, _ in to_save
+                                if self._stopped_on_time(generation_log['solver_stats'])}
+            for section_id, generation_log, _ in to_save:
+                generation_log['problem_hash'] = None if section_hashes[section_id] in timed_out_hashes else section_hashes[section_id]
+            log_ids = self.save_batch_results(to_save)
+            if log_ids is None:
+                return {"error": "Failed to save the generated timetables. No changes were made."}
+            for section_id, log_id in log_ids.items():
+                results[section_id]['log_id'] = log_id
+
+            generation_seconds = (datetime.now() - generation_start).total_seconds()
+            sections_per_second = len(section_ids) / generation_seconds if generation_seconds else 0.0
+            logger.info(f"Batch generation finished: {len(section_ids)} sections in {generation_seconds:.2f}s ({sections_per_second:.1f} sections/s)")
+
+            return {
+                'results': [results[section_id] for section_id in section_ids],
+                'total_sections': len(section_ids),
+                'section_groups': len(groups) + len(cached_groups),
+                'cached_sections': sum(len(group) for group in cached_groups),
+                'workers': max(worker_count, 1),
+                'generation_seconds': generation_seconds,
+                'sections_per_second': sections_per_second,
+                'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+
+        except Exception as e:
+            logger.error(f"Unexpected error in batch generation: {str(e)}", exc_info=True)
+            return {"error": f"Unexpected error: {str(e)}"}
+
+    # Current weekly rows with the calendar of the log they belong to; callers append
+    # the sections or resources they need, see _load_current_placements
+    CURRENT_PLACEMENTS_QUERY = """
+        SELECT t.entry_id, t.section_id, t.faculty_id, t.batch_subject_id, t.timeslot_id, t.day_of_week,
+               t.room_id, t.is_lab_session, t.effective_from, ct.log_id, tgl.calendar_start, tgl.calendar_end
+        FROM current_timetable ct
+        JOIN timetable t ON t.section_id = ct.section_id AND t.log_id = ct.log_id
+        JOIN timetable_generation_log tgl ON tgl.log_id = ct.log_id
+        WHERE ct.status IN ('Success', 'Partial')
+    """
+
+    def repair_timetable_for_section(self, section_id):
+        """
+        Incremental counterpart of generate_timetable_for_section; see repair_timetables.
+        Returns the same result shape, plus a `repair` dict of session counts.
+        """
+        batch_result = self.repair_timetables([section_id])
+        if "error" in batch_result:
+            return batch_result
+        result = batch_result['results'][0]
+        if "error" in result:
+            return result
+        result['grid'], result['timeslot_labels'] = self.format_timetable_grid(
+            result['raw_timetable'], self.problem_data['all_timeslots'].values()
+        )
+        result['generation_seconds'] = batch_result['repair_seconds']
+        result['generated_at'] = batch_result['generated_at']
+        return result
+
+    def repair_timetables(self, section_ids):
+        """
+        Re-validates the current timetables of `section_ids` against the problem as it
+        is now (faculty_subjects, faculty unavailability and constraints, rooms) instead
+        of solving them again. Sessions that still fit keep their rows, entry_ids and
+        per-date exceptions; only the sessions the change invalidated, and sessions
+        that did not exist before, are placed again, each as close to its old slot as
+        the occupancy allows. Every other section's current timetable is held fixed.
+        Sections with nothing to repair are left untouched and keep their log.
+        """
+        repair_start = datetime.now()
+        logger.info(f"Starting incremental timetable repair for {len(section_ids)} sections")
+
+        try:
+            rows_by_section = defaultdict(list)
+            for row in self._load_current_placements(section_ids=section_ids):
+                rows_by_section[row['section_id']].append(row)
+
+            results = {}
+            targets = []
+            for section_id in section_ids:
+                if rows_by_section.get(section_id):
+                    targets.append(section_id)
+                else:
+                    results[section_id] = {'section_id': section_id, 'error': f"Section {section_id} has no current timetable to repair. Generate it first."}
+
+            prepared = {}
+            if targets:
+                batch = self._fetch_problem_data_for_sections(targets)
+                if "error" in batch:
+                    return batch
+                for section_id, error in batch['errors'].items():
+                    results[section_id] = {'section_id': section_id, 'error': error}
+                occupancy = SlotOccupancy(batch['all_timeslots'])
+                for section_id in targets:
+                    if section_id not in batch['sections']:
+                        continue
+                    self.problem_data = self._prepare_problem_data(batch['sections'][section_id])
+                    if "error" in self.problem_data:
+                        results[section_id] = {'section_id': section_id, 'error': self.problem_data['error']}
+                        continue
+                    prepared[section_id] = self.problem_data
+                    # Registered before any row is occupied so the hour counters see the whole week
+                    for assignment in self.problem_data['assignments']:
+                        self._register_faculty(occupancy, assignment['faculty_id'])
+
+                # Only other sections' rows that hold a faculty member or room the repaired
+                # sessions may use can collide with them; the rest of the institution is not loaded
+                faculty_ids, room_ids = set(), set()
+                for problem_data in prepared.values():
+                    self.problem_data = problem_data
+                    for assignment in problem_data['assignments']:
+                        faculty_ids.add(assignment['faculty_id'])
+                        room_ids.update(self._allowed_rooms(assignment))
+                room_ids.discard(None)
+                for row in self._load_current_placements(exclude_section_ids=list(prepared), faculty_ids=faculty_ids, room_ids=room_ids):
+                    start = occupancy.ordinal_of.get(self._row_slot_key(row))
+                    if start is not None:
+                        occupancy.occupy(row['section_id'], row['faculty_id'], row['room_id'], start, 1)
+
+            # Keep every valid session of every section first, so a re-placed session
+            # never takes a slot another section is still entitled to
+            repairs = {}
+            for section_id, problem_data in prepared.items():
+                self.problem_data = problem_data
+                repairs[section_id] = self._keep_valid_placements(occupancy, rows_by_section[section_id])
+
+            to_save = []
+            for section_id, repair in repairs.items():
+                section_start = datetime.now()
+                self.problem_data = prepared[section_id]
+                first_row = rows_by_section[section_id][0]
+                if first_row['calendar_start'] and first_row['calendar_end']:
+                    self.calendar = SemesterCalendar(first_row['calendar_start'], first_row['calendar_end'])
+                else:
+                    self.calendar = self._semester_calendar(None, 1)
+                results[section_id] = self._repair_section(occupancy, repair, first_row['log_id'], section_start, to_save)
+
+            log_ids = self.save_repair_results(to_save)
+            if log_ids is None:
+                return {"error": "Failed to save the repaired timetables. No changes were made."}
+            for section_id, log_id in log_ids.items():
+                results[section_id]['log_id'] = log_id
+
+            repair_seconds = (datetime.now() - repair_start).total_seconds()
+            sessions_moved = sum(result.get('repair', {}).get('moved', 0) for result in results.values())
+            logger.info(f"Incremental repair finished: {len(to_save)} of {len(section_ids)} sections changed, "
+                        f"{sessions_moved} sessions moved in {repair_seconds * 1000:.1f}ms")
+
+            return {
+                'results': [results[section_id] for section_id in section_ids],
+                'total_sections': len(section_ids),
+                'sections_changed': len(to_save),
+                'sessions_moved': sessions_moved,
+                'repair_seconds': repair_seconds,
+                'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+
+        except Exception as e:
+            logger.error(f"Unexpected error in incremental repair: {str(e)}", exc_info=True)
+            return {"error": f"Unexpected error: {str(e)}"}
+
+    def _load_current_placements(self, section_ids=None, exclude_section_ids=None, faculty_ids=None, room_ids=None):
+        """
+        Current timetable rows of `section_ids`, or, given faculty_ids/room_ids, the rows
+        of every other section that use one of those faculty members or rooms.
+        """
+        query = self.CURRENT_PLACEMENTS_QUERY
+        params = []
+        if section_ids is not None:
+            if not section_ids:
+                return []
+            query += f" AND ct.section_id IN ({', '.join(['%s'] * len(section_ids))})"
+            params += list(section_ids)
+        if exclude_section_ids:
+            query += f" AND ct.section_id NOT IN ({', '.join(['%s'] * len(exclude_section_ids))})"
+            params += list(exclude_section_ids)
+        if faculty_ids is not None or room_ids is not None:
+            resources = []
+            if faculty_ids:
+                resources.append(f"t.faculty_id IN ({', '.join(['%s'] * len(faculty_ids))})")
+                params += sorted(faculty_ids)
+            if room_ids:
+                resources.append(f"t.room_id IN ({', '.join(['%s'] * len(room_ids))})")
+                params += sorted(room_ids)
+            if not resources:
+                return []
+            query += f" AND ({' OR '.join(resources)})"
+        return self._execute_query(query, tuple(params)) or []
+
+    @staticmethod
+    def _row_slot_key(row):
+        day_of_week = row['day_of_week']
+        day_index = SlotOccupancy.DAYS_ORDER.index(day_of_week) if day_of_week in SlotOccupancy.DAYS_ORDER else None
+        return day_index, row['timeslot_id']
+
+    def _current_blocks(self, occupancy, rows):
+        """
+        Groups a section's timetable rows back into placed sessions: one row per theory
+        session, and runs of consecutive same-day periods cut to the lab duration for labs.
+        A block whose slot no longer exists has start None.
+        """
+        lab_durations = {a['batch_subject_id']: int(a['duration']) for a in self.problem_data['assignments'] if a['is_lab']}
+        blocks = []
+        lab_runs = defaultdict(list)
+        for row in rows:
+            start = occupancy.ordinal_of.get(self._row_slot_key(row))
+            if row['is_lab_session'] and start is not None:
+                lab_runs[(row['batch_subject_id'], row['faculty_id'], row['room_id'])].append((start, row))
+            else:
+                blocks.append({'start': start, 'rows': [row]})
+
+        for (batch_subject_id, _, _), run in lab_runs.items():
+            duration = lab_durations.get(batch_subject_id, 1)
+            current = []
+            for start, row in sorted(run, key=lambda item: item[0]):
+                if current and (len(current) == duration or start != current[-1][0] + 1
+                                or occupancy.slot_keys[start][0] != occupancy.slot_keys[current[0][0]][0]):
+                    blocks.append({'start': current[0][0], 'rows': [row for _, row in current]})
+                    current = []
+                current.append((start, row))
+            if current:
+                blocks.append({'start': current[0][0], 'rows': [row for _, row in current]})
+
+        for block in blocks:
+            first_row = block['rows'][0]
+            block['key'] = (first_row['batch_subject_id'], bool(first_row['is_lab_session']), len(block['rows']))
+            block['faculty_id'] = first_row['faculty_id']
+            block['room_id'] = first_row['room_id']
+        return blocks
+
+    def _keep_valid_placements(self, occupancy, rows):
+        """
+        Matches the section's current blocks to the sessions the problem now asks for,
+        preferring the same faculty member, and occupies every matched block whose slot,
+        room and faculty are still valid. Returns the kept and pending placements and the
+        blocks no session wants any more.
+        """
+        section_id = self.problem_data['section_id']
+        blocks_by_key = defaultdict(list)
+        for block in sorted(self._current_blocks(occupancy, rows), key=lambda block: (block['start'] is None, block['start'] or 0)):
+            blocks_by_key[block['key']].append(block)
+
+        matched = []
+        sessions = self.problem_data['assignments']
+        # Exact faculty first, so a reassignment only claims blocks nobody else can use
+        for same_faculty in (True, False):
+            remaining = []
+            for assignment in sessions:
+                candidates = blocks_by_key[(assignment['batch_subject_id'], bool(assignment['is_lab']), int(assignment['duration']))]
+                block = next((block for block in candidates if not same_faculty or block['faculty_id'] == assignment['faculty_id']), None)
+                if block is None:
+                    remaining.append(assignment)
+                    continue
+                candidates.remove(block)
+                matched.append((assignment, block))
+            sessions = remaining
+
+        kept, pending = [], []
+        for assignment, block in matched:
+            placement = {
+                'assignment': assignment, 'rows': block['rows'], 'rooms': self._allowed_rooms(assignment),
+                'origin_start': block['start'], 'origin_room_id': block['room_id'], 'origin_faculty_id': block['faculty_id'],
+                'room_id': None, 'start': None,
+            }
+            start = block['start']
+            if (start is not None and block['room_id'] in placement['rooms']
+                    and self._free_start_mask(assignment, block['room_id'], occupancy) >> start & 1):
+                occupancy.occupy(section_id, assignment['faculty_id'], block['room_id'], start, int(assignment['duration']))
+                placement['room_id'], placement['start'] = block['room_id'], start
+                kept.append(placement)
+            else:
+                pending.append(placement)
+        for assignment in sessions:
+            pending.append({
+                'assignment': assignment, 'rows': [], 'rooms': self._allowed_rooms(assignment),
+                'origin_start': None, 'origin_room_id': None, 'origin_faculty_id': None,
+                'room_id': None, 'start': None,
+            })
+
+        removed = [block for blocks in blocks_by_key.values() for block in blocks]
+        return {'kept': kept, 'pending': pending, 'removed': removed}
+
+    def _allowed_rooms(self, assignment):
+        room_id = self._select_room(assignment)
+        return self._candidate_rooms(assignment, room_id) if room_id is not None else []
+
+    def _repair_section(self, occupancy, repair, old_log_id, section_start, to_save):
+        """
+        Re-places the section's pending sessions with minimal perturbation: the old slot
+        if it is free again, otherwise the nearest free start, otherwise by moving one
+        other session of the section out of the way. Queues the row changes on `to_save`
+        when anything changed and returns the section result.
+        """
+        section_id = self.problem_data['section_id']
+        placements = list(repair['kept'])
+        violations = []
+        unplaced = []
+        for placement in sorted(repair['pending'], key=lambda p: (p['assignment']['is_lab'], p['assignment']['duration']), reverse=True):
+            assignment = placement['assignment']
+            if not placement['rooms']:
+                violations.append(f"No suitable room could be found for subject {assignment['subject_name']} with faculty {assignment['faculty_name']}.")
+                unplaced.append(placement)
+                continue
+            spot = self._nearest_free_start(occupancy, placement, placement['origin_start'])
+            if spot is None and not self._displace_for(occupancy, placements, placement):
+                violations.append(self._unplaced_violation(assignment, placement['rooms'][0], occupancy))
+                unplaced.append(placement)
+                continue
+            if spot is not None:
+                placement['room_id'], placement['start'] = spot
+                occupancy.occupy(section_id, assignment['faculty_id'], spot[0], spot[1], int(assignment['duration']))
+            placements.append(placement)
+
+        # Rows already taught keep their past dates: they are end-dated and replaced rather
+        # than rewritten or deleted, so the exceptions of those dates still resolve
+        repair_date = date.today()
+
+        def has_history(row):
+            return (row.get('effective_from') or self.calendar.start_date) < repair_date
+
+        stats = {'kept': 0, 'moved': 0, 'reassigned': 0, 'added': 0, 'removed': len(repair['removed']), 'dropped': 0, 'unplaced': len(unplaced)}
+        updated_rows, replacement_rows, moved_entry_ids, new_entries, final_timetable = [], [], [], [], []
+        deleted_entry_ids, retired_entry_ids = [], []
+
+        def remove_rows(rows):
+            for row in rows:
+                (retired_entry_ids if has_history(row) else deleted_entry_ids).append(row['entry_id'])
+
+        for block in repair['removed']:
+            remove_rows(block['rows'])
+        for placement in placements:
+            assignment = placement['assignment']
+            entries = self._placement_entries(occupancy, assignment, placement['room_id'], placement['start'])
+            final_timetable.extend(entries)
+            if not placement['rows']:
+                stats['added'] += 1
+                new_entries.extend(entries)
+                continue
+            if placement['start'] != placement['origin_start']:
+                stats['moved'] += 1
+                moved_entry_ids.extend(row['entry_id'] for row in placement['rows'])
+            elif placement['room_id'] != placement['origin_room_id'] or assignment['faculty_id'] != placement['origin_faculty_id']:
+                stats['reassigned'] += 1
+            else:
+                stats['kept'] += 1
+                for entry, row in zip(entries, placement['rows']):
+                    entry['entry_id'] = row['entry_id']
+                continue
+            for entry, row in zip(entries, placement['rows']):
+                if has_history(row):
+                    retired_entry_ids.append(row['entry_id'])
+                    entry['replaces_entry_id'] = row['entry_id']
+                    replacement_rows.append(entry)
+                else:
+                    entry['entry_id'] = row['entry_id']
+                    updated_rows.append(entry)
+        for placement in unplaced:
+            if placement['rows']:
+                stats['dropped'] += 1
+                remove_rows(placement['rows'])
+
+        stats['seconds'] = round((datetime.now() - section_start).total_seconds(), 4)
+        self.solver_stats = {'repair': stats, 'hard_penalty': self.PENALTY_HARD * sum(int(p['assignment']['duration']) for p in unplaced)}
+        generation_log = self._build_generation_log(final_timetable, violations, stats['seconds'])
+        changed = updated_rows or replacement_rows or new_entries or deleted_entry_ids or retired_entry_ids
+        if changed:
+            to_save.append({
+                'section_id': section_id, 'old_log_id': old_log_id, 'generation_log': generation_log,
+                'repair_date': repair_date, 'updated_rows': updated_rows, 'replacement_rows': replacement_rows,
+                'moved_entry_ids': moved_entry_ids, 'deleted_entry_ids': deleted_entry_ids,
+                'retired_entry_ids': retired_entry_ids, 'new_entries': new_entries,
+                # Added sessions start from the repair date once the semester is under way
+                'new_entries_from': repair_date if self.calendar.start_date < repair_date else None,
+            })
+        logger.info(f"Repair of section {section_id}: {stats}")
+        return {
+            'status': generation_log['generation_status'],
+            'section_id': section_id,
+            'section_name': self.problem_data['section_info']['name'],
+            'batch_id': self.problem_data['section_info']['batch_id'],
+            'department': self.problem_data['section_info']['department_name'],
+            'generation_log': generation_log,
+            'raw_timetable': final_timetable,
+            'repair': stats,
+            'changed': bool(changed),
+            'log_id': old_log_id,
+            'start_date': self.calendar.start_date,
+            'end_date': self.calendar.end_date,
+        }
+
+    def _nearest_free_start(self, occupancy, placement, origin_start):
+        """
+        The (room_id, start) for a placement closest to `origin_start`: same day first,
+        then fewest periods away, then its old room. Without an origin any free start will do.
+        """
+        assignment = placement['assignment']
+        rooms = placement['rooms']
+        if placement['origin_room_id'] in rooms:
+            rooms = [placement['origin_room_id']] + [room_id for room_id in rooms if room_id != placement['origin_room_id']]
+        best, best_rank = None, None
+        for room_id in rooms:
+            free = self._free_start_mask(assignment, room_id, occupancy)
+            if not free:
+                continue
+            if origin_start is None:
+                starts = list(occupancy.iter_bits(free))
+                return room_id, self.rng.choice(starts)
+            origin_day = occupancy.slot_keys[origin_start][0]
+            for start in occupancy.iter_bits(free):
+                rank = (occupancy.slot_keys[start][0] != origin_day, abs(start - origin_start), room_id != placement['origin_room_id'])
+                if best_rank is None or rank < best_rank:
+                    best, best_rank = (room_id, start), rank
+        return best
+
+    def _displace_for(self, occupancy, placements, placement):
+        """
+        Frees a slot for `placement` by moving one other placed session of the section to
+        its own nearest free start. Occupies both and returns True, or restores everything.
+        """
+        section_id = self.problem_data['section_id']
+        assignment = placement['assignment']
+        for other in placements:
+            other_assignment = other['assignment']
+            occupancy.release(section_id, other_assignment['faculty_id'], other['room_id'], other['start'], int(other_assignment['duration']))
+            spot = self._nearest_free_start(occupancy, placement, placement['origin_start'])
+            if spot is not None:
+                occupancy.occupy(section_id, assignment['faculty_id'], spot[0], spot[1], int(assignment['duration']))
+                other_spot = self._nearest_free_start(occupancy, other, other['start'])
+                if other_spot is not None:
+                    occupancy.occupy(section_id, other_assignment['faculty_id'], other_spot[0], other_spot[1], int(other_assignment['duration']))
+                    placement['room_id'], placement['start'] = spot
+                    other['room_id'], other['start'] = other_spot
+                    return True
+                occupancy.release(section_id, assignment['faculty_id'], spot[0], spot[1], int(assignment['duration']))
+            occupancy.occupy(section_id, other_assignment['faculty_id'], other['room_id'], other['start'], int(other_assignment['duration']))
+        return False
+
+    TIMETABLE_REPAIR_UPDATE = """
+        UPDATE timetable
+        SET faculty_id = %s, room_id = %s, timeslot_id = %s, day_of_week = %s, date = %s, modified_at = NOW()
+        WHERE entry_id = %s
+    """
+
+    # The replacement of an end-dated row, in effect from the repair date
+    TIMETABLE_REPLACEMENT_INSERT = """
+        INSERT INTO timetable
+        (section_id, faculty_id, batch_subject_id, timeslot_id, day_of_week, room_id,
+         subsection_id, week_number, date, is_rescheduled, is_lab_session, log_id, effective_from)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+
+    def save_repair_results(self, section_repairs):
+        """
+        Applies the row changes of repair_timetables in a single transaction. Each changed
+        section gets a new log; its untouched rows are moved onto it rather than rewritten,
+        so their entry_ids, and the exceptions hanging off them, survive. Changed or
+        removed rows that were already taught stay on the old log, end-dated the day
+        before the repair, so their past dates keep resolving with their exceptions; a
+        replacement row takes over from the repair date, as does an added session once
+        the semester has started. A replacement in the same slot inherits the old row's
+        exceptions from that date; future exceptions of moved or removed rows are
+        dropped, as their dates no longer fall on the session.
+        Returns a {section_id: log_id} dict, or None if the transaction was rolled back.
+        """
+        if not section_repairs:
+            return {}
+
+        log_ids = {}
+        conn = get_db_connection()
+        if not conn:
+            return None
+        cursor = conn.cursor(buffered=True)
+        try:
+            pointers = []
+            insert_data = []
+            for repair in section_repairs:
+                section_id = repair['section_id']
+                log_params = self._generation_log_params(section_id, repair['generation_log'])
+                cursor.execute(self.GENERATION_LOG_INSERT, log_params)
+                log_id = cursor.lastrowid
+                log_ids[section_id] = log_id
+                pointers.append((section_id, log_id, log_params[1]))
+
+                repair_date = repair['repair_date']
+                retired_entry_ids = repair['retired_entry_ids']
+                move_query = "UPDATE timetable SET log_id = %s WHERE section_id = %s AND log_id = %s"
+                if retired_entry_ids:
+                    move_query += f" AND entry_id NOT IN ({', '.join(['%s'] * len(retired_entry_ids))})"
+                cursor.execute(move_query, (log_id, section_id, repair['old_log_id']) + tuple(retired_entry_ids))
+                if repair['deleted_entry_ids']:
+                    placeholders = ', '.join(['%s'] * len(repair['deleted_entry_ids']))
+                    cursor.execute(f"DELETE FROM timetable WHERE entry_id IN ({placeholders})", tuple(repair['deleted_entry_ids']))
+                if repair['updated_rows']:
+                    cursor.executemany(self.TIMETABLE_REPAIR_UPDATE, [(
+                        entry['faculty_id'], entry['room_id'], entry['timeslot_id'], entry['day_of_week'], entry['date'], entry['entry_id']
+                    ) for entry in repair['updated_rows']])
+                if retired_entry_ids:
+                    placeholders = ', '.join(['%s'] * len(retired_entry_ids))
+                    cursor.execute(f"UPDATE timetable SET effective_until = %s, modified_at = NOW() WHERE entry_id IN ({placeholders})",
+                                   (repair_date - timedelta(days=1),) + tuple(retired_entry_ids))
+                moved_entry_ids = set(repair['moved_entry_ids'])
+                for entry in repair['replacement_rows']:
+                    cursor.execute(self.TIMETABLE_REPLACEMENT_INSERT, self._timetable_insert_rows(log_id, [entry])[0] + (repair_date,))
+                    entry['entry_id'] = cursor.lastrowid
+                    if entry['replaces_entry_id'] not in moved_entry_ids:
+                        cursor.execute("UPDATE timetable_exception SET entry_id = %s WHERE entry_id = %s AND exception_date >= %s",
+                                       (entry['entry_id'], entry['replaces_entry_id'], repair_date))
+                stale_entry_ids = sorted(moved_entry_ids | set(retired_entry_ids))
+                if stale_entry_ids:
+                    placeholders = ', '.join(['%s'] * len(stale_entry_ids))
+                    cursor.execute(f"""
+                        DELETE FROM timetable_exception
+                        WHERE entry_id IN ({placeholders}) AND exception_date >= %s
+                    """, tuple(stale_entry_ids) + (repair_date,))
+                insert_data.extend(row + (repair['new_entries_from'],)
+                                   for row in self._timetable_insert_rows(log_id, repair['new_entries']))
+
+            if insert_data:
+                cursor.executemany(self.TIMETABLE_REPLACEMENT_INSERT, insert_data)
+            cursor.executemany(self.CURRENT_TIMETABLE_UPSERT, pointers)
+            conn.commit()
+            logger.info(f"Saved incremental repairs for {len(section_repairs)} sections in one transaction.")
+            return log_ids
+        except mysql.connector.Error as e:
+            conn.rollback()
+            logger.error(f"Database error saving timetable repairs: {e}", exc_info=True)
+            return None
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _partition_sections(self, batch):
         """
-        Main function to generate a timetable using a heuristic-based approach.
+        Splits the loaded sections into groups that can never compete for the same
+        faculty member or room, using union-find over the resources each section may use.
+        Sections that fall back to "any Lecture/Lab room" are tied to every room of that type.
         """
-        generation_start = datetime.now()
-        logger.info(f"Starting heuristic timetable generation for section {section_id}")
-        
-        try:
-            self.delete_existing_timetable(section_id)
-            data = self._fetch_problem_data(section_id)
-            if "error" in data:
-                return data
-            
-            self.problem_data = self._prepare_problem_data(data)
+        parent = {}
+
+        def find(node):
+            parent.setdefault(node, node)
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        def union(a, b):
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+        rooms_by_id = {room['room_id']: room for room in batch['all_rooms']}
+        used_pools = set()
+        for section_id, data in batch['sections'].items():
+            section_node = ('section', section_id)
+            find(section_node)
+            for fa in data['faculty_assignments']:
+                union(section_node, ('faculty', fa['faculty_id']))
+                if fa.get('lab_sessions_per_week'):
+                    lab_room = rooms_by_id.get(fa.get('preferred_lab_room_id'))
+                    if lab_room and lab_room['room_type'] == 'Lab':
+                        union(section_node, ('room', lab_room['room_id']))
+                    else:
+                        union(section_node, ('pool', 'Lab'))
+                        used_pools.add('Lab')
+            theory_room_id = data['section_info'].get('theory_room_id')
+            if theory_room_id:
+                union(section_node, ('room', theory_room_id))
+            else:
+                union(section_node, ('pool', 'Lecture'))
+                used_pools.add('Lecture')
+
+        for room in batch['all_rooms']:
+            if room['room_type'] in used_pools and ('room', room['room_id']) in parent:
+                union(('pool', room['room_type']), ('room', room['room_id']))
+
+        groups = defaultdict(list)
+        for section_id in sorted(batch['sections']):
+            groups[find(('section', section_id))].append(section_id)
+        return list(groups.values())
+
+    def _solve_section_group(self, group, sections, all_timeslots, calendar):
+        """Solves one independent group of sections against its own occupancy. Does not touch the database."""
+        self.calendar = calendar
+        self._reseed(group)
+        occupancy = SlotOccupancy(all_timeslots)
+        results = []
+        to_save = []
+        for section_id in group:
+            self.problem_data = self._prepare_problem_data(sections[section_id])
             if "error" in self.problem_data:
-                return self.problem_data
+                results.append({'section_id': section_id, 'error': self.problem_data['error']})
+            else:
+                results.append(self._solve_batch_section(section_id, sections[section_id], occupancy, to_save))
+        return results, to_save
+
+    def _solve_batch_section(self, section_id, data, occupancy, to_save):
+        section_start = datetime.now()
+        final_timetable, violations = self._schedule_assignments(occupancy)
+        generation_log = self._build_generation_log(
+            final_timetable, violations, (datetime.now() - section_start).total_seconds()
+        )
+        to_save.append((section_id, generation_log, final_timetable))
+        return {
+            'status': generation_log['generation_status'],
+            'section_id': section_id,
+            'section_name': data['section_info']['name'],
+            'batch_id': data['section_info']['batch_id'],
+            'department': data['section_info']['department_name'],
+            'generation_log': generation_log,
+            'raw_timetable': final_timetable,
+            'start_date': self.calendar.start_date,
+            'end_date': self.calendar.end_date,
+        }
 
-            final_timetable = []
-            violations = []
-            
-            # Keep track of occupied slots for all resources
-            occupied_slots = {
-                'section': defaultdict(list),
-                'faculty': defaultdict(set),
-                'room': defaultdict(set)
-            }
-            
-            # Heuristic Logic: Prioritize subjects that are harder to schedule
-            all_assignments = sorted(self.problem_data['assignments'], key=lambda x: (x['is_lab'], x['duration']), reverse=True)
+    def _schedule_assignments(self, occupancy):
+        """
+        Places every assignment of the currently loaded section into `occupancy`.
+        Returns the timetable entries and the list of violation messages.
+        """
+        section_id = self.problem_data['section_id']
+        violations = []
+        placements = []
+        unplaced = []
+        self.solver_stats = {}
+
+        # Heuristic Logic: Prioritize subjects that are harder to schedule
+        all_assignments = sorted(self.problem_data['assignments'], key=lambda x: (x['is_lab'], x['duration']), reverse=True)
+
+        for assignment in all_assignments:
+            # 1. Find a suitable room first based on assignment type
+            room_id = self._select_room(assignment)
+
+            if room_id is None:
+                violations.append(f"No suitable room could be found for subject {assignment['subject_name']} with faculty {assignment['faculty_name']}.")
+                continue
+
+            # 2. Find a suitable time slot for the entire duration
+            self._register_faculty(occupancy, assignment['faculty_id'])
+            available_starts = self._find_available_slot(assignment, room_id, occupancy)
+
+            if not available_starts:
+                unplaced.append((assignment, room_id))
+                continue
 
-            for assignment in all_assignments:
-                # 1. Find a suitable room first based on assignment type
-                room_id = self._select_room(assignment)
+            # Take the first available slot block and mark it as occupied
+            start = available_starts[0]
+            occupancy.occupy(section_id, assignment['faculty_id'], room_id, start, int(assignment['duration']))
+            placements.append((assignment, room_id, start))
+
+        # 3. Greedy got stuck: try to complete the section by moving earlier placements
+        if unplaced and self.search_time_budget:
+            placements, unplaced = self._search_placements(occupancy, placements, unplaced)
+
+        # 4. Improve soft constraints without giving up any placement
+        placements = self._optimize_placements(occupancy, placements)
+        self.solver_stats['hard_penalty'] = self.PENALTY_HARD * sum(int(assignment['duration']) for assignment, _ in unplaced)
+
+        for assignment, room_id in unplaced:
+            violations.append(self._unplaced_violation(assignment, room_id, occupancy))
+
+        final_timetable = []
+        for assignment, room_id, start in placements:
+            final_timetable.extend(self._placement_entries(occupancy, assignment, room_id, start))
+        return final_timetable, violations
+
+    def _unplaced_violation(self, assignment, room_id, occupancy):
+        if self._find_available_slot(assignment, room_id, occupancy, enforce_constraints=False):
+            return f"No slot for {assignment['subject_name']} within the availability and hour limits of faculty {assignment['faculty_name']}."
+        return f"No free time slot found for {assignment['subject_name']} with faculty {assignment['faculty_name']}."
+
+    def _placement_entries(self, occupancy, assignment, room_id, start):
+        """Expands one placed block into a timetable entry per period."""
+        entries = []
+        for day_idx, timeslot_id in occupancy.block(start, int(assignment['duration'])):
+            timeslot_info = self.problem_data['all_timeslots'][timeslot_id]
+            day_of_week = self.problem_data['day_map_rev'][day_idx]
+
+            entries.append({
+                'section_id': self.problem_data['section_id'],
+                'section_name': self.problem_data['section_info']['name'],
+                'faculty_id': assignment['faculty_id'],
+                'faculty_name': assignment['faculty_name'],
+                'subject_id': assignment['subject_id'],
+                'subject_name': assignment['subject_name'],
+                'subject_code': assignment['subject_code'],
+                'batch_subject_id': assignment['batch_subject_id'],
+                'timeslot_id': timeslot_info['timeslot_id'],
+                'day_of_week': day_of_week,
+                'room_id': room_id,
+                'room_number': self.problem_data['all_rooms'][room_id]['room_number'],
+                'subsection_id': None,
+                'week_number': 1,
+                'date': self.calendar.first_date(day_of_week),
+                'is_rescheduled': 0,
+                'is_lab_session': assignment['is_lab'],
+                # Correcting this line to handle time objects directly
+                'start_time': timeslot_info['start_time'],
+                'end_time': timeslot_info['end_time']
+            })
+        return entries
+
+    def _candidate_rooms(self, assignment, selected_room_id):
+        """Rooms the search may use for an assignment; fixed rooms stay fixed."""
+        students_in_session = self.problem_data['section_info'].get('total_students', 0)
+        if not assignment['is_lab']:
+            if self.problem_data['section_info'].get('theory_room_id'):
+                return [selected_room_id]
+            room_type = 'Lecture'
+        else:
+            preferred = self.problem_data['all_rooms'].get(assignment.get('preferred_room_id'))
+            if preferred and preferred['room_type'] == 'Lab':
+                return [selected_room_id]
+            room_type = 'Lab'
+        rooms = self.problem_data['rooms_by_type'].get(room_type, [])
+        capacities = self.problem_data['room_capacities_by_type'].get(room_type, [])
+        candidates = [room['room_id'] for room in rooms[bisect_left(capacities, students_in_session or 0):]]
+        return [selected_room_id] + [room_id for room_id in candidates if room_id != selected_room_id]
+
+    def _search_placements(self, occupancy, placements, unplaced):
+        """
+        Bounded backtracking over this section's assignments: most-constrained variable
+        first, forward checking on every remaining domain, stopping at the time/node budget.
+        Returns (placements, unplaced), keeping the greedy result unless the search beats it.
+        """
+        section_id = self.problem_data['section_id']
+        search_start = datetime.now()
+        deadline = search_start + timedelta(seconds=self.search_time_budget)
+
+        variables = []
+        for assignment, room_id, start in placements:
+            occupancy.release(section_id, assignment['faculty_id'], room_id, start, int(assignment['duration']))
+            variables.append((assignment, room_id, self._candidate_rooms(assignment, room_id)))
+        for assignment, room_id in unplaced:
+            variables.append((assignment, room_id, self._candidate_rooms(assignment, room_id)))
+
+        def domain(index):
+            assignment, _, rooms = variables[index]
+            duration = int(assignment['duration'])
+            continuous = assignment['is_lab_continuous'] and duration > 1
+            return [
+                (room_id, occupancy.free_starts(section_id, assignment['faculty_id'], room_id, duration, continuous=continuous))
+                for room_id in rooms
+            ]
+
+        # Sessions that cannot go anywhere even in an empty section are left out of the search
+        remaining = set()
+        impossible = []
+        for index in range(len(variables)):
+            if any(mask for _, mask in domain(index)):
+                remaining.add(index)
+            else:
+                impossible.append(index)
+
+        stats = {'nodes': 0, 'budget_exhausted': False, 'stopped_on_time': False}
+        path = []
+        best = {'slots': -1, 'path': []}
+
+        def weight(indexes):
+            return sum(int(variables[index][0]['duration']) for index in indexes)
+
+        def dfs(dropped):
+            stats['nodes'] += 1
+            assigned_slots = weight(index for index, _, _ in path)
+            if assigned_slots > best['slots']:
+                best['slots'] = assigned_slots
+                best['path'] = list(path)
+            if not remaining:
+                return not dropped
+            if stats['nodes'] >= self.SEARCH_NODE_LIMIT:
+                stats['budget_exhausted'] = True
+                return False
+            if datetime.now() > deadline or self._stop_requested():
+                # Where the clock cuts the search off depends on machine load, not on the problem
+                stats['budget_exhausted'] = stats['stopped_on_time'] = True
+                return False
+
+            # Forward checking: sessions left without any value are dropped for this branch,
+            # which rules out a complete solution below but still allows a better partial one
+            domains = {}
+            newly_dropped = []
+            for index in remaining:
+                index_domain = domain(index)
+                size = sum(occupancy.popcount(mask) for _, mask in index_domain)
+                if size:
+                    domains[index] = (index_domain, size)
+                else:
+                    newly_dropped.append(index)
+            remaining.difference_update(newly_dropped)
+            try:
+                # Bound: even placing everything left cannot beat the best partial found so far
+                if not remaining or assigned_slots + weight(remaining) <= best['slots']:
+                    return False
+
+                # Most-constrained variable first
+                chosen = min(domains, key=lambda index: domains[index][1])
+                assignment = variables[chosen][0]
+                duration = int(assignment['duration'])
+                remaining.discard(chosen)
+                try:
+                    for room_id, mask in domains[chosen][0]:
+                        starts = list(occupancy.iter_bits(mask))
+                        self.rng.shuffle(starts)
+                        for start in starts:
+                            occupancy.occupy(section_id, assignment['faculty_id'], room_id, start, duration)
+                            path.append((chosen, room_id, start))
+                            if dfs(dropped + len(newly_dropped)):
+                                return True
+                            path.pop()
+                            occupancy.release(section_id, assignment['faculty_id'], room_id, start, duration)
+                            if stats['budget_exhausted']:
+                                return False
+                    return False
+                finally:
+                    remaining.add(chosen)
+            finally:
+                remaining.update(newly_dropped)
+
+        solved = dfs(0)
+        # Unwind whatever the search left occupied before committing the chosen result
+        for index, room_id, start in path:
+            assignment = variables[index][0]
+            occupancy.release(section_id, assignment['faculty_id'], room_id, start, int(assignment['duration']))
+
+        greedy_slots = sum(int(assignment['duration']) for assignment, _, _ in placements)
+        if best['slots'] > greedy_slots:
+            chosen_path = best['path']
+        else:
+            # variables start with the greedy placements, in the same order
+            chosen_path = [(index, room_id, start) for index, (_, room_id, start) in enumerate(placements)]
+
+        placed_indexes = set()
+        new_placements = []
+        for index, room_id, start in chosen_path:
+            assignment = variables[index][0]
+            occupancy.occupy(section_id, assignment['faculty_id'], room_id, start, int(assignment['duration']))
+            new_placements.append((assignment, room_id, start))
+            placed_indexes.add(index)
+        new_unplaced = [(variables[index][0], variables[index][1]) for index in range(len(variables)) if index not in placed_indexes]
+
+        elapsed = (datetime.now() - search_start).total_seconds()
+        nodes_per_second = stats['nodes'] / elapsed if elapsed else 0.0
+        self.solver_stats['search'] = {
+            'nodes': stats['nodes'],
+            'nodes_per_second': round(nodes_per_second, 1),
+            'seconds': round(elapsed, 3),
+            'solved': solved,
+            'budget_exhausted': stats['budget_exhausted'],
+            'stopped_on_time': stats['stopped_on_time'],
+            'unplaceable': len(impossible),
+            'greedy_unplaced': len(unplaced),
+            'final_unplaced': len(new_unplaced),
+        }
+        logger.info(
+            f"Backtracking search for section {section_id}: {stats['nodes']} nodes in {elapsed:.2f}s "
+            f"({nodes_per_second:.0f} nodes/s), unplaced {len(unplaced)} -> {len(new_unplaced)}"
+            + (" (budget exhausted)" if stats['budget_exhausted'] else "")
+        )
+        return new_placements, new_unplaced
 
-                if room_id is None:
-                    violations.append(f"No suitable room could be found for subject {assignment['subject_name']} with faculty {assignment['faculty_name']}.")
+    def _optimize_placements(self, occupancy, placements):
+        """
+        Simulated annealing over this section's placements using moves (a block to another
+        free start/room) and swaps (two equal-length blocks trade starts). Each candidate is
+        scored by re-evaluating only the SoftScore components it touches.
+        """
+        section_id = self.problem_data['section_id']
+        soft_score = SoftScore(occupancy, self.SOFT_WEIGHTS)
+        placements = [list(placement) for placement in placements]
+        all_keys = set()
+        for assignment, room_id, start in placements:
+            soft_score.add(section_id, assignment, room_id, start)
+            all_keys |= soft_score.keys_for(section_id, assignment, start)
+
+        initial_score = soft_score.score(all_keys)
+        stats = {'iterations': 0, 'accepted': 0, 'initial_score': initial_score, 'final_score': initial_score, 'stopped_on_time': False}
+        self.solver_stats['optimizer'] = stats
+        if not placements or not self.optimize_iterations or not initial_score:
+            stats['breakdown'] = soft_score.breakdown(all_keys)
+            return [tuple(placement) for placement in placements]
+
+        optimize_start = datetime.now()
+        deadline = optimize_start + timedelta(seconds=self.optimize_time_budget)
+        candidate_rooms = {id(assignment): self._candidate_rooms(assignment, room_id) for assignment, room_id, _ in placements}
+        temperature = float(self.PENALTY_SOFT * 10)
+        cooling = (0.01 / temperature) ** (1.0 / self.optimize_iterations)
+        current_score = initial_score
+
+        def lift(placement):
+            assignment, room_id, start = placement
+            occupancy.release(section_id, assignment['faculty_id'], room_id, start, int(assignment['duration']))
+            soft_score.remove(section_id, assignment, room_id, start)
+
+        def put(placement):
+            assignment, room_id, start = placement
+            occupancy.occupy(section_id, assignment['faculty_id'], room_id, start, int(assignment['duration']))
+            soft_score.add(section_id, assignment, room_id, start)
+
+        def accept(delta):
+            return delta <= 0 or self.rng.random() < math.exp(-delta / temperature)
+
+        for iteration in range(self.optimize_iterations):
+            if iteration % 100 == 0 and (datetime.now() > deadline or self._stop_requested()):
+                stats['stopped_on_time'] = True
+                break
+            stats['iterations'] += 1
+            temperature *= cooling
+            first = self.rng.choice(placements)
+            assignment = first[0]
+            duration = int(assignment['duration'])
+            continuous = assignment['is_lab_continuous'] and duration > 1
+
+            if len(placements) > 1 and self.rng.random() < 0.3:
+                # Swap: two blocks of the same length exchange start slots, keeping their rooms
+                second = self.rng.choice(placements)
+                other = second[0]
+                if second is first or int(other['duration']) != duration or first[2] == second[2]:
                     continue
-                
-                # 2. Find a suitable time slot for the entire duration
-                required_duration = int(assignment['duration'])
-                available_slots = self._find_available_slot(assignment, room_id, occupied_slots)
-                
-                if not available_slots:
-                    violations.append(f"No free time slot found for {assignment['subject_name']} with faculty {assignment['faculty_name']}.")
+                touched = soft_score.keys_for(section_id, assignment, first[2]) | soft_score.keys_for(section_id, assignment, second[2]) \
+                    | soft_score.keys_for(section_id, other, first[2]) | soft_score.keys_for(section_id, other, second[2])
+                before = soft_score.score(touched)
+                lift(first)
+                lift(second)
+                other_continuous = other['is_lab_continuous'] and duration > 1
+                first_ok = occupancy.free_starts(section_id, assignment['faculty_id'], first[1], duration, continuous=continuous) >> second[2] & 1
+                if first_ok:
+                    put([assignment, first[1], second[2]])
+                    second_ok = occupancy.free_starts(section_id, other['faculty_id'], second[1], duration, continuous=other_continuous) >> first[2] & 1
+                    lift([assignment, first[1], second[2]])
+                else:
+                    second_ok = False
+                if first_ok and second_ok:
+                    first[2], second[2] = second[2], first[2]
+                    put(first)
+                    put(second)
+                    delta = soft_score.score(touched) - before
+                    if accept(delta):
+                        current_score += delta
+                        stats['accepted'] += 1
+                        continue
+                    lift(first)
+                    lift(second)
+                    first[2], second[2] = second[2], first[2]
+                put(first)
+                put(second)
+            else:
+                # Move: one block to another free start, possibly in another candidate room
+                new_room = self.rng.choice(candidate_rooms[id(assignment)])
+                lift(first)
+                free = occupancy.free_starts(section_id, assignment['faculty_id'], new_room, duration, continuous=continuous)
+                new_starts = list(occupancy.iter_bits(free))
+                if not new_starts:
+                    put(first)
                     continue
+                new_start = self.rng.choice(new_starts)
+                touched = soft_score.keys_for(section_id, assignment, first[2]) | soft_score.keys_for(section_id, assignment, new_start)
+                put(first)
+                before = soft_score.score(touched)
+                lift(first)
+                moved = [assignment, new_room, new_start]
+                put(moved)
+                delta = soft_score.score(touched) - before
+                if accept(delta):
+                    lift(moved)
+                    first[1], first[2] = new_room, new_start
+                    put(first)
+                    current_score += delta
+                    stats['accepted'] += 1
+                else:
+                    lift(moved)
+                    put(first)
 
-                # Take the first available slot block
-                slot_block = available_slots[0]
-
-                # 3. Add to timetable and mark slots as occupied
-                for day_idx, timeslot_id in slot_block:
-                    timeslot_info = self.problem_data['all_timeslots'][timeslot_id]
-                    day_of_week = self.problem_data['day_map_rev'][day_idx]
-
-                    final_timetable.append({
-                        'section_id': self.problem_data['section_id'],
-                        'section_name': self.problem_data['section_info']['name'],
-                        'faculty_id': assignment['faculty_id'],
-                        'faculty_name': assignment['faculty_name'],
-                        'subject_id': assignment['subject_id'],
-                        'subject_name': assignment['subject_name'],
-                        'subject_code': assignment['subject_code'],
-                        'batch_subject_id': assignment['batch_subject_id'],
-                        'timeslot_id': timeslot_info['timeslot_id'],
-                        'day_of_week': day_of_week,
-                        'room_id': room_id,
-                        'room_number': self.problem_data['all_rooms'][room_id]['room_number'],
-                        'subsection_id': None,
-                        'week_number': 1,
-                        'date': date.today(),
-                        'is_rescheduled': 0,
-                        'is_lab_session': assignment['is_lab'],
-                        # Correcting this line to handle time objects directly
-                        'start_time': timeslot_info['start_time'],
-                        'end_time': timeslot_info['end_time']
-                    })
-                    
-                    slot_key = (day_idx, timeslot_id)
-                    occupied_slots['section'][slot_key].append('full')
-                    occupied_slots['faculty'][assignment['faculty_id']].add(slot_key)
-                    occupied_slots['room'][room_id].add(slot_key)
+        stats['final_score'] = current_score
+        stats['seconds'] = round((datetime.now() - optimize_start).total_seconds(), 3)
+        stats['breakdown'] = soft_score.breakdown(all_keys | {key for assignment, _, start in placements for key in soft_score.keys_for(section_id, assignment, start)})
+        logger.info(f"Soft-constraint optimization for section {section_id}: score {initial_score} -> {current_score} "
+                    f"in {stats['iterations']} iterations ({stats['accepted']} accepted)")
+        return [tuple(placement) for placement in placements]
 
-            # --- Finalize and save results ---
-            generation_time = datetime.now() - generation_start
+    def _reseed(self, section_ids):
+        """
+        Restarts the RNG from the seed and the sections about to be solved, so their
+        result does not depend on what this generator solved before or on which worker runs it.
+        """
+        self.rng = random.Random(f"{self.seed}:{','.join(str(section_id) for section_id in sorted(section_ids))}")
+
+    def _solver_limits(self):
+        """This generator's search and optimize limits, in TimetableGenerator() argument order."""
+        return self.search_time_budget, self.optimize_iterations, self.optimize_time_budget
+
+    def _problem_hash(self, sections):
+        """
+        sha256 of a canonical JSON form of everything a run over `sections` depends on:
+        the full section and faculty assignment rows, rooms, timeslots, the assigned
+        faculty's constraints and unavailability, the calendar, the solver limits and the
+        seed. Whole rows are hashed, so a column the solver starts reading later can
+        never be left out. Equal hashes mean a rerun would reproduce the stored timetable, as long as
+        the search and optimizer stop on their node/iteration limits rather than their time budgets;
+        runs cut short by the clock are therefore saved without a hash (see _stopped_on_time).
+        """
+        faculty_ids = sorted({fa['faculty_id'] for data in sections for fa in data['faculty_assignments']})
+        unavailability = sections[0]['faculty_unavailability']
+        payload = {
+            'version': self.PROBLEM_HASH_VERSION,
+            'seed': self.seed,
+            'calendar': [self.calendar.start_date, self.calendar.end_date],
+            'solver': [self.search_time_budget, self.SEARCH_NODE_LIMIT, self.optimize_iterations, self.optimize_time_budget],
+            'sections': [{
+                'section': data['section_info'],
+                'assignments': sorted(data['faculty_assignments'], key=lambda fa: fa['faculty_subject_id']),
+            } for data in sorted(sections, key=lambda data: data['section_info']['section_id'])],
+            'rooms': sorted([room['room_id'], room['room_type'], room['capacity'] or 0] for room in sections[0]['all_rooms']),
+            'timeslots': sorted(
+                [ts['timeslot_id'], ts['day_of_week'], _to_time(ts['start_time']), _to_time(ts['end_time'])]
+                for ts in sections[0]['all_timeslots']
+            ),
+            'faculty': [[
+                faculty_id,
+                sections[0]['faculty_constraints'].get(faculty_id),
+                [[day_of_week, sorted((_to_time(ua['start_time']), _to_time(ua['end_time'])) for ua in unavailability.get((faculty_id, day_of_week), []))]
+                 for day_of_week in SlotOccupancy.DAYS_ORDER],
+            ] for faculty_id in faculty_ids],
+        }
+        canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _stopped_on_time(solver_stats):
+        """True when a time budget, not the node or iteration limit, ended the search or optimizer."""
+        return any((solver_stats.get(stage) or {}).get('stopped_on_time') for stage in ('search', 'optimizer'))
+
+    def _cached_results(self, sections, problem_hashes):
+        """
+        Results for the sections whose current timetable was generated from exactly the
+        problem in `problem_hashes` ({section_id: hash}), read back from the stored log and
+        rows instead of being solved again. Sections without a match are left out.
+        """
+        if not problem_hashes:
+            return {}
+        placeholders = ', '.join(['%s'] * len(problem_hashes))
+        logs = self._execute_query(f"""
+            SELECT tgl.* FROM current_timetable ct
+            JOIN timetable_generation_log tgl ON tgl.log_id = ct.log_id
+            WHERE ct.section_id IN ({placeholders}) AND ct.status IN ('Success', 'Partial')
+        """, tuple(problem_hashes))
+        hits = {log['section_id']: log for log in logs if log.get('problem_hash') and log['problem_hash'] == problem_hashes.get(log['section_id'])}
+        if not hits:
+            return {}
+
+        results = {}
+        for section_id, log_id, raw_timetable in self.load_latest_timetables_raw(sorted(hits)):
+            log = hits[section_id]
+            if log_id != log['log_id']:
+                continue
+            section_info = sections[section_id]['section_info']
             generation_log = {
-                'constraints_violated': violations,
-                'total_slots_assigned': len(final_timetable),
-                'total_slots_required': self.problem_data.get('total_assignments_to_schedule', 0),
-                'generation_status': 'Partial' if violations or len(final_timetable) < self.problem_data.get('total_assignments_to_schedule', 0) else 'Success',
-                'generation_time_seconds': generation_time.total_seconds()
+                'constraints_violated': json.loads(log['constraints_violated'] or '[]'),
+                'total_slots_assigned': log['total_slots_assigned'],
+                'total_slots_required': log['total_slots_required'],
+                'generation_status': log['status'],
+                'generation_time_seconds': float(log['generation_time_seconds'] or 0),
+                'solver_stats': json.loads(log['solver_stats'] or '{}'),
+                'calendar_start': log['calendar_start'],
+                'calendar_end': log['calendar_end'],
+                'problem_hash': log['problem_hash'],
             }
-            
-            log_id = self.save_generation_log(section_id, generation_log)
-            self.save_timetable_to_db(log_id, {'raw_timetable': final_timetable})
-            
-            grid, timeslot_labels = self.format_timetable_grid(final_timetable, self.problem_data['all_timeslots'].values())
-            
-            return {
-                'status': generation_log['generation_status'],
+            results[section_id] = {
+                'status': log['status'],
                 'section_id': section_id,
-                'section_name': data['section_info']['name'],
-                'batch_id': data['section_info']['batch_id'],
-                'department': data['section_info']['department_name'],
+                'section_name': section_info['name'],
+                'batch_id': section_info['batch_id'],
+                'department': section_info['department_name'],
                 'generation_log': generation_log,
-                'raw_timetable': final_timetable,
-                'grid': grid,
-                'timeslot_labels': timeslot_labels,
-                'generation_seconds': generation_time.total_seconds(),
-                'generated_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'start_date': start_date,
-                'end_date': start_date + timedelta(days=6) if start_date else None,
-                'log_id': log_id
+                'raw_timetable': raw_timetable,
+                'start_date': log['calendar_start'],
+                'end_date': log['calendar_end'],
+                'log_id': log_id,
+                'cached': True,
             }
+        return results
+
+    def _semester_calendar(self, start_date, semester_weeks):
+        """
+        The span the generated weekly rows repeat over: `semester_weeks` weeks from
+        start_date (default today). Holidays are applied when the rows are read, so
+        editing the holiday list never needs a regeneration.
+        """
+        start_date = start_date or date.today()
+        return SemesterCalendar(start_date, start_date + timedelta(weeks=max(1, semester_weeks or 1), days=-1))
+
+    def _build_generation_log(self, final_timetable, violations, generation_seconds):
+        total_required = self.problem_data.get('total_assignments_to_schedule', 0)
+        return {
+            'constraints_violated': violations,
+            'total_slots_assigned': len(final_timetable),
+            'total_slots_required': total_required,
+            'generation_status': 'Partial' if violations or len(final_timetable) < total_required else 'Success',
+            'generation_time_seconds': generation_seconds,
+            'solver_stats': self.solver_stats,
+            'calendar_start': self.calendar.start_date,
+            'calendar_end': self.calendar.end_date
+        }
 
-        except Exception as e:
-            logger.error(f"Unexpected error in heuristic generation: {str(e)}", exc_info=True)
-            return {"error": f"Unexpected error: {str(e)}"}     
-    
     def _fetch_problem_data(self, section_id):
         """Fetches all data required for the scheduling problem."""
         section_info = self._execute_query("""
@@ -668,8 +2801,9 @@ class TimetableGenerator:
         if not section_info:
             return {"error": f"Section ID {section_id} not found."}
 
-        self.all_timeslots = self._execute_query("SELECT * FROM timeslots WHERE is_active = 1")
-        self.all_rooms = self._execute_query("SELECT * FROM rooms WHERE is_active = 1")
+        snapshot = get_problem_snapshot(self._execute_query)
+        self.all_timeslots = snapshot.timeslots
+        self.all_rooms = snapshot.rooms
 
         faculty_assignments = self._execute_query("""
             SELECT fs.*, bs.subject_id, s.name as subject_name, s.credits,
@@ -689,16 +2823,8 @@ class TimetableGenerator:
 
         all_assigned_faculty_ids = {fa['faculty_id'] for fa in faculty_assignments}
         
-        self.faculty_constraints = {}
-        for faculty_id in all_assigned_faculty_ids:
-            self.faculty_constraints[faculty_id] = self.get_faculty_constraints(faculty_id)
-
-        faculty_unavailability_data = self._execute_query("SELECT * FROM faculty_unavailability")
-        self.faculty_unavailability = defaultdict(list)
-        for ua in faculty_unavailability_data:
-            self.faculty_unavailability[(ua['faculty_id'], ua['day_of_week'])].append(ua)
-
-        self.holidays = set()
+        self.faculty_constraints = snapshot.faculty_constraints_for(all_assigned_faculty_ids, self.load_faculty_constraints_map)
+        self.faculty_unavailability = snapshot.faculty_unavailability
         
         return {
             'section_info': section_info,
@@ -709,8 +2835,90 @@ class TimetableGenerator:
             'faculty_assignments_raw': {fa['faculty_subject_id']: fa for fa in faculty_assignments},
             'faculty_constraints': self.faculty_constraints,
             'faculty_unavailability': self.faculty_unavailability,
+            'rooms_by_type': snapshot.rooms_by_type,
+            'room_capacities_by_type': snapshot.room_capacities_by_type,
         }
     
+    def _fetch_problem_data_for_sections(self, section_ids):
+        """
+        Batch counterpart of `_fetch_problem_data`: loads the shared reference data once and
+        the section/assignment rows for every section with a single IN query each.
+        """
+        if not section_ids:
+            return {"error": "No sections selected for generation."}
+        placeholders = ', '.join(['%s'] * len(section_ids))
+        params = tuple(section_ids)
+
+        section_rows = self._execute_query(f"""
+            SELECT s.section_id, s.name, s.batch_id, se.total_students, se.max_subsection_size,
+                b.academic_year_id, b.semester, d.name as department_name, ay.year_name, s.theory_room_id
+            FROM sections s
+            LEFT JOIN section_enrollment se ON s.section_id = se.section_id
+            JOIN batches b ON s.batch_id = b.batch_id
+            JOIN batch_departments bd ON b.batch_id = bd.batch_id
+            JOIN departments d ON bd.department_id = d.department_id
+            JOIN academic_years ay ON b.academic_year_id = ay.year_id
+            WHERE s.section_id IN ({placeholders})
+        """, params)
+        section_info_by_id = {}
+        for row in section_rows:
+            section_info_by_id.setdefault(row['section_id'], row)
+
+        snapshot = get_problem_snapshot(self._execute_query)
+        self.all_timeslots = snapshot.timeslots
+        self.all_rooms = snapshot.rooms
+
+        assignment_rows = self._execute_query(f"""
+            SELECT fs.*, bs.subject_id, s.name as subject_name, s.credits,
+                s.theory_sessions_per_week, s.lab_sessions_per_week,
+                u.name as faculty_name, s.subject_code, s.has_lab, s.lab_duration_hours,
+                s.is_lab_continuous,
+                bs.preferred_lab_room_id
+            FROM faculty_subjects fs
+            JOIN batch_subjects bs ON fs.batch_subject_id = bs.batch_subject_id
+            JOIN subjects s ON bs.subject_id = s.subject_id
+            JOIN users u ON fs.faculty_id = u.user_id
+            WHERE fs.section_id IN ({placeholders})
+        """, params)
+        assignments_by_section = defaultdict(list)
+        for fa in assignment_rows:
+            assignments_by_section[fa['section_id']].append(fa)
+
+        self.faculty_constraints = snapshot.faculty_constraints_for(
+            {fa['faculty_id'] for fa in assignment_rows}, self.load_faculty_constraints_map
+        )
+        self.faculty_unavailability = snapshot.faculty_unavailability
+
+        sections = {}
+        errors = {}
+        for section_id in section_ids:
+            section_info = section_info_by_id.get(section_id)
+            faculty_assignments = assignments_by_section.get(section_id)
+            if not section_info:
+                errors[section_id] = f"Section ID {section_id} not found."
+            elif not faculty_assignments:
+                errors[section_id] = f"No faculty assignments found for section {section_id}."
+            else:
+                sections[section_id] = {
+                    'section_info': section_info,
+                    'faculty_assignments': faculty_assignments,
+                    'all_timeslots': self.all_timeslots,
+                    'all_rooms': self.all_rooms,
+                    'all_rooms_list': self.all_rooms,
+                    'faculty_assignments_raw': {fa['faculty_subject_id']: fa for fa in faculty_assignments},
+                    'faculty_constraints': self.faculty_constraints,
+                    'faculty_unavailability': self.faculty_unavailability,
+                    'rooms_by_type': snapshot.rooms_by_type,
+                    'room_capacities_by_type': snapshot.room_capacities_by_type,
+                }
+
+        return {
+            'sections': sections,
+            'errors': errors,
+            'all_timeslots': self.all_timeslots,
+            'all_rooms': self.all_rooms,
+        }
+
     def _prepare_problem_data(self, data):
         """
         Prepares a list of all sessions to be scheduled, handling multiple faculty per subject.
@@ -719,7 +2927,7 @@ class TimetableGenerator:
         total_slots_to_schedule = 0
         
         # Group assignments by subject and batch
-        subject_groups = groupby(sorted(data['faculty_assignments'], key=lambda x: x['batch_subject_id']), 
+        subject_groups = groupby(sorted(data['faculty_assignments'], key=lambda x: (x['batch_subject_id'], x['faculty_subject_id'])), 
                                  key=lambda x: x['batch_subject_id'])
         
         for batch_subject_id, group in subject_groups:
@@ -778,7 +2986,7 @@ class TimetableGenerator:
              return {"error": "No sessions could be generated from faculty assignments. Check subject session counts in the database."}
 
         # Shuffle to prevent bias, then sort by duration descending to schedule multi-hour classes first
-        random.shuffle(assignments)
+        self.rng.shuffle(assignments)
         assignments.sort(key=lambda x: x['duration'], reverse=True)
 
         possible_slots = []
@@ -802,7 +3010,9 @@ class TimetableGenerator:
             'faculty_constraints': self.faculty_constraints,
             'faculty_unavailability': data['faculty_unavailability'],
             'day_map_rev': day_map_rev,
-            'faculty_assignments': data['faculty_assignments'] 
+            'faculty_assignments': data['faculty_assignments'],
+            'rooms_by_type': data['rooms_by_type'],
+            'room_capacities_by_type': data['room_capacities_by_type']
         }
 
     def _select_room(self, assignment):
@@ -830,97 +3040,167 @@ class TimetableGenerator:
 
     def _find_available_room_by_type(self, room_type, min_capacity):
         """Finds an available room of a specific type with sufficient capacity."""
-        suitable_rooms = [
-            room['room_id'] for room in self.problem_data['all_rooms_list']
-            if room['room_type'] == room_type and room['capacity'] >= min_capacity
-        ]
+        # rooms_by_type is sorted by capacity, so the suitable rooms are a suffix
+        rooms = self.problem_data['rooms_by_type'].get(room_type, [])
+        capacities = self.problem_data['room_capacities_by_type'].get(room_type, [])
+        suitable_rooms = [room['room_id'] for room in rooms[bisect_left(capacities, min_capacity or 0):]]
         if suitable_rooms:
-            return random.choice(suitable_rooms)
+            return self.rng.choice(suitable_rooms)
         return None
 
-    def _find_available_slot(self, assignment, room_id, occupied_slots):
+    def _register_faculty(self, occupancy, faculty_id):
+        """Hands a faculty member's constraints and unavailability windows to the occupancy tracker once."""
+        if occupancy.is_registered(faculty_id):
+            return
+        constraints = self.problem_data['faculty_constraints'].get(faculty_id) or FACULTY_CONSTRAINT_DEFAULTS
+        unavailability = []
+        for day_of_week in SlotOccupancy.DAYS_ORDER:
+            for ua in self.problem_data['faculty_unavailability'].get((faculty_id, day_of_week), []):
+                unavailability.append((day_of_week, _to_time(ua['start_time']), _to_time(ua['end_time'])))
+        occupancy.register_faculty(faculty_id, constraints, unavailability)
+
+    def _find_available_slot(self, assignment, room_id, occupancy, enforce_constraints=True):
         """
-        Finds a continuous block of time slots for an assignment, respecting all constraints.
+        Finds the start ordinals of every continuous block of time slots for an assignment
+        where the section, faculty and room are all free and the faculty's constraints hold.
         """
+        possible_starts = list(occupancy.iter_bits(self._free_start_mask(assignment, room_id, occupancy, enforce_constraints)))
+
+        self.rng.shuffle(possible_starts)
+        return possible_starts
+
+    def _free_start_mask(self, assignment, room_id, occupancy, enforce_constraints=True):
+        """Bitmask form of _find_available_slot."""
         required_duration = int(assignment['duration'])
-        faculty_id = assignment['faculty_id']
-        is_lab_required = assignment['is_lab']
-        is_continuous_lab = assignment['is_lab_continuous']
-        
-        possible_slots = []
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-        all_slots_by_day = defaultdict(list)
-        for ts in self.problem_data['all_timeslots'].values():
-            if isinstance(ts['start_time'], timedelta):
-                ts['start_time'] = (datetime.min + ts['start_time']).time()
-            if isinstance(ts['end_time'], timedelta):
-                ts['end_time'] = (datetime.min + ts['end_time']).time()
-            all_slots_by_day[ts['day_of_week']].append(ts)
-        
-        for day_index, day_of_week in enumerate(days_order):
-            day_slots = sorted(all_slots_by_day[day_of_week], key=lambda x: x['start_time'])
-            
-            if len(day_slots) < required_duration:
-                continue
+        is_continuous_lab = assignment['is_lab_continuous'] and required_duration > 1
+        return occupancy.free_starts(
+            self.problem_data['section_id'], assignment['faculty_id'], room_id,
+            required_duration, continuous=is_continuous_lab, enforce_constraints=enforce_constraints
+        )
 
-            for i in range(len(day_slots) - required_duration + 1):
-                slot_block = []
-                is_valid_block = True
-                
-                # Check for physical time continuity for the entire block if required
-                if is_continuous_lab and required_duration > 1:
-                    for j in range(required_duration - 1):
-                        current_end_time = day_slots[i+j]['end_time']
-                        next_start_time = day_slots[i+j+1]['start_time']
-                        if current_end_time != next_start_time:
-                            is_valid_block = False
-                            break
-                
-                if not is_valid_block:
-                    continue
 
-                # Now check for resource conflicts
-                for j in range(required_duration):
-                    next_slot = day_slots[i+j]
-                    slot_key = (day_index, next_slot['timeslot_id'])
+def solve_section_group(group, sections, all_timeslots, faculty_constraints, calendar, seed, solver_limits):
+    """
+    Process-pool entry point for TimetableGenerator._solve_section_group. `solver_limits`
+    is the parent's _solver_limits(), so a worker searches exactly as long as the parent would.
+    """
+    generator = TimetableGenerator(*solver_limits, seed=seed)
+    generator.faculty_constraints = faculty_constraints
+    return generator._solve_section_group(group, sections, all_timeslots, calendar)
 
-                    # Check for section conflict
-                    if occupied_slots['section'].get(slot_key):
-                        is_valid_block = False; break
-                    
-                    # Check for faculty conflict
-                    if slot_key in occupied_slots['faculty'].get(faculty_id, set()):
-                        is_valid_block = False; break
-                    
-                    # Check for room conflict
-                    if room_id in occupied_slots['room'].get(slot_key, set()):
-                        is_valid_block = False; break
-                    
-                    slot_block.append(slot_key)
-                
-                if is_valid_block:
-                    possible_slots.append(slot_block)
+_portfolio_stop_event = None
 
-        random.shuffle(possible_slots)
-        return possible_slots
+def _init_portfolio_worker(stop_event):
+    global _portfolio_stop_event
+    _portfolio_stop_event = stop_event
 
+def solve_section_attempt(section_id, data, calendar, faculty_constraints, seed, solver_limits):
+    """
+    Process-pool entry point for one seeded attempt of TimetableGenerator.generate_timetable_portfolio.
+    Returns (seed, attempt); `stopped` is set when the portfolio's stop signal came in during the attempt.
+    """
+    generator = TimetableGenerator(*solver_limits, seed=seed)
+    generator.calendar = calendar
+    generator.faculty_constraints = faculty_constraints
+    generator.stop_event = _portfolio_stop_event
+    attempt = generator._solve_single_section(section_id, data)
+    attempt['stopped'] = generator._stop_requested()
+    return seed, attempt
+
+def generate_timetable_portfolio_wrapper(section_id, start_date=None, semester_weeks=1, attempts=None, time_budget=None, seed=None):
+    try:
+        logger.info(f"Starting portfolio wrapper for section {section_id}")
+        generator = TimetableGenerator(seed=seed)
+        return generator.generate_timetable_portfolio(section_id, start_date, semester_weeks=semester_weeks,
+                                                      attempts=attempts, time_budget=time_budget)
+    except Exception as e:
+        logger.error(f"Portfolio wrapper function error: {str(e)}", exc_info=True)
+        return {"error": f"Unexpected error: {str(e)}"}
 
-def generate_timetable_wrapper(section_id, start_date=None, semester_weeks=1):
+def generate_timetable_wrapper(section_id, start_date=None, semester_weeks=1, seed=None):
     try:
         logger.info(f"Starting wrapper for section {section_id}")
-        generator = TimetableGenerator()
-        result = generator.generate_timetable_for_section(section_id, start_date, semester_weeks=1)
+        generator = TimetableGenerator(seed=seed)
+        result = generator.generate_timetable_for_section(section_id, start_date, semester_weeks=semester_weeks)
         return result
     except Exception as e:
         logger.error(f"Wrapper function error: {str(e)}", exc_info=True)
         return {"error": f"Unexpected error: {str(e)}"}
 
-def generate_csv_output(timetables_data_list):
+def repair_timetable_wrapper(section_id):
+    try:
+        logger.info(f"Starting repair wrapper for section {section_id}")
+        generator = TimetableGenerator()
+        return generator.repair_timetable_for_section(section_id)
+    except Exception as e:
+        logger.error(f"Repair wrapper function error: {str(e)}", exc_info=True)
+        return {"error": f"Unexpected error: {str(e)}"}
+
+def generate_timetables_batch_wrapper(section_ids, start_date=None, semester_weeks=1):
+    try:
+        logger.info(f"Starting batch wrapper for {len(section_ids)} sections")
+        generator = TimetableGenerator()
+        return generator.generate_timetables_for_sections(section_ids, start_date, semester_weeks=semester_weeks)
+    except Exception as e:
+        logger.error(f"Batch wrapper function error: {str(e)}", exc_info=True)
+        return {"error": f"Unexpected error: {str(e)}"}
+
+CSV_CHUNK_SIZE = 64 * 1024
+
+def stream_query_rows(query, params=None):
     """
-    Generates a CSV string from a list of raw timetable data for multiple sections.
-    Each section's timetable will be preceded by a descriptive header.
+    Yields dict rows for `query` from an unbuffered cursor on a pooled connection,
+    so a large export holds one row at a time instead of the whole result set.
+    The connection is drained and returned to the pool when the generator finishes
+    or is closed early.
+    """
+    conn = get_db_connection()
+    if not conn:
+        raise Error("Database connection failed")
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+    finally:
+        try:
+            cursor.fetchall()
+        except Error:
+            pass
+        cursor.close()
+        conn.close()
+
+def iter_csv_chunks(rows, header=None, fieldnames=None, chunk_size=CSV_CHUNK_SIZE):
+    """
+    Writes `rows` as CSV and yields the text in chunks of about `chunk_size`
+    characters. Rows are dicts when `fieldnames` is given (extra keys are ignored),
+    otherwise sequences; `header` defaults to `fieldnames`.
     """
     output = io.StringIO()
+    if fieldnames:
+        writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction='ignore')
+    else:
+        writer = csv.writer(output)
+    header = header or fieldnames
+    if header:
+        csv.writer(output).writerow(header)
+
+    for row in rows:
+        writer.writerow(row)
+        if output.tell() >= chunk_size:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+
+    remaining = output.getvalue()
+    if remaining:
+        yield remaining
+
+def iter_timetables_csv(timetables_data_list):
+    """
+    Yields the CSV for a list of raw timetable data for multiple sections, one
+    section at a time. Each section's timetable is preceded by a descriptive header.
+    """
     days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
 
     all_timeslot_strings = set()
@@ -935,6 +3215,7 @@ def generate_csv_output(timetables_data_list):
     header_row = ["Day"] + sorted_timeslot_strings
     
     for timetable_data in timetables_data_list:
+        output = io.StringIO()
         section_name = timetable_data['section_name']
         department_name = timetable_data['department']
         academic_year_display = f"Year {timetable_data.get('academic_year_int', 'N/A')}"
@@ -973,8 +3254,105 @@ def generate_csv_output(timetables_data_list):
                     row_data.append(content)
             output.write(",".join(row_data) + "\n")
 
-    return output.getvalue()
+        yield output.getvalue()
+
+def generate_csv_output(timetables_data_list):
+    """
+    Generates a CSV string from a list of raw timetable data for multiple sections.
+    Each section's timetable will be preceded by a descriptive header.
+    """
+    return "".join(iter_timetables_csv(timetables_data_list))
+
+DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+_DAY_NAME_LOOKUP = {}
+for _day in DAYS_OF_WEEK:
+    _DAY_NAME_LOOKUP[_day.lower()] = _day
+    _DAY_NAME_LOOKUP[_day[:3].lower()] = _day
+
+FACULTY_CONSTRAINT_DEFAULTS = {
+    'max_hours_per_week': 20,
+    'max_hours_per_day': 4,
+    'is_visiting_faculty': 0,
+    'available_days': ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'],
+    'min_weekly_hours': 0,
+    'max_weekly_hours': 20
+}
+
+def decode_available_days(raw_value, faculty_id=None):
+    """
+    Decodes the `available_days` JSON column into a list of full day names.
+    Accepts abbreviations ('Mon') and a plain comma-separated string; unknown
+    entries are dropped. Returns None when the value is empty or unusable.
+    """
+    if isinstance(raw_value, (bytes, bytearray)):
+        try:
+            raw_value = raw_value.decode('utf-8')
+        except UnicodeDecodeError:
+            logger.error(f"Failed to decode available_days for faculty {faculty_id}: {raw_value}")
+            return None
+    if not raw_value:
+        return None
+
+    try:
+        days = json.loads(raw_value)
+    except json.JSONDecodeError:
+        days = raw_value.split(',')
+    if isinstance(days, str):
+        days = days.split(',')
+    if not isinstance(days, list):
+        logger.warning(f"Invalid available_days for faculty {faculty_id}: {raw_value}. Ignoring it.")
+        return None
+
+    normalized = []
+    for day in days:
+        day_name = _DAY_NAME_LOOKUP.get(str(day).strip().lower())
+        if day_name and day_name not in normalized:
+            normalized.append(day_name)
+        elif not day_name and str(day).strip():
+            logger.warning(f"Unknown day '{day}' in available_days for faculty {faculty_id}. Ignoring it.")
+    return normalized or None
+
+def load_faculty_constraints(faculty_ids=None, apply_defaults=True):
+    """
+    Loads faculty_constraints rows (all of them, or only those for `faculty_ids`) with a
+    single query, decoding `available_days` once. With `apply_defaults`, missing values are
+    filled from FACULTY_CONSTRAINT_DEFAULTS.
+    """
+    if faculty_ids is not None:
+        faculty_ids = list(faculty_ids)
+        if not faculty_ids:
+            return []
+
+    query = """
+        SELECT fc.*, u.name AS faculty_name
+        FROM faculty_constraints fc
+        JOIN users u ON fc.faculty_id = u.user_id
+    """
+    params = None
+    if faculty_ids is not None:
+        query += f" WHERE fc.faculty_id IN ({', '.join(['%s'] * len(faculty_ids))})"
+        params = tuple(faculty_ids)
+    query += " ORDER BY u.name, fc.constraint_id"
+
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True, buffered=True)
+        try:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+            while cursor.nextset():
+                pass
+        finally:
+            cursor.close()
+
+    for row in rows:
+        row['available_days'] = decode_available_days(row.get('available_days'), row['faculty_id'])
+        if apply_defaults:
+            for key, default_value in FACULTY_CONSTRAINT_DEFAULTS.items():
+                if row.get(key) is None:
+                    row[key] = list(default_value) if isinstance(default_value, list) else default_value
+    return rows
 
+@cached_reference('schools')
 def get_schools():
     """Retrieves a list of all schools from the database."""
     with get_db_connection() as conn:
@@ -988,6 +3366,7 @@ def get_schools():
         finally:
             cursor.close()
 
+@cached_reference('departments')
 def get_departments_by_school(school_id):
     """Retrieves departments associated with a specific school."""
     with get_db_connection() as conn:
@@ -1005,6 +3384,7 @@ def get_departments_by_school(school_id):
         finally:
             cursor.close()
 
+@cached_reference('academic_years')
 def get_academic_years():
     """Retrieves all academic years from the database."""
     with get_db_connection() as conn:
@@ -1015,6 +3395,7 @@ def get_academic_years():
                 pass
             return result
 
+@cached_reference('batches')
 def get_semesters_by_year(year_id):
     """Retrieves distinct semesters available for a given academic year."""
     with get_db_connection() as conn:
@@ -1030,6 +3411,53 @@ def get_semesters_by_year(year_id):
                 pass
             return result
 
+@cached_reference('batches')
+def get_batch_years():
+    """Retrieves the distinct study years that have batches."""
+    with get_db_connection() as conn:
+        with conn.cursor(dictionary=True, buffered=True) as cursor:
+            cursor.execute("SELECT DISTINCT year FROM batches ORDER BY year")
+            result = cursor.fetchall()
+            while cursor.nextset():
+                pass
+            return result
+
+@cached_reference('batches')
+def get_batch_semesters():
+    """Retrieves the distinct semesters that have batches."""
+    with get_db_connection() as conn:
+        with conn.cursor(dictionary=True, buffered=True) as cursor:
+            cursor.execute("SELECT DISTINCT semester FROM batches ORDER BY semester")
+            result = cursor.fetchall()
+            while cursor.nextset():
+                pass
+            return result
+
+@cached_reference('rooms')
+def get_rooms_of_type(room_type):
+    """Retrieves the rooms of a given type for dropdowns."""
+    with get_db_connection() as conn:
+        with conn.cursor(dictionary=True, buffered=True) as cursor:
+            cursor.execute("SELECT room_id, room_number FROM rooms WHERE room_type = %s ORDER BY room_number", (room_type,))
+            result = cursor.fetchall()
+            while cursor.nextset():
+                pass
+            return result
+
+@cached_reference('holidays')
+def load_holidays(start_date, end_date):
+    """Retrieves the dates between start_date and end_date that are holidays affecting the timetable."""
+    with get_db_connection() as conn:
+        with conn.cursor(dictionary=True, buffered=True) as cursor:
+            cursor.execute("""
+                SELECT date FROM holidays
+                WHERE affects_timetable = 1 AND date BETWEEN %s AND %s
+            """, (start_date, end_date))
+            result = {row['date'] for row in cursor.fetchall()}
+            while cursor.nextset():
+                pass
+            return result
+
 def get_sections_by_filters(school_id=None, dept_id=None, year_id=None, semester=None):
     """
     Retrieves sections based on a combination of filters.
@@ -1184,7 +3612,7 @@ def get_subject_progress_for_department_and_semester(department_id, semester_num
 
     try:
         raw_data = TimetableGenerator()._execute_query(query, params, dictionary_cursor=True)
-        total_semester_weeks = (semester_end_date - semester_start_date).days // 7 + 1
+        total_semester_weeks = semester_week_count(semester_start_date, semester_end_date)
 
         subject_progress_summary = defaultdict(lambda: {
             'subject_id': None,
@@ -1250,3 +3678,141 @@ def get_subject_progress_for_department_and_semester(department_id, semester_num
     except Exception as e:
         logger.error(f"Unexpected error getting subject progress for department {department_id}: {e}", exc_info=True)
         return []
+
+# subject_progress rows with the department, year and semester of their batch,
+# in the shape stored in subject_progress_rollup (see migrations/006)
+SUBJECT_PROGRESS_ROLLUP_COLUMNS = (
+    'department_id', 'progress_id', 'section_id', 'batch_subject_id', 'faculty_id',
+    'year', 'semester', 'planned_sessions', 'completed_sessions'
+)
+SUBJECT_PROGRESS_ROLLUP_SOURCE = """
+    SELECT bd.department_id, sp.progress_id, sp.section_id, sp.batch_subject_id, sp.faculty_id,
+           b.year, b.semester, sp.planned_sessions, COALESCE(sp.completed_sessions, 0) AS completed_sessions
+    FROM subject_progress sp
+    JOIN sections sec ON sp.section_id = sec.section_id
+    JOIN batches b ON sec.batch_id = b.batch_id
+    JOIN batch_departments bd ON b.batch_id = bd.batch_id
+"""
+SUBJECT_PROGRESS_ROLLUP_INSERT = f"""
+    INSERT INTO subject_progress_rollup ({', '.join(SUBJECT_PROGRESS_ROLLUP_COLUMNS)})
+""" + SUBJECT_PROGRESS_ROLLUP_SOURCE
+
+def apply_completion_change(cursor, section_id, batch_subject_id, faculty_id, delta):
+    """
+    Moves completed_sessions for a section/subject/faculty by `delta` (+1 when a
+    lecture is marked completed, -1 when that is undone or the class is cancelled)
+    and copies the new count into subject_progress_rollup. Progress is tracked per
+    assignment, so `faculty_id` is the entry's assigned faculty even when a
+    substitute taught the class: that is the subject_progress row that exists.
+    Runs on the caller's cursor so it commits or rolls back with the timetable
+    change itself. Returns False, with a warning, when there is no progress row.
+    """
+    cursor.execute("""
+        UPDATE subject_progress
+        SET completed_sessions = GREATEST(COALESCE(completed_sessions, 0) + %s, 0)
+        WHERE section_id = %s AND batch_subject_id = %s AND faculty_id = %s
+    """, (delta, section_id, batch_subject_id, faculty_id))
+    if cursor.rowcount == 0:
+        # Also 0 when the count was already at its floor, so tell that apart
+        cursor.execute("""
+            SELECT progress_id FROM subject_progress
+            WHERE section_id = %s AND batch_subject_id = %s AND faculty_id = %s LIMIT 1
+        """, (section_id, batch_subject_id, faculty_id))
+        if not cursor.fetchall():
+            logger.warning(f"No subject_progress row for section {section_id}, batch subject {batch_subject_id}, "
+                           f"faculty {faculty_id}; completion change of {delta:+d} not recorded")
+            return False
+    cursor.execute(SUBJECT_PROGRESS_ROLLUP_INSERT + """
+        WHERE sp.section_id = %s AND sp.batch_subject_id = %s AND sp.faculty_id = %s
+        ON DUPLICATE KEY UPDATE planned_sessions = VALUES(planned_sessions), completed_sessions = VALUES(completed_sessions)
+    """, (section_id, batch_subject_id, faculty_id))
+    return True
+
+def check_progress_rollup(repair=False):
+    """
+    Recomputes subject_progress_rollup from subject_progress and diffs it against
+    the stored table. Returns the row count checked and the (department_id,
+    progress_id) keys that are missing, extra or hold different values. With
+    `repair`, a table that has drifted is rebuilt from scratch.
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor(dictionary=True, buffered=True)
+        try:
+            cursor.execute(SUBJECT_PROGRESS_ROLLUP_SOURCE)
+            expected = {(row['department_id'], row['progress_id']): row for row in cursor.fetchall()}
+            cursor.execute(f"SELECT {', '.join(SUBJECT_PROGRESS_ROLLUP_COLUMNS)} FROM subject_progress_rollup")
+            stored = {(row['department_id'], row['progress_id']): row for row in cursor.fetchall()}
+
+            mismatched = []
+            for key in sorted(expected.keys() & stored.keys()):
+                differences = {
+                    column: {'expected': expected[key][column], 'stored': stored[key][column]}
+                    for column in SUBJECT_PROGRESS_ROLLUP_COLUMNS
+                    if expected[key][column] != stored[key][column]
+                }
+                if differences:
+                    mismatched.append({'department_id': key[0], 'progress_id': key[1], 'differences': differences})
+            missing = [{'department_id': key[0], 'progress_id': key[1]} for key in sorted(expected.keys() - stored.keys())]
+            extra = [{'department_id': key[0], 'progress_id': key[1]} for key in sorted(stored.keys() - expected.keys())]
+
+            repaired = False
+            if repair and (missing or extra or mismatched):
+                cursor.execute("DELETE FROM subject_progress_rollup")
+                cursor.execute(SUBJECT_PROGRESS_ROLLUP_INSERT)
+                conn.commit()
+                repaired = True
+                logger.warning(f"Rebuilt subject_progress_rollup: {len(missing)} missing, {len(extra)} extra, {len(mismatched)} mismatched rows")
+        except mysql.connector.Error as e:
+            conn.rollback()
+            logger.error(f"Database error checking subject_progress_rollup: {e}", exc_info=True)
+            raise
+        finally:
+            cursor.close()
+
+    return {
+        'checked': len(expected),
+        'consistent': not (missing or extra or mismatched),
+        'missing': missing,
+        'extra': extra,
+        'mismatched': mismatched,
+        'repaired': repaired
+    }
+
+# Per-date overrides a timetable_exception row carries (see migrations/008)
+TIMETABLE_EXCEPTION_FIELDS = ('is_cancelled', 'is_completed', 'is_rescheduled', 'faculty_id', 'cancellation_id')
+
+def load_timetable_exception(cursor, entry_id, exception_date):
+    """
+    Locks and returns the exception of timetable entry `entry_id` on
+    `exception_date` as a dict, or None when that occurrence runs as scheduled.
+    """
+    cursor.execute(f"""
+        SELECT {', '.join(TIMETABLE_EXCEPTION_FIELDS)} FROM timetable_exception
+        WHERE entry_id = %s AND exception_date = %s FOR UPDATE
+    """, (entry_id, exception_date))
+    row = cursor.fetchone()
+    if row is not None and not isinstance(row, dict):
+        row = dict(zip(TIMETABLE_EXCEPTION_FIELDS, row))
+    return row
+
+def set_timetable_exception(cursor, entry_id, exception_date, **overrides):
+    """
+    Sets `overrides` (fields from TIMETABLE_EXCEPTION_FIELDS) on one dated
+    occurrence of a timetable entry, keeping the exception's other fields. An
+    exception that is back to the template's state is deleted, so the table only
+    holds occurrences that differ. Runs on the caller's cursor and transaction.
+    """
+    unknown = set(overrides) - set(TIMETABLE_EXCEPTION_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown timetable exception fields: {sorted(unknown)}")
+    columns = ', '.join(overrides)
+    cursor.execute(f"""
+        INSERT INTO timetable_exception (entry_id, exception_date, {columns})
+        VALUES (%s, %s, {', '.join(['%s'] * len(overrides))})
+        ON DUPLICATE KEY UPDATE {', '.join(f"{column} = VALUES({column})" for column in overrides)}
+    """, (entry_id, exception_date) + tuple(overrides.values()))
+    cursor.execute("""
+        DELETE FROM timetable_exception
+        WHERE entry_id = %s AND exception_date = %s AND is_cancelled = 0 AND is_completed = 0
+          AND is_rescheduled = 0 AND faculty_id IS NULL AND cancellation_id IS NULL
+    """, (entry_id, exception_date))
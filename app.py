@@ -4,19 +4,22 @@ import mysql.connector
 from mysql.connector import Error
 import json
 import logging
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, time
 from functools import wraps
+from itertools import chain, islice
 import openpyxl
-import csv
-import io
 import os
-from openpyxl.styles import Alignment
+import base64
+import zlib
+import tempfile
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font
 from openpyxl.utils import get_column_letter
-import pandas as pd
-from pandas import ExcelWriter
 from decimal import Decimal
 from advanced_timetable_logic import (
     generate_timetable_wrapper,
+    generate_timetable_portfolio_wrapper,
+    repair_timetable_wrapper,
     get_schools,
     get_departments_by_school,
     get_academic_years,
@@ -27,8 +30,26 @@ from advanced_timetable_logic import (
     TimetableGenerator,
     get_semester_dates_by_school,
     get_subject_progress_for_department_and_semester,
-    generate_csv_output
+    iter_timetables_csv,
+    iter_csv_chunks,
+    stream_query_rows,
+    get_db_connection,
+    get_pool_metrics,
+    invalidate_reference_data,
+    get_reference_version,
+    load_faculty_constraints,
+    get_batch_years,
+    get_batch_semesters,
+    get_rooms_of_type,
+    get_reference_cache_stats,
+    apply_completion_change,
+    check_progress_rollup,
+    semester_week_count,
+    timetable_occurrence_key,
+    load_timetable_exception,
+    set_timetable_exception
 )
+from generation_jobs import GenerationJobQueue
 # Placeholder for a separate DB configuration file (as in app1.py)
 class DBConfig:
     DB_HOST = '127.0.0.1'
@@ -56,28 +77,10 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# --- UTILITY FUNCTIONS ---
+# Background timetable generation; workers start on the first request in each process
+generation_job_queue = GenerationJobQueue()
 
-def get_db_connection():
-    """Establishes and returns a database connection using the centralized config."""
-    try:
-        conn = mysql.connector.connect(
-            host=db_config['host'],
-            user=db_config['user'],
-            password=db_config['password'],
-            database=db_config['database'],
-            autocommit=False,
-            charset='utf8mb4',
-            collation='utf8mb4_unicode_ci'
-        )
-        if conn.is_connected():
-            return conn
-        else:
-            print("Failed to establish database connection")
-            return None
-    except Error as e:
-        print(f"Error connecting to MySQL: {e}")
-        return None
+# --- UTILITY FUNCTIONS ---
 
 def login_required(role=None):
     """
@@ -107,13 +110,33 @@ def login_required(role=None):
         return decorated_view
     return wrapper
 
+# Upper bound on how long a session keeps school details edited through another process
+SESSION_SCHOOL_MAX_AGE = timedelta(minutes=5)
+
+def get_session_school():
+    """
+    Returns the row for session['school_id'], kept in the session with a stamp of
+    the schools table version so templates do not query schools on every render.
+    """
+    school_id = session['school_id']
+    cached = session.get('current_school')
+    stamp = session.get('current_school_stamp')
+    if (cached and cached.get('school_id') == school_id and stamp
+            and stamp[0] == get_reference_version('schools')
+            and datetime.now().timestamp() - stamp[1] < SESSION_SCHOOL_MAX_AGE.total_seconds()):
+        return cached
+
+    school = next((s for s in get_schools() if s['school_id'] == school_id), None)
+    session['current_school'] = school
+    session['current_school_stamp'] = [get_reference_version('schools'), datetime.now().timestamp()]
+    return school
+
 @app.context_processor
 def inject_globals():
     """Injects global variables into all templates."""
     current_school_obj = None
     if 'school_id' in session:
-        schools = get_schools() 
-        current_school_obj = next((s for s in schools if s['school_id'] == session['school_id']), None)
+        current_school_obj = get_session_school()
 
     return dict(
         current_school=current_school_obj, 
@@ -490,8 +513,16 @@ def generation_logs():
 @login_required('academic_coordinator')
 def generate_timetable():
     try:
-        section_id = request.form.get("section_id") if request.method == 'POST' else request.args.get("section_id")
-        logger.info(f"Request to GENERATE timetable for section_id: {section_id}")
+        params = request.form if request.method == 'POST' else request.args
+        section_id = params.get("section_id")
+        # mode=incremental repairs the current timetable instead of solving it again
+        mode = params.get("mode") or 'full'
+        # The same seed on unchanged input returns the stored timetable; a new one solves again
+        seed = params.get("seed", type=int)
+        # attempts > 1 runs that many seeded attempts in parallel and keeps the best
+        attempts = params.get("attempts", type=int) or 1
+        time_budget = params.get("time_budget", type=float)
+        logger.info(f"Request to GENERATE timetable for section_id: {section_id} (mode: {mode})")
         
         if not section_id:
             flash("Please select a section to generate timetable.", "error")
@@ -515,13 +546,33 @@ def generate_timetable():
             return redirect(url_for('academic_coordinator_dashboard'))
 
         semester_start_date = semester_info['start_date']
-        result = generate_timetable_wrapper(section_id, start_date=semester_start_date, semester_weeks=1)
+        semester_weeks = semester_week_count(semester_start_date, semester_info['end_date'])
+        if mode == 'incremental':
+            result = repair_timetable_wrapper(section_id)
+        elif attempts > 1:
+            result = generate_timetable_portfolio_wrapper(section_id, start_date=semester_start_date, semester_weeks=semester_weeks,
+                                                          attempts=attempts, time_budget=time_budget, seed=seed)
+        else:
+            result = generate_timetable_wrapper(section_id, start_date=semester_start_date, semester_weeks=semester_weeks, seed=seed)
         
         if "error" in result:
             error_type = "warning" if "partial" in result['error'].lower() else "error"
             flash(f"Generation process encountered issues: {result['error']}", error_type)
             if not result.get('raw_timetable') or not result.get('log_id'): 
                 return redirect(url_for('academic_coordinator_dashboard'))
+        elif 'repair' in result:
+            repair = result['repair']
+            if result['changed']:
+                flash(f"Timetable repaired: {repair['moved']} sessions moved, {repair['reassigned']} reassigned, "
+                      f"{repair['added']} added, {repair['removed'] + repair['dropped']} removed.", "info")
+            else:
+                flash("The current timetable is still valid. Nothing needed repairing.", "info")
+        elif 'portfolio' in result:
+            portfolio = result['portfolio']
+            flash(f"Kept the best of {portfolio['finished']} attempts (seed {portfolio['winner_seed']}); "
+                  f"{portfolio['cancelled']} attempts were cancelled.", "info")
+        elif result.get('cached'):
+            flash("Nothing changed since the last generation, so the stored timetable was loaded.", "info")
         else:
             flash("Timetable generation completed successfully!", "info")
         
@@ -617,13 +668,9 @@ def view_timetable(section_id):
         logger.info(f"Request to VIEW latest timetable for section_id: {section_id}")
         
         generator = TimetableGenerator()
-        latest_log_query = """
-            SELECT log_id FROM timetable_generation_log
-            WHERE section_id = %s
-            ORDER BY generation_date DESC
-            LIMIT 1
-        """
-        latest_log_entry = generator._execute_query(latest_log_query, (section_id,), fetch_one=True)
+        latest_log_entry = generator._execute_query(
+            "SELECT log_id FROM current_timetable WHERE section_id = %s", (section_id,), fetch_one=True
+        )
 
         if not latest_log_entry:
             flash(f"No timetable generation found for section {section_id}. Please generate one first.", "error")
@@ -685,6 +732,142 @@ def view_timetable(section_id):
 
 # ... (other code) ...
 
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXPORT_DAYS_ORDER = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+def _timeslot_label(entry):
+    return f"{entry['start_time'].strftime('%H:%M')}-{entry['end_time'].strftime('%H:%M')}"
+
+def _build_excel_grid(raw_data, timeslot_strings):
+    """
+    Turns one section's raw timetable rows into a {time_slot: {day: text}} grid
+    keyed by the given (sorted) timeslot strings.
+    """
+    grid = {time_slot: {day: "" for day in EXPORT_DAYS_ORDER} for time_slot in timeslot_strings}
+    for entry in raw_data:
+        faculty_name = entry.get('faculty_name', 'Unassigned')
+        room_number = entry.get('room_number', 'N/A')
+        cell_content = f"{entry['subject_name']}\n({faculty_name})\nRoom: {room_number}"
+        if entry['is_lab_session']:
+            cell_content += "\n(LAB)"
+
+        cell = grid[_timeslot_label(entry)]
+        day = entry['day_of_week']
+        cell[day] = f"{cell[day]} / {cell_content}" if cell[day] else cell_content
+    return grid
+
+def _write_timetable_sheet(workbook, section_name, grid, width_for):
+    """
+    Appends one section's grid to a write-only workbook. Column widths and row
+    heights have to be set before any row is written, so they are worked out
+    from the grid first; cells are formatted as they are appended.
+    """
+    sheet_name = section_name.replace("/", "_").replace(":", "_").replace("*", "_")[:31]
+    worksheet = workbook.create_sheet(title=sheet_name)
+
+    worksheet.column_dimensions['A'].width = 15
+    for col_idx, day in enumerate(EXPORT_DAYS_ORDER, start=2):
+        max_length = max(
+            (len(line) for cells in grid.values() for line in cells[day].split('\n')),
+            default=0
+        )
+        max_length = max(max_length, len(day))
+        worksheet.column_dimensions[get_column_letter(col_idx)].width = width_for(max_length)
+
+    alignment = Alignment(wrap_text=True, vertical='top')
+    header_font = Font(bold=True)
+
+    def styled(value, bold=False):
+        cell = WriteOnlyCell(worksheet, value=value)
+        cell.alignment = alignment
+        if bold:
+            cell.font = header_font
+        return cell
+
+    for row_idx in range(1, len(grid) + 2):
+        worksheet.row_dimensions[row_idx].height = 60
+
+    worksheet.append([styled(header, bold=True) for header in ['Time'] + EXPORT_DAYS_ORDER])
+    for time_slot, cells in grid.items():
+        worksheet.append([styled(time_slot, bold=True)] + [styled(cells[day]) for day in EXPORT_DAYS_ORDER])
+
+def _stream_workbook(workbook, filename):
+    """
+    Saves a write-only workbook to a temporary file and streams it back in
+    chunks, so the finished file is never held in memory as a whole.
+    """
+    tmp = tempfile.NamedTemporaryFile(suffix='.xlsx', delete=False)
+    tmp.close()
+    try:
+        workbook.save(tmp.name)
+        file_size = os.path.getsize(tmp.name)
+    except Exception:
+        os.remove(tmp.name)
+        raise
+
+    f = open(tmp.name, 'rb')
+
+    def generate():
+        while True:
+            chunk = f.read(EXPORT_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+    response = Response(
+        generate(),
+        mimetype=XLSX_MIMETYPE,
+        headers={
+            'Content-Disposition': f'attachment;filename={filename}',
+            'Content-Length': str(file_size)
+        }
+    )
+
+    # The server closes the response even when the client disconnects before
+    # the body is read, so the file is removed either way
+    @response.call_on_close
+    def remove_tmp():
+        f.close()
+        os.remove(tmp.name)
+
+    return response
+
+def _gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def csv_response(chunks, filename):
+    """
+    Streams CSV text chunks back as a download. The body is gzip-compressed on
+    the fly when the client accepts it; either way nothing is buffered beyond
+    the chunk being sent.
+    """
+    headers = {
+        'Content-Disposition': f'attachment; filename={filename}',
+        'Vary': 'Accept-Encoding'
+    }
+    if request.accept_encodings.quality('gzip') > 0:
+        chunks = _gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(chunks, mimetype='text/csv', headers=headers)
+
+def first_or_none(rows):
+    """
+    Pulls the first row off a row stream so a route can answer "no data" before
+    it starts streaming. Returns (None, None) for an empty stream, otherwise the
+    first row and an iterator over all rows.
+    """
+    first_row = next(rows, None)
+    if first_row is None:
+        rows.close()
+        return None, None
+    return first_row, chain([first_row], rows)
+
 @app.route("/export_single_timetable_xlsx/<int:log_id>")
 @login_required('academic_coordinator')
 def export_single_timetable_xlsx(log_id):
@@ -699,92 +882,15 @@ def export_single_timetable_xlsx(log_id):
             flash("No timetable data found for this log ID.", "warning")
             return redirect(url_for('generation_logs'))
 
-        output = io.BytesIO()
-        writer = pd.ExcelWriter(output, engine='openpyxl')
-        
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-
-        # Get all unique timeslot strings for the header
-        all_timeslot_strings = set()
-        for entry in raw_data:
-            start_time = entry['start_time'].strftime('%H:%M')
-            end_time = entry['end_time'].strftime('%H:%M')
-            all_timeslot_strings.add(f"{start_time}-{end_time}")
-        
-        sorted_timeslot_strings = sorted(list(all_timeslot_strings))
-
+        sorted_timeslot_strings = sorted({_timeslot_label(entry) for entry in raw_data})
         section_name = raw_data[0]['section_name']
-        
-        grid_for_excel = {time_slot: {day: "" for day in days_order} for time_slot in sorted_timeslot_strings}
-        
-        for entry in raw_data:
-            day = entry['day_of_week']
-            start_time = entry['start_time'].strftime('%H:%M')
-            end_time = entry['end_time'].strftime('%H:%M')
-            time_key = f"{start_time}-{end_time}"
-            
-            faculty_name = entry.get('faculty_name', 'Unassigned')
-            room_number = entry.get('room_number', 'N/A')
-            subject_name = entry['subject_name']
-            is_lab = entry['is_lab_session']
-            
-            cell_content = f"{subject_name}\n({faculty_name})\nRoom: {room_number}"
-            if is_lab:
-                cell_content += "\n(LAB)"
-
-            if grid_for_excel[time_key][day]:
-                grid_for_excel[time_key][day] += f" / {cell_content}"
-            else:
-                grid_for_excel[time_key][day] = cell_content
-        
-        df = pd.DataFrame(grid_for_excel).T
-        df.index.name = "Time"
-        df.columns = days_order
-        
-        sheet_name = section_name.replace("/", "_").replace(":", "_").replace("*", "_")
-        df.to_excel(writer, sheet_name=sheet_name)
-        
-        writer.close()
-        output.seek(0)
-        
-        workbook = openpyxl.load_workbook(output)
-        worksheet = workbook.active
-        
-        for row in worksheet.iter_rows():
-            worksheet.row_dimensions[row[0].row].height = 60
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=True, vertical='top')
 
-        for col_idx, col_name in enumerate(['Time'] + days_order):
-            column_letter = get_column_letter(col_idx + 1)
-            max_length = 0
-            for cell in worksheet[column_letter]:
-                try:
-                    if cell.value:
-                        lines = str(cell.value).split('\n')
-                        line_lengths = [len(line) for line in lines]
-                        if line_lengths:
-                            max_length = max(max_length, max(line_lengths))
-                except:
-                    pass
-            
-            adjusted_width = max_length + 2
-            if col_name == 'Time':
-                worksheet.column_dimensions[column_letter].width = 15
-            else:
-                worksheet.column_dimensions[column_letter].width = max(adjusted_width, 20)
-
-        output_formatted = io.BytesIO()
-        workbook.save(output_formatted)
-        output_formatted.seek(0)
-
-        filename = f"{section_name}_Timetable.xlsx"
-        
-        return Response(
-            output_formatted.getvalue(),
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment;filename={filename}'}
+        workbook = openpyxl.Workbook(write_only=True)
+        _write_timetable_sheet(
+            workbook, section_name, _build_excel_grid(raw_data, sorted_timeslot_strings),
+            width_for=lambda max_length: max(max_length + 2, 20)
         )
+        return _stream_workbook(workbook, f"{section_name}_Timetable.xlsx")
 
     except Exception as e:
         logger.error(f"Error during single XLSX export for log ID {log_id}: {str(e)}", exc_info=True)
@@ -823,112 +929,32 @@ def export_timetables_xlsx():
             flash("No sections found for the selected filters to export.", "warning")
             return redirect(url_for('academic_coordinator_dashboard'))
 
-        output = io.BytesIO()
-        writer = pd.ExcelWriter(output, engine='openpyxl')
         generator = TimetableGenerator()
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
 
         all_timeslot_strings = set()
-        all_raw_data = []
-        for section in sections_to_export:
-            section_id = section['section_id']
-            latest_log_query = """
-                SELECT log_id FROM timetable_generation_log
-                WHERE section_id = %s AND (status = 'Success' OR status = 'Partial')
-                ORDER BY generation_date DESC
-                LIMIT 1
-            """
-            latest_log_entry = generator._execute_query(latest_log_query, (section_id,), fetch_one=True)
-
-            if latest_log_entry:
-                log_id = latest_log_entry['log_id']
-                raw_data = generator.load_specific_timetable_raw(log_id)
-                if raw_data:
-                    all_raw_data.append(raw_data)
-                    for entry in raw_data:
-                        start_time = entry['start_time'].strftime('%H:%M')
-                        end_time = entry['end_time'].strftime('%H:%M')
-                        all_timeslot_strings.add(f"{start_time}-{end_time}")
-
-        if not all_raw_data:
+        raw_data_by_section = {}
+        section_ids = [section['section_id'] for section in sections_to_export]
+        for section_id, log_id, raw_data in generator.load_latest_timetables_raw(section_ids):
+            raw_data_by_section[section_id] = raw_data
+            all_timeslot_strings.update(_timeslot_label(entry) for entry in raw_data)
+
+        if not any(raw_data_by_section.values()):
             flash("No generated timetables found for the selected criteria to export.", "warning")
             return redirect(url_for('academic_coordinator_dashboard'))
 
-        sorted_timeslot_strings = sorted(list(all_timeslot_strings))
-        
-        for raw_data in all_raw_data:
+        sorted_timeslot_strings = sorted(all_timeslot_strings)
+
+        # Every sheet shares the department-wide time column; each one is written
+        # in a single pass and the raw rows are dropped as soon as it is done
+        workbook = openpyxl.Workbook(write_only=True)
+        for section_id in section_ids:
+            raw_data = raw_data_by_section.pop(section_id, None)
             if not raw_data:
                 continue
-
-            section_name = raw_data[0]['section_name']
-            
-            grid_for_excel = {time_slot: {day: "" for day in days_order} for time_slot in sorted_timeslot_strings}
-            
-            for entry in raw_data:
-                day = entry['day_of_week']
-                start_time = entry['start_time'].strftime('%H:%M')
-                end_time = entry['end_time'].strftime('%H:%M')
-                time_key = f"{start_time}-{end_time}"
-
-                faculty_name = entry.get('faculty_name', 'Unassigned')
-                room_number = entry.get('room_number', 'N/A')
-                subject_name = entry['subject_name']
-                is_lab = entry['is_lab_session']
-                
-                cell_content = f"{subject_name}\n({faculty_name})\nRoom: {room_number}"
-                if is_lab:
-                    cell_content += "\n(LAB)"
-
-                if grid_for_excel[time_key][day]:
-                    grid_for_excel[time_key][day] += f" / {cell_content}"
-                else:
-                    grid_for_excel[time_key][day] = cell_content
-            
-            df = pd.DataFrame(grid_for_excel).T
-            df.index.name = "Time"
-            df.columns = days_order
-            
-            sheet_name = section_name.replace("/", "_").replace(":", "_").replace("*", "_")
-            df.to_excel(writer, sheet_name=sheet_name)
-        
-        writer.close()
-        output.seek(0)
-        
-        workbook = openpyxl.load_workbook(output)
-        
-        for sheet_name in workbook.sheetnames:
-            worksheet = workbook[sheet_name]
-            
-            # Set a standard height for all rows
-            for row in worksheet.iter_rows():
-                worksheet.row_dimensions[row[0].row].height = 60
-            
-            # Adjust column widths and apply text wrapping
-            for col in range(1, len(days_order) + 2): # +2 for the 'Time' column and 0-based index
-                column_letter = get_column_letter(col)
-                max_length = 0
-                for cell in worksheet[column_letter]:
-                    cell.alignment = Alignment(wrap_text=True, vertical='top')
-                    try:
-                        if cell.value:
-                            # Calculate max length based on lines
-                            lines = str(cell.value).split('\n')
-                            line_lengths = [len(line) for line in lines]
-                            if line_lengths:
-                                max_length = max(max_length, max(line_lengths))
-                    except:
-                        pass
-                
-                # Set a minimum width and adjust for content
-                adjusted_width = (max_length + 2) if max_length > 15 else 20
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-
-            # Set a specific width for the Time column
-            worksheet.column_dimensions['A'].width = 15
-        
-        output_formatted = io.BytesIO()
-        workbook.save(output_formatted)
-        output_formatted.seek(0)
+            _write_timetable_sheet(
+                workbook, raw_data[0]['section_name'], _build_excel_grid(raw_data, sorted_timeslot_strings),
+                width_for=lambda max_length: (max_length + 2) if max_length > 15 else 20
+            )
 
         filename_parts = [session.get('school_abbr', 'Timetable')]
         if department_id:
@@ -939,14 +965,9 @@ def export_timetables_xlsx():
             filename_parts.append(year_name.replace(" ", "_"))
         if semester:
             filename_parts.append(f"Sem_{semester}")
-        
+
         filename = "_".join(filename_parts) + "_Timetables.xlsx"
-        
-        return Response(
-            output_formatted.getvalue(),
-            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment;filename={filename}'}
-        )
+        return _stream_workbook(workbook, filename)
 
     except Exception as e:
         logger.error(f"Error during XLSX export: {str(e)}", exc_info=True)
@@ -988,73 +1009,73 @@ def bulk_generate():
             return redirect(url_for('academic_coordinator_dashboard'))
 
         semester_start_date = semester_info['start_date']
+        semester_weeks = semester_week_count(semester_start_date, semester_info['end_date'])
         
-        results = []
-        generator = TimetableGenerator()
-
-        for section in sections_to_generate:
-            section_id = section['section_id']
-            section_name = section['section_name']
-            department_name = section['department_name']
-            academic_year_val = section.get('academic_year')
-            semester_val = section.get('semester')
-
-            logger.info(f"Starting bulk generation for section: {section_name} (ID: {section_id}) in Dept: {department_name}, Year: {academic_year_val}, Sem: {semester_val}")
-            
-            try:
-                generation_result = generate_timetable_wrapper(section_id, start_date=semester_start_date, semester_weeks=1)
-                
-                if 'generation_log' not in generation_result:
-                     generation_result['generation_log'] = {
-                        'total_slots_required': 0,
-                        'total_slots_assigned': 0,
-                        'constraints_violated': [generation_result.get('error', 'Unknown error during bulk generation.')],
-                        'generation_status': 'Failed'
-                    }
-
-                if 'log_id' not in generation_result:
-                    generation_result['log_id'] = None
-                    generation_result['generation_log']['generation_status'] = 'Failed'
-                    generation_result['generation_log']['constraints_violated'].append("Failed to retrieve generation log ID.")
-
-                results.append({
-                    'section_id': section_id,
-                    'section_name': section_name,
-                    'department_name': department_name,
-                    'academic_year': academic_year_val,
-                    'semester': semester_val,
-                    'status': generation_result['generation_log']['generation_status'],
-                    'error': generation_result.get('error'),
-                    'details': {
-                        'total_slots_assigned': generation_result['generation_log'].get('total_slots_assigned', 0),
-                        'total_slots_required': generation_result['generation_log'].get('total_slots_required', 0),
-                        'constraints_violated': generation_result['generation_log'].get('constraints_violated', [])
-                    },
-                    'log_id': generation_result.get('log_id')
-                })
-
-            except Exception as e:
-                logger.error(f"Error during bulk generation for section {section_id}: {str(e)}", exc_info=True)
-                results.append({
-                    'section_id': section_id,
-                    'section_name': section_name,
-                    'department_name': department_name,
-                    'academic_year': academic_year_val,
-                    'semester': semester_val,
-                    'status': 'Failed',
-                    'error': f"System error: {str(e)}",
-                    'details': {'total_slots_assigned': 0, 'total_slots_required': 0, 'constraints_violated': []},
-                    'log_id': None
-                })
-        
-        flash(f"Bulk generation completed for {len(sections_to_generate)} sections. See results below.", "info")
-        return render_template("bulk_results.html", results=results)
+        job_id = generation_job_queue.enqueue(sections_to_generate, start_date=semester_start_date, created_by=session.get('user_id'), semester_weeks=semester_weeks)
+        flash(f"Bulk generation queued for {len(sections_to_generate)} sections. Results will appear below as each section completes.", "info")
+        return render_template("bulk_results.html", results=generation_job_queue.get_job(job_id)['results'], job_id=job_id)
 
     except Exception as e:
         logger.error(f"Error in bulk_generate route: {str(e)}", exc_info=True)
         flash(f"An unexpected error occurred during bulk generation: {str(e)}", "error")
         return redirect(url_for('academic_coordinator_dashboard'))
 
+@app.route("/api/generation_jobs", methods=['POST'])
+@login_required('academic_coordinator')
+def api_create_generation_job():
+    try:
+        payload = request.get_json(silent=True) or request.form.to_dict()
+        school_id = payload.get('school_id')
+        department_id = payload.get('department_id')
+        year_id = payload.get('year_id')
+        semester = payload.get('semester')
+
+        if not all([school_id, department_id]):
+            return jsonify({"error": "school_id and department_id are required."}), 400
+
+        sections = get_sections_by_filters(
+            school_id=int(school_id),
+            dept_id=int(department_id),
+            year_id=int(year_id) if year_id else None,
+            semester=int(semester) if semester else None
+        )
+        section_ids = payload.get('section_ids')
+        if section_ids:
+            section_ids = {int(section_id) for section_id in section_ids}
+            sections = [section for section in sections if section['section_id'] in section_ids]
+        if not sections:
+            return jsonify({"error": "No sections found for the selected filters."}), 404
+
+        semester_info = get_semester_dates_by_school(int(school_id))
+        if not semester_info:
+            return jsonify({"error": "Semester configuration not found for this school."}), 404
+
+        job_id = generation_job_queue.enqueue(
+            sections, start_date=semester_info['start_date'], created_by=session.get('user_id'),
+            semester_weeks=semester_week_count(semester_info['start_date'], semester_info['end_date'])
+        )
+        return jsonify({
+            'job_id': job_id,
+            'status': 'Queued',
+            'total_sections': len(sections),
+            'status_url': url_for('api_generation_job_status', job_id=job_id)
+        }), 202
+    except Exception as e:
+        logger.error(f"Error queueing generation job: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/generation_jobs/<int:job_id>")
+@login_required('academic_coordinator')
+def api_generation_job_status(job_id):
+    try:
+        job = generation_job_queue.get_job(job_id)
+        if not job:
+            return jsonify({"error": f"Generation job {job_id} not found."}), 404
+        return jsonify(job)
+    except Exception as e:
+        logger.error(f"Error fetching generation job {job_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @app.route("/export_timetables_csv")
 @login_required('academic_coordinator')
 def export_timetables_csv():
@@ -1089,40 +1110,29 @@ def export_timetables_csv():
 
         all_timetables_raw_data = []
         generator = TimetableGenerator()
+        section_ids = [section['section_id'] for section in sections_to_export]
+        raw_data_by_section = {
+            section_id: raw_data
+            for section_id, log_id, raw_data in generator.load_latest_timetables_raw(section_ids, statuses=('Success',))
+        }
 
         for section in sections_to_export:
-            section_id = section['section_id']
-            latest_log_query = """
-                SELECT log_id FROM timetable_generation_log
-                WHERE section_id = %s AND status = 'Success'
-                ORDER BY generation_date DESC
-                LIMIT 1
-            """
-            latest_log_entry = generator._execute_query(latest_log_query, (section_id,), fetch_one=True)
-
-            if latest_log_entry:
-                log_id = latest_log_entry['log_id']
-                raw_data = generator.load_specific_timetable_raw(log_id)
-                if raw_data:
-                    all_timetables_raw_data.append({
-                        'section_name': section['section_name'],
-                        'department': section['department_name'],
-                        'academic_year_int': section.get('academic_year_int'),
-                        'semester_int': section.get('semester'),
-                        'raw_timetable': raw_data
-                    })
-                else:
-                    logger.warning(f"No raw timetable data found for section {section_id} (log_id: {log_id}) for CSV export.")
+            raw_data = raw_data_by_section.get(section['section_id'])
+            if raw_data:
+                all_timetables_raw_data.append({
+                    'section_name': section['section_name'],
+                    'department': section['department_name'],
+                    'academic_year_int': section.get('academic_year_int'),
+                    'semester_int': section.get('semester'),
+                    'raw_timetable': raw_data
+                })
             else:
-                logger.warning(f"No successful generation log found for section {section_id} for CSV export.")
+                logger.warning(f"No successful generated timetable found for section {section['section_id']} for CSV export.")
 
         if not all_timetables_raw_data:
             flash("No generated timetables found for the selected criteria to export.", "warning")
             return redirect(url_for('academic_coordinator_dashboard'))
 
-        csv_output = generate_csv_output(all_timetables_raw_data)
-
-        response = Response(csv_output, mimetype="text/csv")
         filename_parts = [session.get('school_abbr', 'Timetable')]
         if department_id:
             dept_name = next((d['name'] for d in get_departments_by_school(school_id) if d['department_id'] == department_id), 'Dept')
@@ -1134,8 +1144,7 @@ def export_timetables_csv():
             filename_parts.append(f"Sem_{semester}")
         
         filename = "_".join(filename_parts) + "_Timetables.csv"
-        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
-        return response
+        return csv_response(iter_timetables_csv(all_timetables_raw_data), filename)
 
     except Exception as e:
         logger.error(f"Error during CSV export: {str(e)}", exc_info=True)
@@ -1144,20 +1153,11 @@ def export_timetables_csv():
     
 @app.route('/api/get_rooms_by_type/<string:room_type>')
 def get_rooms_by_type(room_type):
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({'error': 'Database connection failed!'}), 500
-    cursor = conn.cursor(dictionary=True)
-    query = "SELECT room_id, room_number FROM rooms WHERE room_type = %s ORDER BY room_number"
     try:
-        cursor.execute(query, (room_type,))
-        rooms = cursor.fetchall()
-        return jsonify(rooms)
-    except Error as e:
+        return jsonify(get_rooms_of_type(room_type))
+    except Exception as e:
+        logger.error(f"Error fetching rooms of type {room_type}: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 500
-    finally:
-        cursor.close()
-        conn.close()
 
 @app.route('/fetch_room_timetable_data')
 def fetch_room_timetable_data():
@@ -1225,6 +1225,18 @@ def cr_dashboard():
 
     connection = None
     try:
+        # This week's classes (the search result, or the CR's own section) are resolved
+        # before a pooled connection is checked out, since resolve_timetable borrows its own
+        week_start, week_end = resolve_date_window({})
+        if request.method == 'POST':
+            resolved_week = TimetableGenerator().resolve_timetable(
+                week_start, week_end, department_id=request.form.get('department'),
+                year=request.form.get('year'), semester=request.form.get('semester'))
+        elif cr_section_id:
+            resolved_week = TimetableGenerator().resolve_timetable(week_start, week_end, section_id=cr_section_id)
+        else:
+            resolved_week = []
+
         connection = get_db_connection()
         if connection is None:
             flash("CRITICAL ERROR: Could not connect to the database.", "danger")
@@ -1253,30 +1265,8 @@ def cr_dashboard():
             year = request.form.get('year')
             semester = request.form.get('semester')
             selected_values = {'dept_id': dept_id, 'year': year, 'semester': semester}
-         # This query searches ALL logs, which is fine for a general search
-            cursor.execute("""
-                SELECT DISTINCT
-                    sec.name AS section_name,
-                    tt.day_of_week,
-                    ts.start_time, ts.end_time,
-                    s.name AS subject_name,
-                    u.name AS faculty_name,
-                    r.room_number,
-                    s.has_lab AS is_lab_session
-                FROM timetable tt
-                JOIN sections sec ON tt.section_id = sec.section_id
-                JOIN batch_subjects bs ON tt.batch_subject_id = bs.batch_subject_id
-                JOIN subjects s ON bs.subject_id = s.subject_id
-                JOIN users u ON tt.faculty_id = u.user_id
-                JOIN batches b ON sec.batch_id = b.batch_id
-                JOIN batch_departments bd ON b.batch_id = bd.batch_id
-                JOIN timeslots ts ON tt.timeslot_id = ts.timeslot_id
-                LEFT JOIN rooms r ON tt.room_id = r.room_id
-                WHERE bd.department_id = %s AND b.year = %s AND b.semester = %s AND tt.date IS NOT NULL
-                ORDER BY sec.name, FIELD(tt.day_of_week, 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'), ts.start_time;
-            """, (dept_id, year, semester))
-
-            result = cursor.fetchall()
+            # This week's classes of every current timetable matching the search
+            result = sorted(resolved_week, key=lambda row: row['section_name'])
             selected_timetable = {}
             for row in result:
                 # Handle timedelta objects for time
@@ -1295,15 +1285,12 @@ def cr_dashboard():
                 selected_timetable[section].append(row)
         
         
-        # *** THIS IS THE FIX ***
-        # Find the latest log_id for the CR's *own* section
+        # Find the current log_id for the CR's *own* section
         latest_log_id = None
         if cr_section_id:
             cursor.execute("""
-                SELECT log_id FROM timetable_generation_log
-                WHERE section_id = %s AND (status = 'Success' OR status = 'Partial')
-                ORDER BY generation_date DESC
-                LIMIT 1
+                SELECT log_id FROM current_timetable
+                WHERE section_id = %s AND status IN ('Success', 'Partial')
             """, (cr_section_id,))
             latest_log = cursor.fetchone()
             if latest_log:
@@ -1320,28 +1307,12 @@ def cr_dashboard():
             """, (cr_section_id,))
             cr_info = cursor.fetchone()
             my_semester = cr_info['semester'] if cr_info else None
-            # Query for WEEKLY TIMETABLE using latest_log_id
-            cursor.execute("""
-                SELECT DISTINCT
-                    tt.day_of_week,
-                    ts.start_time, ts.end_time,
-                    s.name AS subject_name,
-                    u.name AS faculty_name,
-                    r.room_number,
-                    tt.is_lab_session,
-                    tt.entry_id,
-                    s.subject_id
-                FROM timetable tt
-                JOIN batch_subjects bs ON tt.batch_subject_id = bs.batch_subject_id
-                JOIN subjects s ON bs.subject_id = s.subject_id
-                JOIN users u ON tt.faculty_id = u.user_id
-                JOIN timeslots ts ON tt.timeslot_id = ts.timeslot_id
-                LEFT JOIN rooms r ON tt.room_id = r.room_id
-                WHERE tt.section_id = %s AND tt.log_id = %s AND (tt.subsection_id = %s OR tt.subsection_id IS NULL)
-                ORDER BY FIELD(tt.day_of_week, 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'), ts.start_time;
-             """, (cr_section_id, latest_log_id, cr_subsection_id))
-
-            my_weekly_timetable = cursor.fetchall()
+            # This week's classes: the weekly template resolved against this week's
+            # cancellations and substitutions, with holidays left out
+            my_weekly_timetable = [
+                entry for entry in resolved_week
+                if entry['subsection_id'] in (None, cr_subsection_id)
+            ]
             for entry in my_weekly_timetable:
                 start_time_val = entry['start_time']
                 end_time_val = entry['end_time']
@@ -1352,41 +1323,16 @@ def cr_dashboard():
                 entry['start_time'] = start_time_val.strftime('%H:%M')
                 entry['end_time'] = end_time_val.strftime('%H:%M')
 
-            cursor.execute("""
-                SELECT ts.start_time, ts.end_time, s.name AS subject_name,
-                       u.name AS faculty_name, r.room_number
-                FROM timetable tt
-                JOIN batch_subjects bs ON tt.batch_subject_id = bs.batch_subject_id
-                JOIN subjects s ON bs.subject_id = s.subject_id
-                JOIN users u ON tt.faculty_id = u.user_id
-                JOIN timeslots ts ON tt.timeslot_id = ts.timeslot_id
-                LEFT JOIN rooms r ON tt.room_id = r.room_id
-                WHERE tt.section_id = %s AND tt.log_id = %s AND (tt.subsection_id = %s OR tt.subsection_id IS NULL) AND tt.day_of_week = %s AND ts.start_time > %s
-                ORDER BY ts.start_time LIMIT 3;
-            """, (cr_section_id, latest_log_id, cr_subsection_id, today, current_time))
-            upcoming_classes = cursor.fetchall()
-            for entry in upcoming_classes:
-                start_time_val = entry['start_time']
-                end_time_val = entry['end_time']
-                if isinstance(start_time_val, timedelta):
-                    start_time_val = (datetime.min + start_time_val).time()
-                if isinstance(end_time_val, timedelta):
-                    end_time_val = (datetime.min + end_time_val).time()
-                entry['start_time'] = start_time_val.strftime('%H:%M')
-                entry['end_time'] = end_time_val.strftime('%H:%M')
-
-            # Query for DASHBOARD STATS using latest_log_id
-            cursor.execute("""
-                SELECT
-                    COUNT(DISTINCT bs.subject_id) as total_subjects,
-                    COUNT(DISTINCT tt.entry_id) as total_classes_week,
-                    COUNT(DISTINCT CASE WHEN tt.day_of_week = %s THEN tt.entry_id END) as classes_today
-                FROM timetable tt
-                JOIN batch_subjects bs ON tt.batch_subject_id = bs.batch_subject_id
-                WHERE tt.section_id = %s AND tt.log_id = %s AND (tt.subsection_id = %s OR tt.subsection_id IS NULL);
-            """, (today, cr_section_id, latest_log_id, cr_subsection_id))
-            stats = cursor.fetchone()
-            dashboard_stats = stats if stats else {}
+            classes_today = [entry for entry in my_weekly_timetable if entry['entry_date'] == date.today()]
+            upcoming_classes = [
+                entry for entry in classes_today
+                if not entry['is_cancelled'] and entry['start_time'] > current_time.strftime('%H:%M')
+            ][:3]
+            dashboard_stats = {
+                'total_subjects': len({entry['subject_id'] for entry in my_weekly_timetable}),
+                'total_classes_week': len(my_weekly_timetable),
+                'classes_today': len(classes_today)
+            }
 
             # Query for SUBJECT PROGRESS (This may or may not need log_id, assuming it's current)
             try:
@@ -1435,20 +1381,13 @@ def cr_dashboard():
 
             try:
                 cursor.execute("""
-                    SELECT ts.start_time, ts.end_time
+                    SELECT ts.timeslot_id, ts.start_time, ts.end_time
                     FROM timeslots ts
                     WHERE ts.day_of_week = %s
-                    AND NOT EXISTS (
-                        SELECT 1 FROM timetable tt
-                        WHERE tt.section_id = %s
-                        AND (tt.subsection_id = %s OR tt.subsection_id IS NULL)
-                        AND tt.log_id = %s
-                        AND tt.day_of_week = ts.day_of_week
-                        AND tt.timeslot_id = ts.timeslot_id
-                    )
                     ORDER BY ts.start_time;
-                """, (today, cr_section_id, latest_log_id, cr_subsection_id))
-                free_periods_today = cursor.fetchall()
+                """, (today,))
+                busy_timeslots = {entry['timeslot_id'] for entry in classes_today if not entry['is_cancelled']}
+                free_periods_today = [period for period in cursor.fetchall() if period['timeslot_id'] not in busy_timeslots]
                 for period in free_periods_today:
                     start_time_val = period['start_time']
                     end_time_val = period['end_time']
@@ -1494,56 +1433,42 @@ def cr_download_timetable_csv():
         flash("You must be assigned to a section to download reports.", "warning")
         return redirect(url_for('cr_dashboard'))
 
-    connection = None
     try:
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("""
+        days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
+        time_slots = ['09:00 - 10:00', '10:00 - 11:00', '11:00 - 12:00', '12:00 - 13:00', '13:00 - 14:00', '14:00 - 15:00', '15:00 - 16:00', '16:00 - 17:00']
+        grid = {slot: {day: '' for day in days} for slot in time_slots}
+
+        # The grid is a single week, so only the section's current timetable is read
+        for entry in stream_query_rows("""
             SELECT tt.day_of_week, ts.start_time, ts.end_time,
                    s.name AS subject_name, u.name AS faculty_name, r.room_number,
                    tt.is_lab_session
-            FROM timetable tt
+            FROM current_timetable ct
+            JOIN timetable tt ON tt.section_id = ct.section_id AND tt.log_id = ct.log_id
             JOIN batch_subjects bs ON tt.batch_subject_id = bs.batch_subject_id
             JOIN subjects s ON bs.subject_id = s.subject_id
             JOIN users u ON tt.faculty_id = u.user_id
             JOIN timeslots ts ON tt.timeslot_id = ts.timeslot_id
             LEFT JOIN rooms r ON tt.room_id = r.room_id
-            WHERE tt.section_id = %s AND tt.date IS NOT NULL
-        """, (cr_section_id,))
-        timetable_data = cursor.fetchall()
-
-        days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday']
-        time_slots = ['09:00 - 10:00', '10:00 - 11:00', '11:00 - 12:00', '12:00 - 13:00', '13:00 - 14:00', '14:00 - 15:00', '15:00 - 16:00', '16:00 - 17:00']
-        
-        # Make sure 'import pandas as pd' is at the top of your app.py
-        df = pd.DataFrame(index=time_slots, columns=days).fillna('')
-        df.index.name = "TIME"
-
-        for entry in timetable_data:
+            WHERE ct.section_id = %s AND tt.date IS NOT NULL
+        """, (cr_section_id,)):
             start_time_str = (datetime.min + entry['start_time']).strftime('%H:%M') if isinstance(entry['start_time'], timedelta) else entry['start_time'].strftime('%H:%M')
             end_time_str = (datetime.min + entry['end_time']).strftime('%H:%M') if isinstance(entry['end_time'], timedelta) else entry['end_time'].strftime('%H:%M')
             slot = f"{start_time_str} - {end_time_str}"
             day = entry['day_of_week']
             lab_tag = " (LAB)" if entry['is_lab_session'] else ""
             cell_content = f"{entry['subject_name']}{lab_tag} / {entry['faculty_name']} / Room: {entry.get('room_number', 'N/A')}"
-            if slot in df.index and day in df.columns:
-                df.loc[slot, day] = cell_content
-        df.loc['13:00 - 14:00'] = "LUNCH BREAK"
-        
-        output = io.StringIO()
-        df.to_csv(output)
-        output.seek(0)
-        
-        return send_file(io.BytesIO(output.getvalue().encode('utf-8')), as_attachment=True, download_name='timetable.csv', mimetype='text/csv')
+            if slot in grid and day in grid[slot]:
+                grid[slot][day] = cell_content
+        grid['13:00 - 14:00'] = {day: "LUNCH BREAK" for day in days}
+
+        rows = ([slot] + [grid[slot][day] for day in days] for slot in time_slots)
+        return csv_response(iter_csv_chunks(rows, header=['TIME'] + days), 'timetable.csv')
 
     except Exception as e:
         flash(f"An error occurred while generating the CSV file: {e}", "danger")
         logger.error(f"Error generating CR CSV: {e}", exc_info=True)
         return redirect(url_for('cr_dashboard'))
-    finally:
-        if connection and connection.is_connected():
-            cursor.close()
-            connection.close()
 
 @app.route('/request_free_period', methods=['POST'])
 @login_required('CR')
@@ -1660,7 +1585,7 @@ def faculty_dashboard():
         # Fetch substitute requests
         cursor.execute("""
             SELECT sr.request_id, c.reason AS cancellation_reason, u.name AS requested_by_faculty,
-                   s.name AS subject_name, sec.name AS section_name, t.date AS class_date,
+                   s.name AS subject_name, sec.name AS section_name, COALESCE(c.class_date, t.date) AS class_date,
                    ts.start_time, ts.end_time, sr.status
             FROM substitute_requests sr
             JOIN cancellations c ON sr.cancellation_id = c.cancellation_id
@@ -1675,63 +1600,45 @@ def faculty_dashboard():
         """, (faculty_id,))
         substitute_requests = cursor.fetchall()
 
-        # Fetch lecture completion data
+        # Fetch lecture completion data; completions are per-date exceptions
         cursor.execute("""
-            SELECT s.name AS subject_name, sec.name AS section_name, t.date AS class_date,
+            SELECT s.name AS subject_name, sec.name AS section_name, te.exception_date AS class_date,
                    ts.start_time, ts.end_time, 'completed' AS status
-            FROM timetable t
+            FROM timetable_exception te
+            JOIN timetable t ON te.entry_id = t.entry_id
             JOIN batch_subjects bs ON t.batch_subject_id = bs.batch_subject_id
             JOIN subjects s ON bs.subject_id = s.subject_id
             JOIN sections sec ON t.section_id = sec.section_id
             JOIN timeslots ts ON t.timeslot_id = ts.timeslot_id
-            WHERE t.faculty_id = %s AND t.is_completed = 1
-            ORDER BY t.date DESC LIMIT 5
-        """, (faculty_id,))
+            WHERE te.is_completed = 1 AND (te.faculty_id = %s OR te.faculty_id IS NULL AND t.faculty_id = %s)
+            ORDER BY te.exception_date DESC LIMIT 5
+        """, (faculty_id, faculty_id))
         lecture_completion = cursor.fetchall()
 
-        # CORRECTED QUERY: Find the latest log_id for each section the faculty teaches
-        cursor.execute("""
-            SELECT
-                fs.section_id,
-                MAX(tgl.log_id) AS latest_log_id
-            FROM faculty_subjects fs
-            JOIN timetable_generation_log tgl ON fs.section_id = tgl.section_id
-            WHERE fs.faculty_id = %s AND (tgl.status = 'Success' OR tgl.status = 'Partial')
-            GROUP BY fs.section_id;
-        """, (faculty_id,))
-        section_logs = cursor.fetchall()
+        # Fetch list of all faculty members for substitute requests
+        cursor.execute("SELECT user_id AS faculty_id, name AS faculty_name FROM users WHERE role = 'faculty' AND user_id != %s ORDER BY name", (faculty_id,))
+        faculty_list = cursor.fetchall()
 
-        if section_logs:
-            where_clauses = []
-            params = []
-            for log in section_logs:
-                where_clauses.append("(t.section_id = %s AND t.log_id = %s)")
-                params.append(log['section_id'])
-                params.append(log['latest_log_id'])
+    except Error as e:
+        flash(f"Error fetching dashboard data: {e}", 'error')
+        logger.error(f"Error in faculty_dashboard route: {e}", exc_info=True)
+        # On error, ensure we still return a response
+        return render_template('dashboard.html', notifications=[], substitute_requests=[], lecture_completion=[], faculty_timetable=[], faculty_list=[], current_user_name=session['user_name'])
+    finally:
+        if cursor:
+            cursor.close()
+        if conn and conn.is_connected():
+            conn.close()
 
-            params.insert(0, faculty_id)
+    try:
+        # The faculty's classes this week, including ones they substitute for, with
+        # each date's cancellations and completions. Resolved after the connection is
+        # back in the pool, since resolve_timetable borrows its own.
+        week_start, week_end = resolve_date_window({})
+        raw_entries = TimetableGenerator().resolve_timetable(week_start, week_end, faculty_id=faculty_id)
 
-            query = f"""
-                SELECT
-                    t.entry_id, t.date AS entry_date, t.day_of_week, ts.start_time, ts.end_time,
-                    s.name AS subject_name, sec.name AS section_name, r.room_number,
-                    t.is_cancelled, t.is_completed, t.is_rescheduled, c.reason AS status_reason
-                FROM timetable t
-                JOIN batch_subjects bs ON t.batch_subject_id = bs.batch_subject_id
-                JOIN subjects s ON bs.subject_id = s.subject_id
-                JOIN sections sec ON t.section_id = sec.section_id
-                JOIN timeslots ts ON t.timeslot_id = ts.timeslot_id
-                LEFT JOIN rooms r ON t.room_id = r.room_id
-                LEFT JOIN cancellations c ON t.entry_id = c.timetable_id
-                WHERE t.faculty_id = %s AND ({' OR '.join(where_clauses)})
-                ORDER BY FIELD(t.day_of_week, 'Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday'), ts.start_time
-            """
-            
-            cursor.execute(query, tuple(params))
-            
+        if raw_entries:
             # Process the raw data to group entries by day and time slot
-            raw_entries = cursor.fetchall()
-            
             # A dictionary to hold grouped timetable entries
             grouped_timetable = {}
 
@@ -1779,21 +1686,9 @@ def faculty_dashboard():
                     classes = grouped_timetable.get(day, {}).get(timeslot_start, [])
                     row_data['days'][day] = classes
                 all_timetable_entries.append(row_data)
-
-        # Fetch list of all faculty members for substitute requests
-        cursor.execute("SELECT user_id AS faculty_id, name AS faculty_name FROM users WHERE role = 'faculty' AND user_id != %s ORDER BY name", (faculty_id,))
-        faculty_list = cursor.fetchall()
-
     except Error as e:
         flash(f"Error fetching dashboard data: {e}", 'error')
-        logger.error(f"Error in faculty_dashboard route: {e}", exc_info=True)
-        # On error, ensure we still return a response
-        return render_template('dashboard.html', notifications=[], substitute_requests=[], lecture_completion=[], faculty_timetable=[], faculty_list=[], current_user_name=session['user_name'])
-    finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+        logger.error(f"Error resolving faculty timetable: {e}", exc_info=True)
 
     return render_template('dashboard.html',
                            current_user_name=session['user_name'],
@@ -1817,6 +1712,23 @@ def get_faculty_list():
     except Error as e: return jsonify({'error': str(e)}), 500
     finally: cursor.close(); conn.close()
 
+def occurrence_date(data, entry):
+    """
+    Date of the occurrence of a weekly timetable entry that a faculty action is
+    for: the ISO `class_date` sent by the client, or the entry's stored date when
+    none is sent. Raises ValueError if the date is not on the entry's weekday.
+    """
+    if not data.get('class_date'):
+        return entry['date']
+    class_date = date.fromisoformat(data['class_date'])
+    if class_date.strftime('%A') != entry['day_of_week']:
+        raise ValueError(f"{class_date.isoformat()} is not a {entry['day_of_week']}")
+    return class_date
+
+def occurrence_faculty_id(entry, exception):
+    """Faculty teaching one occurrence: the substitute on its exception, else the entry's faculty."""
+    return exception['faculty_id'] if exception and exception['faculty_id'] else entry['faculty_id']
+
 @app.route('/api/faculty/current/cancel_class', methods=['POST'])
 @login_required('faculty')
 def cancel_class():
@@ -1831,17 +1743,31 @@ def cancel_class():
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Check ownership of the class
-        cursor.execute("SELECT entry_id FROM timetable WHERE entry_id = %s AND faculty_id = %s", (timetable_entry_id, session['user_id']))
-        if not cursor.fetchone():
+        cursor.execute("""
+            SELECT entry_id, section_id, batch_subject_id, faculty_id, day_of_week, date
+            FROM timetable WHERE entry_id = %s FOR UPDATE
+        """, (timetable_entry_id,))
+        entry = cursor.fetchone()
+        if not entry:
+            return jsonify({'error': 'Unauthorized to cancel this class.'}), 403
+        try:
+            class_date = occurrence_date(data, entry)
+        except ValueError as e:
+            return jsonify({'error': f"Invalid class_date: {e}"}), 400
+
+        # Check ownership of the class on that date
+        exception = load_timetable_exception(cursor, timetable_entry_id, class_date)
+        if occurrence_faculty_id(entry, exception) != session['user_id']:
             return jsonify({'error': 'Unauthorized to cancel this class.'}), 403
 
         # Insert into cancellations
-        cursor.execute("INSERT INTO cancellations (timetable_id, reason, canceled_by) VALUES (%s, %s, %s)", (timetable_entry_id, reason, session['user_id']))
+        cursor.execute("INSERT INTO cancellations (timetable_id, class_date, reason, canceled_by) VALUES (%s, %s, %s, %s)", (timetable_entry_id, class_date, reason, session['user_id']))
         cancellation_id = cursor.lastrowid
         
-        # Update timetable status
-        cursor.execute("UPDATE timetable SET is_cancelled = 1, modified_at = NOW() WHERE entry_id = %s", (timetable_entry_id,))
+        # Cancel that date only; a cancelled class no longer counts as delivered
+        set_timetable_exception(cursor, timetable_entry_id, class_date, is_cancelled=1, is_completed=0, cancellation_id=cancellation_id)
+        if exception and exception['is_completed']:
+            apply_completion_change(cursor, entry['section_id'], entry['batch_subject_id'], entry['faculty_id'], -1)
         
         conn.commit()
         
@@ -1862,18 +1788,25 @@ def update_lecture_status():
     timetable_entry_id = data.get('timetable_entry_id'); status = data.get('status')
     conn = get_db_connection()
     if conn is None: return jsonify({'error': 'Database connection failed!'}), 500
-    cursor = conn.cursor()
+    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT faculty_id FROM timetable WHERE entry_id = %s", (timetable_entry_id,))
-        record = cursor.fetchone()
-        if record is None or record[0] != session['user_id']: return jsonify({'error': 'Unauthorized to update this lecture.'}), 403
+        cursor.execute("SELECT faculty_id, section_id, batch_subject_id, day_of_week, date FROM timetable WHERE entry_id = %s FOR UPDATE", (timetable_entry_id,))
+        entry = cursor.fetchone()
+        if entry is None: return jsonify({'error': 'Unauthorized to update this lecture.'}), 403
+        try: class_date = occurrence_date(data, entry)
+        except ValueError as e: return jsonify({'error': f"Invalid class_date: {e}"}), 400
+        exception = load_timetable_exception(cursor, timetable_entry_id, class_date)
+        if occurrence_faculty_id(entry, exception) != session['user_id']: return jsonify({'error': 'Unauthorized to update this lecture.'}), 403
+        was_completed = bool(exception and exception['is_completed'])
         if status == 'completed':
-            cursor.execute("UPDATE timetable SET is_completed = 1, is_cancelled = 0, is_rescheduled = 0, modified_at = NOW() WHERE entry_id = %s AND faculty_id = %s", (timetable_entry_id, session['user_id']))
+            set_timetable_exception(cursor, timetable_entry_id, class_date, is_completed=1, is_cancelled=0, is_rescheduled=0, cancellation_id=None)
             message = "Lecture marked as completed."
-        elif status == 'pending':
-            cursor.execute("UPDATE timetable SET is_completed = 0, is_cancelled = 0, is_rescheduled = 0, modified_at = NOW() WHERE entry_id = %s AND faculty_id = %s", (timetable_entry_id, session['user_id']))
+        elif status in ('pending', 'scheduled'):
+            set_timetable_exception(cursor, timetable_entry_id, class_date, is_completed=0, is_cancelled=0, is_rescheduled=0, cancellation_id=None)
             message = "Lecture status reset to scheduled."
         else: return jsonify({'error': 'Invalid status provided.'}), 400
+        if was_completed != (status == 'completed'):
+            apply_completion_change(cursor, entry['section_id'], entry['batch_subject_id'], entry['faculty_id'], 1 if status == 'completed' else -1)
         conn.commit(); return jsonify({'message': message}), 200
     except Error as e: conn.rollback(); return jsonify({'error': str(e)}), 500
     finally: cursor.close(); conn.close()
@@ -1944,16 +1877,16 @@ def reschedule_class():
     
     cursor = conn.cursor(dictionary=True)
     try:
-        # Get timetable entry ID from cancellation ID
-        cursor.execute("SELECT timetable_id FROM cancellations WHERE cancellation_id = %s", (cancellation_id,))
+        # Get timetable entry ID and class date from cancellation ID
+        cursor.execute("SELECT timetable_id, class_date FROM cancellations WHERE cancellation_id = %s", (cancellation_id,))
         cancellation_info = cursor.fetchone()
         if not cancellation_info:
             return jsonify({'error': 'Cancellation record not found.'}), 404
         
         timetable_id = cancellation_info['timetable_id']
 
-        # Update the timetable entry with the new faculty and status
-        cursor.execute("UPDATE timetable SET faculty_id = %s, is_rescheduled = 1, is_cancelled = 0, modified_at = NOW() WHERE entry_id = %s", (new_faculty_id, timetable_id))
+        # The new faculty takes the cancelled date; the weekly entry keeps its faculty
+        set_timetable_exception(cursor, timetable_id, cancellation_info['class_date'], faculty_id=new_faculty_id, is_rescheduled=1, is_cancelled=0)
         
         # Notify the new faculty
         original_faculty_name = session['user_name']
@@ -1974,7 +1907,7 @@ def reschedule_class():
         """, (timetable_id,))
         class_details = cursor.fetchone()
         
-        message = f"Your class {class_details['subject']} for {class_details['section']} on {class_details['day_of_week']} at {class_details['start_time']} has been rescheduled to you by {original_faculty_name}."
+        message = f"Your class {class_details['subject']} for {class_details['section']} on {class_details['day_of_week']} {cancellation_info['class_date']} at {class_details['start_time']} has been rescheduled to you by {original_faculty_name}."
         
         cursor.execute("INSERT INTO notifications (user_id, message, type) VALUES (%s, %s, 'reschedule')", (new_faculty_id, message))
         
@@ -2170,23 +2103,29 @@ def request_substitute():
     cursor = conn.cursor(dictionary=True)
     
     try:
-        # Check if the current user is the faculty for this class
-        cursor.execute("SELECT faculty_id FROM timetable WHERE entry_id = %s", (timetable_entry_id,))
-        class_faculty_id = cursor.fetchone()
-        if class_faculty_id is None or class_faculty_id['faculty_id'] != session['user_id']:
+        cursor.execute("SELECT faculty_id, day_of_week, date FROM timetable WHERE entry_id = %s FOR UPDATE", (timetable_entry_id,))
+        entry = cursor.fetchone()
+        if entry is None:
+            return jsonify({'error': 'You are not authorized to request a substitute for this class.'}), 403
+        try:
+            class_date = occurrence_date(data, entry)
+        except ValueError as e:
+            return jsonify({'error': f"Invalid class_date: {e}"}), 400
+
+        # Check if the current user is the faculty for this class on that date
+        exception = load_timetable_exception(cursor, timetable_entry_id, class_date)
+        if occurrence_faculty_id(entry, exception) != session['user_id']:
             return jsonify({'error': 'You are not authorized to request a substitute for this class.'}), 403
 
         # Check if a cancellation record already exists, if not, create one
-        cursor.execute("SELECT cancellation_id FROM cancellations WHERE timetable_id = %s AND canceled_by = %s", (timetable_entry_id, session['user_id']))
+        cursor.execute("SELECT cancellation_id FROM cancellations WHERE timetable_id = %s AND class_date = %s AND canceled_by = %s", (timetable_entry_id, class_date, session['user_id']))
         cancellation = cursor.fetchone()
         
         if not cancellation:
-            # First, update the timetable entry to show it's cancelled
-            cursor.execute("UPDATE timetable SET is_cancelled = 1, modified_at = NOW() WHERE entry_id = %s", (timetable_entry_id,))
-            
-            # Then, create the cancellation record
-            cursor.execute("INSERT INTO cancellations (timetable_id, reason, canceled_by) VALUES (%s, %s, %s)", (timetable_entry_id, reason, session['user_id']))
+            # Create the cancellation record, then mark that date's class as cancelled
+            cursor.execute("INSERT INTO cancellations (timetable_id, class_date, reason, canceled_by) VALUES (%s, %s, %s, %s)", (timetable_entry_id, class_date, reason, session['user_id']))
             cancellation_id = cursor.lastrowid
+            set_timetable_exception(cursor, timetable_entry_id, class_date, is_cancelled=1, cancellation_id=cancellation_id)
         else:
             cancellation_id = cancellation['cancellation_id']
 
@@ -2238,13 +2177,12 @@ def respond_to_substitute(request_id):
         if not request_data: return jsonify({'error': 'Substitute request not found or already responded to.'}), 404
         cursor.execute("UPDATE substitute_requests SET status = %s, responded_at = NOW() WHERE request_id = %s", (status, request_id))
         if status == 'accepted':
-            cursor.execute("SELECT timetable_id FROM cancellations WHERE cancellation_id = %s", (request_data['cancellation_id'],))
+            cursor.execute("SELECT timetable_id, class_date, canceled_by FROM cancellations WHERE cancellation_id = %s", (request_data['cancellation_id'],))
             cancellation_info = cursor.fetchone()
             if cancellation_info:
-                timetable_id = cancellation_info['timetable_id']
-                cursor.execute("SELECT canceled_by FROM cancellations WHERE cancellation_id = %s", (request_data['cancellation_id'],))
-                original_faculty_id = cursor.fetchone()['canceled_by']
-                cursor.execute("UPDATE timetable SET faculty_id = %s, is_rescheduled = 1, is_cancelled = 0 WHERE entry_id = %s", (session['user_id'], timetable_id))
+                original_faculty_id = cancellation_info['canceled_by']
+                # The substitute takes the cancelled date only; the weekly entry keeps its faculty
+                set_timetable_exception(cursor, cancellation_info['timetable_id'], cancellation_info['class_date'], faculty_id=session['user_id'], is_rescheduled=1, is_cancelled=0)
                 notification_message = f"Your substitute request has been accepted by {session['user_name']}."
                 cursor.execute("INSERT INTO notifications (user_id, type, message) VALUES (%s, 'substitute_accepted', %s)", (original_faculty_id, notification_message))
         elif status == 'rejected':
@@ -2266,30 +2204,19 @@ def hod_dashboard():
 @app.route('/api/hod/options/years')
 @login_required('hod')
 def get_years():
-    conn = get_db_connection();
-    if conn is None: return jsonify([])
-    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT DISTINCT year FROM batches ORDER BY year;")
-        years = [{'year_id': row['year'], 'year_name': row['year']} for row in cursor.fetchall()]
+        years = [{'year_id': row['year'], 'year_name': row['year']} for row in get_batch_years()]
         return jsonify(years)
-    except Error as e:
+    except Exception as e:
         print(f"Error fetching years: {e}"); return jsonify([])
-    finally: cursor.close(); conn.close()
 
 @app.route('/api/hod/options/semesters')
 @login_required('hod')
 def get_semesters():
-    conn = get_db_connection()
-    if conn is None: return jsonify([])
-    cursor = conn.cursor(dictionary=True)
     try:
-        cursor.execute("SELECT DISTINCT semester FROM batches ORDER BY semester;")
-        semesters = cursor.fetchall()
-        return jsonify(semesters)
-    except Error as e:
+        return jsonify(get_batch_semesters())
+    except Exception as e:
         print(f"Error fetching semesters: {e}"); return jsonify([])
-    finally: cursor.close(); conn.close()
 
 @app.route('/api/hod/options/faculty')
 @login_required('hod')
@@ -2363,20 +2290,18 @@ def get_department_progress():
         hod_department_id_row = cursor.fetchone()
         if not hod_department_id_row:
             cursor.execute("""
-                SELECT sp.planned_sessions, sp.completed_sessions, s.name AS subject_name, b.semester, d.name as department_name
-                FROM subject_progress sp JOIN batch_subjects bs ON sp.batch_subject_id = bs.batch_subject_id
-                JOIN subjects s ON bs.subject_id = s.subject_id JOIN sections sec ON sp.section_id = sec.section_id
-                JOIN batches b ON sec.batch_id = b.batch_id JOIN batch_departments bd ON b.batch_id = bd.batch_id
-                JOIN departments d ON bd.department_id = d.department_id GROUP BY sp.batch_subject_id, d.name
+                SELECT pr.planned_sessions, pr.completed_sessions, s.name AS subject_name, pr.semester, d.name as department_name
+                FROM subject_progress_rollup pr JOIN batch_subjects bs ON pr.batch_subject_id = bs.batch_subject_id
+                JOIN subjects s ON bs.subject_id = s.subject_id
+                JOIN departments d ON pr.department_id = d.department_id GROUP BY pr.batch_subject_id, d.name
             """)
         else:
             hod_department_id = hod_department_id_row['department_id']
             cursor.execute("""
-                SELECT sp.planned_sessions, sp.completed_sessions, s.name AS subject_name, b.semester, d.name as department_name
-                FROM subject_progress sp JOIN sections sec ON sp.section_id = sec.section_id
-                JOIN batches b ON sec.batch_id = b.batch_id JOIN batch_departments bd ON b.batch_id = bd.batch_id
-                JOIN batch_subjects bs ON sp.batch_subject_id = bs.batch_subject_id JOIN subjects s ON bs.subject_id = s.subject_id
-                JOIN departments d ON bd.department_id = d.department_id WHERE bd.department_id = %s GROUP BY sp.batch_subject_id, d.name
+                SELECT pr.planned_sessions, pr.completed_sessions, s.name AS subject_name, pr.semester, d.name as department_name
+                FROM subject_progress_rollup pr
+                JOIN batch_subjects bs ON pr.batch_subject_id = bs.batch_subject_id JOIN subjects s ON bs.subject_id = s.subject_id
+                JOIN departments d ON pr.department_id = d.department_id WHERE pr.department_id = %s GROUP BY pr.batch_subject_id, d.name
             """, (hod_department_id,))
         progress_data = cursor.fetchall()
         for item in progress_data:
@@ -2407,32 +2332,30 @@ def get_department_progress_filtered():
         hod_department_id = hod_department_id_row['department_id']
         
         query = """
-            SELECT s.name AS subject_name, sp.planned_sessions, sp.completed_sessions, 
-                   sec.name AS section_name, b.semester, u.name as faculty_name
-            FROM subject_progress sp 
-            JOIN sections sec ON sp.section_id = sec.section_id
-            JOIN batches b ON sec.batch_id = b.batch_id 
-            JOIN batch_departments bd ON b.batch_id = bd.batch_id
-            JOIN batch_subjects bs ON sp.batch_subject_id = bs.batch_subject_id 
+            SELECT s.name AS subject_name, pr.planned_sessions, pr.completed_sessions, 
+                   sec.name AS section_name, pr.semester, u.name as faculty_name
+            FROM subject_progress_rollup pr 
+            JOIN sections sec ON pr.section_id = sec.section_id
+            JOIN batch_subjects bs ON pr.batch_subject_id = bs.batch_subject_id 
             JOIN subjects s ON bs.subject_id = s.subject_id
-            JOIN users u ON sp.faculty_id = u.user_id
-            WHERE bd.department_id = %s
+            JOIN users u ON pr.faculty_id = u.user_id
+            WHERE pr.department_id = %s
         """
         params = [hod_department_id]
         if year:
-            query += " AND b.year = %s"
+            query += " AND pr.year = %s"
             params.append(year)
         if semester:
-            query += " AND b.semester = %s"
+            query += " AND pr.semester = %s"
             params.append(semester)
         if faculty_id:
-            query += " AND sp.faculty_id = %s"
+            query += " AND pr.faculty_id = %s"
             params.append(faculty_id)
         if section_id: # New condition for section filter
-            query += " AND sp.section_id = %s"
+            query += " AND pr.section_id = %s"
             params.append(section_id)
 
-        query += " GROUP BY sp.batch_subject_id"
+        query += " GROUP BY pr.batch_subject_id"
         
         cursor.execute(query, tuple(params))
         progress_data = cursor.fetchall()
@@ -2459,12 +2382,12 @@ def get_lagging_subjects():
         if not hod_department_id_row: return jsonify([])
         hod_department_id = hod_department_id_row['department_id']
         cursor.execute("""
-            SELECT s.name AS subject_name, sec.name AS section_name, sp.planned_sessions AS total_sessions, sp.completed_sessions
-            FROM subject_progress sp JOIN sections sec ON sp.section_id = sec.section_id
-            JOIN batch_departments bd ON sec.batch_id = bd.batch_id JOIN batch_subjects bs ON sp.batch_subject_id = bs.batch_subject_id
-            JOIN subjects s ON bs.subject_id = s.subject_id WHERE bd.department_id = %s
-            AND (sp.completed_sessions / sp.planned_sessions) * 100 < 50
-            ORDER BY (sp.completed_sessions / sp.planned_sessions) ASC
+            SELECT s.name AS subject_name, sec.name AS section_name, pr.planned_sessions AS total_sessions, pr.completed_sessions
+            FROM subject_progress_rollup pr JOIN sections sec ON pr.section_id = sec.section_id
+            JOIN batch_subjects bs ON pr.batch_subject_id = bs.batch_subject_id
+            JOIN subjects s ON bs.subject_id = s.subject_id WHERE pr.department_id = %s
+            AND pr.completion_ratio < 0.5
+            ORDER BY pr.completion_ratio ASC
         """, (hod_department_id,))
         lagging_subjects = cursor.fetchall()
         for subject in lagging_subjects:
@@ -2495,30 +2418,28 @@ def get_lagging_subjects_filtered():
         hod_department_id = hod_department_id_row['department_id']
         
         query = """
-            SELECT s.name AS subject_name, sec.name AS section_name, sp.planned_sessions AS total_sessions, sp.completed_sessions
-            FROM subject_progress sp 
-            JOIN sections sec ON sp.section_id = sec.section_id
-            JOIN batches b ON sec.batch_id = b.batch_id
-            JOIN batch_departments bd ON b.batch_id = bd.batch_id 
-            JOIN batch_subjects bs ON sp.batch_subject_id = bs.batch_subject_id
+            SELECT s.name AS subject_name, sec.name AS section_name, pr.planned_sessions AS total_sessions, pr.completed_sessions
+            FROM subject_progress_rollup pr 
+            JOIN sections sec ON pr.section_id = sec.section_id
+            JOIN batch_subjects bs ON pr.batch_subject_id = bs.batch_subject_id
             JOIN subjects s ON bs.subject_id = s.subject_id
-            WHERE bd.department_id = %s AND (sp.completed_sessions / sp.planned_sessions) * 100 < 50
+            WHERE pr.department_id = %s AND pr.completion_ratio < 0.5
         """
         params = [hod_department_id]
         if year:
-            query += " AND b.year = %s"
+            query += " AND pr.year = %s"
             params.append(year)
         if semester:
-            query += " AND b.semester = %s"
+            query += " AND pr.semester = %s"
             params.append(semester)
         if faculty_id:
-            query += " AND sp.faculty_id = %s"
+            query += " AND pr.faculty_id = %s"
             params.append(faculty_id)
         if section_id: # New condition for section filter
-            query += " AND sp.section_id = %s"
+            query += " AND pr.section_id = %s"
             params.append(section_id)
 
-        query += " ORDER BY (sp.completed_sessions / sp.planned_sessions) ASC"
+        query += " ORDER BY pr.completion_ratio ASC"
         
         cursor.execute(query, tuple(params))
         lagging_subjects = cursor.fetchall()
@@ -2532,89 +2453,169 @@ def get_lagging_subjects_filtered():
         cursor.close()
         conn.close()
 
+def parse_date_window(args):
+    """Reads optional ISO `start_date`/`end_date` query arguments; raises ValueError on bad input."""
+    start_date = date.fromisoformat(args['start_date']) if args.get('start_date') else None
+    end_date = date.fromisoformat(args['end_date']) if args.get('end_date') else None
+    if start_date and end_date and end_date < start_date:
+        raise ValueError("end_date is before start_date")
+    return start_date, end_date
+
+def conditional_json(data):
+    """
+    JSON response with an ETag of its body. Clients that send the ETag back in
+    If-None-Match get an empty 304 when nothing changed; no-cache makes browsers
+    revalidate on every poll instead of reusing a stale copy.
+    """
+    response = jsonify(data)
+    response.add_etag()
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Fields of a resolved timetable occurrence returned by the HOD timetable views
+TIMETABLE_ENTRY_FIELDS = (
+    'entry_id', 'entry_date', 'day_of_week', 'start_time', 'end_time', 'subject_name',
+    'faculty_name', 'section_name', 'is_cancelled', 'is_completed'
+)
+
+def timetable_entry_status(entry):
+    """The JSON shape shared by the HOD timetable views for a resolved timetable occurrence."""
+    item = {field: entry[field] for field in TIMETABLE_ENTRY_FIELDS}
+    item['start_time'] = str(item['start_time']); item['end_time'] = str(item['end_time'])
+    item['entry_date'] = str(item['entry_date'])
+    item['classroom_name'] = entry['room_number']
+    if item['is_completed']:
+        item['type'] = 'completed'
+    elif item['is_cancelled']:
+        item['type'] = 'cancelled'
+    else:
+        item['type'] = 'scheduled'
+    if item['is_cancelled']:
+        item['status_reason'] = entry['status_reason'] or 'N/A'
+    return item
+
+# Longest date range a timetable listing or export may cover in one request
+MAX_TIMETABLE_WINDOW_DAYS = 31
+DEPARTMENT_TIMETABLE_PAGE_SIZE = 500
+DEPARTMENT_TIMETABLE_MAX_PAGE_SIZE = 2000
+
+def resolve_date_window(args, default_window='week'):
+    """
+    Returns the (start_date, end_date) a department timetable request covers.
+    Either explicit start_date/end_date (at most MAX_TIMETABLE_WINDOW_DAYS apart),
+    or `window` = week|month around `date` (default today). Raises ValueError.
+    """
+    start_date, end_date = parse_date_window(args)
+    if start_date or end_date:
+        if not (start_date and end_date):
+            raise ValueError("start_date and end_date must be given together")
+        if (end_date - start_date).days >= MAX_TIMETABLE_WINDOW_DAYS:
+            raise ValueError(f"window is longer than {MAX_TIMETABLE_WINDOW_DAYS} days")
+        return start_date, end_date
+
+    anchor = date.fromisoformat(args['date']) if args.get('date') else date.today()
+    window = args.get('window', default_window)
+    if window == 'week':
+        start_date = anchor - timedelta(days=anchor.weekday())
+        return start_date, start_date + timedelta(days=6)
+    if window == 'month':
+        start_date = anchor.replace(day=1)
+        next_month = (start_date + timedelta(days=32)).replace(day=1)
+        return start_date, next_month - timedelta(days=1)
+    raise ValueError("window must be 'week' or 'month'")
+
+def encode_page_cursor(entry):
+    """Opaque cursor for the (date, start_time, entry_id) ordering of timetable occurrences."""
+    entry_date, start_time, entry_id = timetable_occurrence_key(entry)
+    key = json.dumps([entry_date.isoformat(), start_time.isoformat(), entry_id])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+def decode_page_cursor(cursor_value):
+    try:
+        entry_date, start_time, entry_id = json.loads(base64.urlsafe_b64decode(cursor_value.encode()))
+        return date.fromisoformat(entry_date), time.fromisoformat(start_time), int(entry_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {e}")
+
+def get_hod_department_id(cursor, user_id):
+    cursor.execute("SELECT department_id FROM users WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    return row['department_id'] if row else None
+
+def department_timetable(hod_department_id, args, start_date, end_date, after=None, chunk_size=None):
+    """
+    The department's current timetables resolved into dated occurrences for the
+    window, narrowed by the year/semester/faculty/section filters, as a lazy
+    iterator (see iter_resolved_timetable) starting after the `after` cursor.
+    Shared by the JSON listing and the CSV export. Raises ValueError on a
+    non-numeric faculty_id once the first occurrence is read.
+    """
+    return TimetableGenerator().iter_resolved_timetable(
+        start_date, end_date, department_id=hod_department_id,
+        year=args.get('year') or None, semester=args.get('semester') or None,
+        faculty_id=args.get('faculty_id') or None, section_id=args.get('section_id') or None,
+        after=after, chunk_size=chunk_size
+    )
+
 @app.route('/api/hod/department/timetable')
 @login_required('hod')
 def get_department_timetable():
+    """
+    One page of the department timetable for a week or month window, resolved from
+    each section's current weekly timetable and its per-date exceptions. Pages
+    follow (date, start_time, entry_id) order; pass `next_cursor` back as `cursor`
+    to get the following page.
+    """
+    try:
+        start_date, end_date = resolve_date_window(request.args)
+        page_after = decode_page_cursor(request.args['cursor']) if request.args.get('cursor') else None
+        limit = min(int(request.args.get('limit', DEPARTMENT_TIMETABLE_PAGE_SIZE)), DEPARTMENT_TIMETABLE_MAX_PAGE_SIZE)
+        if limit < 1:
+            raise ValueError("limit must be positive")
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     conn = get_db_connection()
-    if conn is None: return jsonify([])
+    if conn is None: return jsonify({'error': 'Database connection failed'}), 500
     cursor = conn.cursor(dictionary=True)
     try:
-        year = request.args.get('year'); semester = request.args.get('semester'); faculty_id = request.args.get('faculty_id')
-        section_id = request.args.get('section_id') # New section filter
-        user_id = session['user_id']
-        cursor.execute("SELECT department_id FROM users WHERE user_id = %s", (user_id,))
-        hod_department_id_row = cursor.fetchone()
-        if not hod_department_id_row: return jsonify([])
-        hod_department_id = hod_department_id_row['department_id']
-        # MODIFIED: Added t.is_completed to the SELECT clause
-        query = """
-            SELECT t.entry_id, t.date AS entry_date, t.day_of_week, ts.start_time, ts.end_time, s.name AS subject_name,
-            u.name AS faculty_name, sec.name AS section_name, r.room_number AS classroom_name, t.is_cancelled, t.is_completed
-            FROM timetable t JOIN batch_subjects bs ON t.batch_subject_id = bs.batch_subject_id JOIN subjects s ON bs.subject_id = s.subject_id
-            JOIN users u ON t.faculty_id = u.user_id JOIN sections sec ON t.section_id = sec.section_id
-            JOIN batches b ON sec.batch_id = b.batch_id JOIN batch_departments bd ON b.batch_id = bd.batch_id
-            JOIN timeslots ts ON t.timeslot_id = ts.timeslot_id LEFT JOIN rooms r ON t.room_id = r.room_id WHERE bd.department_id = %s
-        """
-        params = [hod_department_id]
-        if year: query += " AND b.year = %s"; params.append(year)
-        if semester: query += " AND b.semester = %s"; params.append(semester)
-        if faculty_id: query += " AND t.faculty_id = %s"; params.append(faculty_id)
-        if section_id: query += " AND sec.section_id = %s"; params.append(section_id) # New condition
-        query += " ORDER BY t.date, ts.start_time"
-        cursor.execute(query, tuple(params))
-        timetable_data = cursor.fetchall()
-        for entry in timetable_data:
-            entry['start_time'] = str(entry['start_time']); entry['end_time'] = str(entry['end_time'])
-            entry['entry_date'] = str(entry['entry_date'])
-            # MODIFIED: Logic to set the 'type' based on completion status first
-            if entry['is_completed']:
-                entry['type'] = 'completed'
-            elif entry['is_cancelled']:
-                entry['type'] = 'cancelled'
-            else:
-                entry['type'] = 'scheduled'
-                
-            if entry['is_cancelled']:
-                cancel_cursor = conn.cursor(dictionary=True)
-                cancel_cursor.execute("SELECT reason FROM cancellations WHERE timetable_id = %s", (entry['entry_id'],))
-                reason = cancel_cursor.fetchone()
-                entry['status_reason'] = reason['reason'] if reason else 'N/A'
-                cancel_cursor.close()
-        return jsonify(timetable_data)
+        hod_department_id = get_hod_department_id(cursor, session['user_id'])
     except Error as e:
-        print(f"Error fetching department timetable: {e}"); return jsonify([])
+        logger.error(f"Error fetching department timetable: {e}", exc_info=True)
+        return jsonify({'error': 'Error fetching department timetable'}), 500
     finally: cursor.close(); conn.close()
+    if not hod_department_id: return jsonify({'error': 'HOD department not found'}), 404
+
+    try:
+        # Only the page, plus one occurrence to tell whether another follows, is
+        # expanded from the template rows and overlaid with its exceptions
+        occurrences = list(islice(department_timetable(hod_department_id, request.args, start_date, end_date,
+                                                       after=page_after, chunk_size=limit + 1), limit + 1))
+        next_cursor = encode_page_cursor(occurrences[limit - 1]) if len(occurrences) > limit else None
+        return conditional_json({
+            'entries': [timetable_entry_status(entry) for entry in occurrences[:limit]],
+            'next_cursor': next_cursor,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat()
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Error as e:
+        logger.error(f"Error fetching department timetable: {e}", exc_info=True)
+        return jsonify({'error': 'Error fetching department timetable'}), 500
 
 @app.route('/api/hod/personal_timetable')
 @login_required('hod')
 def get_hod_personal_timetable():
-    conn = get_db_connection()
-    if conn is None: return jsonify([])
-    cursor = conn.cursor(dictionary=True)
     try:
-        user_id = session['user_id']
-        cursor.execute("""
-            SELECT t.entry_id, t.date AS entry_date, t.day_of_week, ts.start_time, ts.end_time, s.name AS subject_name,
-            sec.name AS section_name, r.room_number AS classroom_name, t.is_cancelled
-            FROM timetable t JOIN batch_subjects bs ON t.batch_subject_id = bs.batch_subject_id
-            JOIN subjects s ON bs.subject_id = s.subject_id JOIN sections sec ON t.section_id = sec.section_id
-            JOIN timeslots ts ON t.timeslot_id = ts.timeslot_id LEFT JOIN rooms r ON t.room_id = r.room_id
-            WHERE t.faculty_id = %s ORDER BY t.date, ts.start_time
-        """, (user_id,))
-        timetable_data = cursor.fetchall()
-        for entry in timetable_data:
-            entry['start_time'] = str(entry['start_time']); entry['end_time'] = str(entry['end_time'])
-            entry['entry_date'] = str(entry['entry_date']); entry['type'] = 'cancelled' if entry['is_cancelled'] else 'scheduled'
-            if entry['is_cancelled']:
-                cancel_cursor = conn.cursor(dictionary=True)
-                cancel_cursor.execute("SELECT reason FROM cancellations WHERE timetable_id = %s", (entry['entry_id'],))
-                reason = cancel_cursor.fetchone()
-                entry['status_reason'] = reason['reason'] if reason else 'N/A'
-                cancel_cursor.close()
-        return jsonify(timetable_data)
+        start_date, end_date = parse_date_window(request.args)
+    except ValueError as e:
+        return jsonify({'error': f"Invalid date window: {e}"}), 400
+    try:
+        occurrences = TimetableGenerator().resolve_timetable(start_date, end_date, faculty_id=session['user_id'])
+        return conditional_json([timetable_entry_status(entry) for entry in occurrences])
     except Error as e:
         print(f"Error fetching HOD personal timetable: {e}"); return jsonify([])
-    finally: cursor.close(); conn.close()
 
 @app.route('/api/hod/reports/progress_csv')
 @login_required('hod')
@@ -2634,33 +2635,30 @@ def download_progress_csv():
         hod_department_id = hod_department_id_row['department_id']
 
         query = """
-            SELECT s.name AS subject_name, sec.name AS section_name, b.semester, sp.planned_sessions, sp.completed_sessions
-            FROM subject_progress sp 
-            JOIN sections sec ON sp.section_id = sec.section_id
-            JOIN batches b ON sec.batch_id = b.batch_id 
-            JOIN batch_departments bd ON b.batch_id = bd.batch_id
-            JOIN batch_subjects bs ON sp.batch_subject_id = bs.batch_subject_id 
+            SELECT s.name AS subject_name, sec.name AS section_name, pr.semester, pr.planned_sessions, pr.completed_sessions
+            FROM subject_progress_rollup pr 
+            JOIN sections sec ON pr.section_id = sec.section_id
+            JOIN batch_subjects bs ON pr.batch_subject_id = bs.batch_subject_id 
             JOIN subjects s ON bs.subject_id = s.subject_id
-            WHERE bd.department_id = %s 
+            WHERE pr.department_id = %s 
         """
         params = [hod_department_id]
-        if year: query += " AND b.year = %s"; params.append(year)
-        if semester: query += " AND b.semester = %s"; params.append(semester)
-        if faculty_id: query += " AND sp.faculty_id = %s"; params.append(faculty_id)
-        if section_id: query += " AND sp.section_id = %s"; params.append(section_id)
+        if year: query += " AND pr.year = %s"; params.append(year)
+        if semester: query += " AND pr.semester = %s"; params.append(semester)
+        if faculty_id: query += " AND pr.faculty_id = %s"; params.append(faculty_id)
+        if section_id: query += " AND pr.section_id = %s"; params.append(section_id)
         
         query += " ORDER BY s.name, sec.name"
 
-        cursor.execute(query, tuple(params))
-        data = cursor.fetchall()
-        for item in data:
+        first_row, rows = first_or_none(stream_query_rows(query, tuple(params)))
+        if first_row is None: return Response("No data to generate report.", status=404)
+
+        def with_completion(item):
             item['completion_percentage'] = (item['completed_sessions'] / item['planned_sessions'] * 100) if item['planned_sessions'] > 0 else 0
-        
-        if not data: return Response("No data to generate report.", status=404)
-        output = io.StringIO(); fieldnames = ['subject_name', 'section_name', 'semester', 'planned_sessions', 'completed_sessions', 'completion_percentage']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader(); writer.writerows(data)
-        return Response(output.getvalue(), mimetype="text/csv", headers={"Content-disposition": "attachment; filename=department_progress_report.csv"})
+            return item
+
+        fieldnames = ['subject_name', 'section_name', 'semester', 'planned_sessions', 'completed_sessions', 'completion_percentage']
+        return csv_response(iter_csv_chunks(map(with_completion, rows), fieldnames=fieldnames), "department_progress_report.csv")
     except Error as e:
         print(f"Error generating CSV report: {e}"); return Response("Error generating report", status=500)
     finally: cursor.close(); conn.close()
@@ -2668,46 +2666,48 @@ def download_progress_csv():
 @app.route('/api/hod/reports/timetable_csv')
 @login_required('hod')
 def download_timetable_csv():
+    """
+    Streams the department timetable for a week or month window (default: this
+    month) as CSV, honouring the dashboard filters, one line per dated occurrence.
+    """
+    try:
+        start_date, end_date = resolve_date_window(request.args, default_window='month')
+    except ValueError as e:
+        return Response(f"Invalid date window: {e}", status=400)
     conn = get_db_connection()
     if conn is None: return Response("Database connection failed", status=500)
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor(dictionary=True, buffered=True)
     try:
-        year = request.args.get('year')
-        semester = request.args.get('semester')
-        faculty_id = request.args.get('faculty_id')
-        section_id = request.args.get('section_id')
-        user_id = session['user_id']
-        cursor.execute("SELECT department_id FROM users WHERE user_id = %s", (user_id,))
-        hod_department_id_row = cursor.fetchone()
-        if not hod_department_id_row: return Response("HOD department not found", status=404)
-        hod_department_id = hod_department_id_row['department_id']
-        cursor.execute("""
-            SELECT t.date, t.day_of_week, ts.start_time, ts.end_time, s.name AS subject_name, u.name AS faculty_name,
-            sec.name AS section_name, r.room_number AS classroom_name, t.is_cancelled, t.is_completed
-            FROM timetable t JOIN batch_subjects bs ON t.batch_subject_id = bs.batch_subject_id
-            JOIN subjects s ON bs.subject_id = s.subject_id JOIN users u ON t.faculty_id = u.user_id
-            JOIN sections sec ON t.section_id = sec.section_id JOIN batches b ON sec.batch_id = b.batch_id
-            JOIN batch_departments bd ON b.batch_id = bd.batch_id JOIN timeslots ts ON t.timeslot_id = ts.timeslot_id
-            LEFT JOIN rooms r ON t.room_id = r.room_id WHERE bd.department_id = %s ORDER BY t.date, ts.start_time
-        """, (hod_department_id,))
-        data = cursor.fetchall()
-        for row in data:
-            row['start_time'] = str(row['start_time']); row['end_time'] = str(row['end_time']); row['date'] = str(row['date'])
-            if row['is_completed']:
-                row['status'] = 'Completed'
-            elif row['is_cancelled']:
-                row['status'] = 'Cancelled'
-            else:
-                row['status'] = 'Scheduled'
-            del row['is_cancelled']; del row['is_completed']
-        if not data: return Response("No data to generate report.", status=404)
-        output = io.StringIO(); fieldnames = ['date', 'day_of_week', 'start_time', 'end_time', 'subject_name', 'faculty_name', 'section_name', 'classroom_name', 'status']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader(); writer.writerows(data)
-        return Response(output.getvalue(), mimetype="text/csv", headers={"Content-disposition": "attachment; filename=department_timetable_report.csv"})
+        hod_department_id = get_hod_department_id(cursor, session['user_id'])
     except Error as e:
         print(f"Error generating CSV report: {e}"); return Response("Error generating report", status=500)
     finally: cursor.close(); conn.close()
+    if not hod_department_id:
+        return Response("HOD department not found", status=404)
+
+    fieldnames = ['entry_date', 'day_of_week', 'start_time', 'end_time', 'subject_name', 'faculty_name', 'section_name', 'classroom_name', 'status']
+
+    def with_status(row):
+        row['classroom_name'] = row['room_number']
+        if row['is_completed']:
+            row['status'] = 'Completed'
+        elif row['is_cancelled']:
+            row['status'] = 'Cancelled'
+        else:
+            row['status'] = 'Scheduled'
+        return row
+
+    filename = f"department_timetable_{start_date.isoformat()}_{end_date.isoformat()}.csv"
+    try:
+        # Reading the first occurrence validates the filters and runs the template
+        # query here; the rest are resolved chunk by chunk as the body is sent
+        first_row, occurrences = first_or_none(department_timetable(hod_department_id, request.args, start_date, end_date))
+    except ValueError as e:
+        return Response(f"Invalid filter: {e}", status=400)
+    except Error as e:
+        print(f"Error generating CSV report: {e}"); return Response("Error generating report", status=500)
+    rows = map(with_status, occurrences or ())
+    return csv_response(iter_csv_chunks(rows, header=['date'] + fieldnames[1:], fieldnames=fieldnames), filename)
 
 @app.route('/api/hod/reports/lagging_csv')
 @login_required('hod')
@@ -2727,29 +2727,29 @@ def download_lagging_csv():
         hod_department_id = hod_department_id_row['department_id']
         
         query = """
-            SELECT s.name AS subject_name, sec.name AS section_name, sp.planned_sessions AS total_sessions, sp.completed_sessions
-            FROM subject_progress sp JOIN sections sec ON sp.section_id = sec.section_id
-            JOIN batch_departments bd ON sec.batch_id = bd.batch_id JOIN batch_subjects bs ON sp.batch_subject_id = bs.batch_subject_id
-            JOIN subjects s ON bs.subject_id = s.subject_id JOIN batches b ON sec.batch_id = b.batch_id
-            WHERE bd.department_id = %s AND (sp.completed_sessions / sp.planned_sessions) * 100 < 50
+            SELECT s.name AS subject_name, sec.name AS section_name, pr.planned_sessions AS total_sessions, pr.completed_sessions
+            FROM subject_progress_rollup pr JOIN sections sec ON pr.section_id = sec.section_id
+            JOIN batch_subjects bs ON pr.batch_subject_id = bs.batch_subject_id
+            JOIN subjects s ON bs.subject_id = s.subject_id
+            WHERE pr.department_id = %s AND pr.completion_ratio < 0.5
         """
         params = [hod_department_id]
-        if year: query += " AND b.year = %s"; params.append(year)
-        if semester: query += " AND b.semester = %s"; params.append(semester)
-        if faculty_id: query += " AND sp.faculty_id = %s"; params.append(faculty_id)
-        if section_id: query += " AND sp.section_id = %s"; params.append(section_id)
+        if year: query += " AND pr.year = %s"; params.append(year)
+        if semester: query += " AND pr.semester = %s"; params.append(semester)
+        if faculty_id: query += " AND pr.faculty_id = %s"; params.append(faculty_id)
+        if section_id: query += " AND pr.section_id = %s"; params.append(section_id)
         
-        query += " ORDER BY (sp.completed_sessions / sp.planned_sessions) ASC"
+        query += " ORDER BY pr.completion_ratio ASC"
         
-        cursor.execute(query, tuple(params))
-        data = cursor.fetchall()
-        for row in data:
+        first_row, rows = first_or_none(stream_query_rows(query, tuple(params)))
+        if first_row is None: return Response("No data to generate report.", status=404)
+
+        def with_completion(row):
             row['completion_percentage'] = f"{round((row['completed_sessions'] / row['total_sessions']) * 100, 2) if row['total_sessions'] > 0 else 0}%"
-        if not data: return Response("No data to generate report.", status=404)
-        output = io.StringIO(); fieldnames = ['subject_name', 'section_name', 'total_sessions', 'completed_sessions', 'completion_percentage']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader(); writer.writerows(data)
-        return Response(output.getvalue(), mimetype="text/csv", headers={"Content-disposition": "attachment; filename=lagging_subjects_report.csv"})
+            return row
+
+        fieldnames = ['subject_name', 'section_name', 'total_sessions', 'completed_sessions', 'completion_percentage']
+        return csv_response(iter_csv_chunks(map(with_completion, rows), fieldnames=fieldnames), "lagging_subjects_report.csv")
     except Error as e:
         print(f"Error generating CSV report: {e}"); return Response("Error generating report", status=500)
     finally: cursor.close(); conn.close()
@@ -2757,31 +2757,29 @@ def download_lagging_csv():
 @app.route('/api/hod/reports/personal_timetable_csv')
 @login_required('hod')
 def download_hod_personal_timetable_csv():
-    conn = get_db_connection()
-    if conn is None: return Response("Database connection failed", status=500)
-    cursor = conn.cursor(dictionary=True)
+    """
+    Streams the HOD's own classes for a week or month window (default: this month)
+    as CSV, one line per dated occurrence, substitutions included.
+    """
+    try:
+        start_date, end_date = resolve_date_window(request.args, default_window='month')
+    except ValueError as e:
+        return Response(f"Invalid date window: {e}", status=400)
     try:
         user_id = session['user_id']
-        cursor.execute("""
-            SELECT t.date AS entry_date, t.day_of_week, ts.start_time, ts.end_time, s.name AS subject_name,
-            sec.name AS section_name, r.room_number AS classroom_name, t.is_cancelled
-            FROM timetable t JOIN batch_subjects bs ON t.batch_subject_id = bs.batch_subject_id
-            JOIN subjects s ON bs.subject_id = s.subject_id JOIN sections sec ON t.section_id = sec.section_id
-            JOIN timeslots ts ON t.timeslot_id = ts.timeslot_id LEFT JOIN rooms r ON t.room_id = r.room_id
-            WHERE t.faculty_id = %s ORDER BY t.date, ts.start_time
-        """, (user_id,))
-        data = cursor.fetchall()
-        for row in data:
-            row['start_time'] = str(row['start_time']); row['end_time'] = str(row['end_time']); row['entry_date'] = str(row['entry_date'])
-            row['status'] = 'Cancelled' if row['is_cancelled'] else 'Scheduled'; del row['is_cancelled']
-        if not data: return Response("No data to generate report.", status=404)
-        output = io.StringIO(); fieldnames = ['entry_date', 'day_of_week', 'start_time', 'end_time', 'subject_name', 'section_name', 'classroom_name', 'status']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader(); writer.writerows(data)
-        return Response(output.getvalue(), mimetype="text/csv", headers={"Content-disposition": "attachment; filename=hod_personal_timetable.csv"})
+        first_row, rows = first_or_none(TimetableGenerator().iter_resolved_timetable(start_date, end_date, faculty_id=user_id))
+        if first_row is None: return Response("No data to generate report.", status=404)
+
+        def with_status(row):
+            row['classroom_name'] = row['room_number']
+            row['status'] = 'Cancelled' if row['is_cancelled'] else 'Scheduled'
+            return row
+
+        fieldnames = ['entry_date', 'day_of_week', 'start_time', 'end_time', 'subject_name', 'section_name', 'classroom_name', 'status']
+        filename = f"hod_personal_timetable_{start_date.isoformat()}_{end_date.isoformat()}.csv"
+        return csv_response(iter_csv_chunks(map(with_status, rows), fieldnames=fieldnames), filename)
     except Error as e:
         print(f"Error generating CSV report: {e}"); return Response("Error generating report", status=500)
-    finally: cursor.close(); conn.close()
     
 # --- Generic Management Pages (Academic Coordinator) ---
 @app.route('/subjects_management')
@@ -3008,21 +3006,9 @@ def faculty_constraints_management():
     try:
         cursor.execute("SELECT user_id, name FROM users WHERE role = 'faculty' ORDER BY name")
         faculties = cursor.fetchall()
-        cursor.execute("""
-            SELECT fc.*, u.name AS faculty_name
-            FROM faculty_constraints fc
-            JOIN users u ON fc.faculty_id = u.user_id
-            ORDER BY u.name
-        """)
-        constraints = cursor.fetchall()
+        constraints = load_faculty_constraints(apply_defaults=False)
         for c in constraints:
-            if c['available_days']:
-                try:
-                    c['available_days'] = json.loads(c['available_days'])
-                except json.JSONDecodeError:
-                    c['available_days'] = []
-            else:
-                c['available_days'] = []
+            c['available_days'] = c['available_days'] or []
 
     except Error as e:
         flash(f"Error fetching faculty constraints data: {e}", 'error')
@@ -3186,6 +3172,7 @@ def add_record(table_name):
         
         cursor.execute(query, values_to_insert)
         conn.commit()
+        invalidate_reference_data(table_name)
         
         success_message = f"Record added to {table_name} successfully!"
         if table_name == 'subjects':
@@ -3324,6 +3311,7 @@ def edit_row(table_name):
 
         cursor.execute(query, values)
         conn.commit()
+        invalidate_reference_data(table_name)
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'message': f"Record in {table_name} updated successfully!"}), 200
         else:
@@ -3382,6 +3370,7 @@ def delete_record(table_name):
         query = f"DELETE FROM {table_name} WHERE {primary_key} = %s"
         cursor.execute(query, (primary_value,))
         conn.commit()
+        invalidate_reference_data(table_name)
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'message': f"Record in {table_name} deleted successfully!"}), 200
         flash(f"Record in {table_name} deleted successfully!", 'success')
@@ -3707,6 +3696,28 @@ def api_sections():
         logger.error(f"Error fetching sections: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
         
+@app.route("/api/admin/metrics")
+@login_required('academic_coordinator')
+def api_admin_metrics():
+    try:
+        return jsonify({'db_pool': get_pool_metrics(), 'reference_cache': get_reference_cache_stats()})
+    except Exception as e:
+        logger.error(f"Error fetching metrics: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/api/admin/progress_rollup/check", methods=['GET', 'POST'])
+@login_required('academic_coordinator')
+def api_admin_check_progress_rollup():
+    """
+    Recomputes the HOD progress rollup from subject_progress and reports the rows
+    that differ. POST also rebuilds the rollup when it has drifted.
+    """
+    try:
+        return jsonify(check_progress_rollup(repair=request.method == 'POST'))
+    except Exception as e:
+        logger.error(f"Error checking progress rollup: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+
 @app.errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
@@ -3717,4 +3728,9 @@ def internal_server_error(e):
     return render_template('500.html'), 500
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    debug = True
+    # The reloader runs this file twice: a watcher process and the child that serves
+    # requests (WERKZEUG_RUN_MAIN set). Only the serving process runs generation jobs.
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        generation_job_queue.ensure_started()
+    app.run(debug=debug, host='0.0.0.0', port=5000)
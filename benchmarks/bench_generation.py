@@ -0,0 +1,88 @@
+"""
+Per-section generation time on synthetic single-department inputs of 10, 50 and
+200 subjects (five per section, every third with a two-hour lab), solved
+in-process on the plain dicts: _prepare_problem_data, the partitioner and
+solve_section_group. Run from the repository root:
+
+    python -m benchmarks.bench_generation [--subjects 10 50 200] [--runs 3]
+
+`greedy` disables the backtracking search and the optimizer, so it is the
+SlotOccupancy slot search alone; `full` uses the default solver limits.
+"""
+import argparse
+import logging
+import statistics
+import time
+
+from advanced_timetable_logic import SlotOccupancy, TimetableGenerator, solve_section_group
+from benchmarks.synthetic import hard_conflicts, problem_batch, synthetic_institution
+
+SUBJECTS_PER_SECTION = 5
+GREEDY_LIMITS = (0, 0, 0)
+
+
+def solve(batch, calendar, solver_limits):
+    results = []
+    for group in TimetableGenerator()._partition_sections(batch):
+        group_results, _ = solve_section_group(group, {section_id: batch['sections'][section_id] for section_id in group},
+                                               batch['all_timeslots'], batch['faculty_constraints'], calendar,
+                                               TimetableGenerator.DEFAULT_SEED, solver_limits)
+        results.extend(group_results)
+    return results
+
+
+def free_starts_microseconds(batch, calls=20000):
+    """Mean cost of one SlotOccupancy.free_starts lookup against a busy week."""
+    occupancy = SlotOccupancy(batch['all_timeslots'])
+    for ordinal in range(0, len(occupancy.slot_keys), 3):
+        occupancy.occupy('section', 'faculty', 'room', ordinal, 1)
+    start = time.perf_counter()
+    for _ in range(calls):
+        occupancy.free_starts('section', 'faculty', 'room', 2, continuous=True, enforce_constraints=False)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--subjects', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args(argv)
+    logging.getLogger('advanced_timetable_logic').setLevel(logging.WARNING)
+
+    generator = TimetableGenerator()
+    limits = {'greedy': GREEDY_LIMITS, 'full': generator._solver_limits()}
+    print(f"median of {args.runs} runs; ms per section")
+    print(f"{'subjects':>8}{'sections':>9}{'sessions':>9}{'prepare':>9}{'greedy':>9}{'full':>9}{'placed':>10}{'conflicts':>10}")
+    for subjects in args.subjects:
+        institution = synthetic_institution(sections_per_department=max(1, subjects // SUBJECTS_PER_SECTION),
+                                            subjects_per_section=SUBJECTS_PER_SECTION)
+        batch = problem_batch(institution)
+        generator.faculty_constraints = batch['faculty_constraints']
+        sections = len(batch['sections'])
+
+        timings = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            prepared = [generator._prepare_problem_data(data) for data in batch['sections'].values()]
+            timings.append(time.perf_counter() - start)
+        row = {'prepare': statistics.median(timings)}
+        sessions = sum(len(data['assignments']) for data in prepared)
+        required = sum(data['total_assignments_to_schedule'] for data in prepared)
+
+        for name, solver_limits in limits.items():
+            timings = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                results = solve(batch, generator.calendar, solver_limits)
+                timings.append(time.perf_counter() - start)
+            row[name] = statistics.median(timings)
+        entries = [entry for result in results for entry in result['raw_timetable']]
+
+        print(f"{subjects:>8}{sections:>9}{sessions:>9}" + ''.join(
+            f"{row[name] / sections * 1000:>9.1f}" for name in ('prepare', 'greedy', 'full'))
+              + f"{len(entries):>5}/{required:<4g}{len(hard_conflicts(entries)):>10}")
+    print(f"free_starts: {free_starts_microseconds(batch):.2f}us per lookup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Batch generation speedup against worker count on a synthetic institution whose
+departments share no faculty or rooms, so each department is one independent
+section group. Run from the repository root:
+
+    python -m benchmarks.bench_parallel [--departments 8] [--sections 6] [--workers 1 2 4 8] [--runs 3]
+
+Times generate_timetables_for_sections end to end, worker spawn included. The
+speedup cannot exceed the number of groups or of CPUs, both printed first.
+"""
+import argparse
+import logging
+import os
+import statistics
+import time
+
+from benchmarks.synthetic import InMemoryTimetableGenerator, hard_conflicts, synthetic_institution
+
+# At import, so the spawned workers (which re-import this module) are quiet too
+logging.getLogger('advanced_timetable_logic').setLevel(logging.WARNING)
+
+
+def run(institution, section_ids, workers, runs):
+    timings, outcome = [], None
+    for _ in range(runs):
+        generator = InMemoryTimetableGenerator(institution)
+        start = time.perf_counter()
+        result = generator.generate_timetables_for_sections(section_ids, max_workers=workers)
+        timings.append(time.perf_counter() - start)
+        outcome = {'workers': result['workers'], 'groups': result['section_groups'],
+                   'conflicts': len(hard_conflicts(generator.current_entries()))}
+    return statistics.median(timings), outcome
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--departments', type=int, default=8)
+    parser.add_argument('--sections', type=int, default=6, help="sections per department")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    institution = synthetic_institution(departments=args.departments, sections_per_department=args.sections)
+    section_ids = [section['section_id'] for section in institution['sections']]
+    print(f"{args.departments} departments x {args.sections} sections, {os.cpu_count()} CPUs, "
+          f"median of {args.runs} runs")
+    print(f"{'workers':>8}{'used':>6}{'groups':>8}{'seconds':>9}{'speedup':>9}{'conflicts':>11}")
+    baseline = None
+    for workers in args.workers:
+        seconds, outcome = run(institution, section_ids, workers, args.runs)
+        baseline = baseline or seconds
+        print(f"{workers:>8}{outcome['workers']:>6}{outcome['groups']:>8}{seconds:>9.2f}"
+              f"{baseline / seconds:>8.2f}x{outcome['conflicts']:>11}")
+
+
+# Guarded: the worker processes are spawned and re-import this module
+if __name__ == '__main__':
+    main()
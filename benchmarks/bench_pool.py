@@ -0,0 +1,174 @@
+"""
+Dashboard request latency (p50/p99) under concurrent load, with a new connection per
+get_db_connection call against the shared ConnectionPool, on a stand-in MySQL
+server. Run from the repository root:
+
+    python -m benchmarks.bench_pool [--concurrency 50] [--requests 1000] [--queries 6]
+                                    [--connect-ms 5] [--query-ms 1] [--server-threads 8]
+
+No database is needed. StubConnection replaces mysql.connector's connection: a new
+connection costs `--connect-ms` of server time for the TCP and auth handshake, each
+statement `--query-ms`, and the session reset the pool does on return one round
+trip. The server runs `--server-threads` of that work at a time. A request borrows
+a connection, runs `--queries` statements and closes it, as the dashboards do.
+"""
+import argparse
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import mysql.connector
+from mysql.connector import pooling
+from mysql.connector.connection import MySQLConnection
+
+import advanced_timetable_logic
+from advanced_timetable_logic import ConnectionPool, DBConfig, db_config
+
+ROUND_TRIP_SECONDS = 0.0002
+
+
+class StandInServer:
+    """Runs at most `threads` pieces of work at once and queues the rest first come, first served."""
+
+    def __init__(self, threads, connect_seconds, query_seconds):
+        self.connect_seconds = connect_seconds
+        self.query_seconds = query_seconds
+        self.connects = 0
+        self._free_threads = threads
+        self._waiting = deque()
+        self._lock = threading.Lock()
+
+    def work(self, seconds):
+        with self._lock:
+            turn = None
+            if self._free_threads and not self._waiting:
+                self._free_threads -= 1
+            else:
+                turn = threading.Event()
+                self._waiting.append(turn)
+        if turn:
+            turn.wait()
+        try:
+            time.sleep(seconds)
+        finally:
+            with self._lock:
+                if self._waiting:
+                    self._waiting.popleft().set()
+                else:
+                    self._free_threads += 1
+
+
+class StubCursor:
+    def __init__(self, server):
+        self._server = server
+
+    def execute(self, query, params=None):
+        self._server.work(self._server.query_seconds)
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
+
+
+class StubConnection(MySQLConnection):
+    """A MySQLConnection, so MySQLConnectionPool accepts it, that talks to a StandInServer."""
+
+    def __init__(self, server):
+        super().__init__()
+        self._server = server
+        self._open = True
+        server.connects += 1
+        time.sleep(ROUND_TRIP_SECONDS)
+        server.work(server.connect_seconds)
+
+    def is_connected(self):
+        return self._open
+
+    def reset_session(self, user_variables=None, session_variables=None):
+        time.sleep(ROUND_TRIP_SECONDS)
+
+    def cursor(self, *args, **kwargs):
+        return StubCursor(self._server)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self._open = False
+
+    disconnect = close
+
+
+def dashboard_request(get_connection, queries):
+    start = time.perf_counter()
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for _ in range(queries):
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    return time.perf_counter() - start
+
+
+def run_load(get_connection, args):
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        start = time.perf_counter()
+        latencies = list(executor.map(lambda _: dashboard_request(get_connection, args.queries), range(args.requests)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'p50': statistics.median(latencies),
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+        'throughput': len(latencies) / elapsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--queries', type=int, default=6, help="statements per dashboard request")
+    parser.add_argument('--connect-ms', type=float, default=5.0)
+    parser.add_argument('--query-ms', type=float, default=1.0)
+    parser.add_argument('--server-threads', type=int, default=8)
+    parser.add_argument('--pool-size', type=int, default=DBConfig.DB_POOL_SIZE)
+    args = parser.parse_args(argv)
+
+    def new_server():
+        return StandInServer(args.server_threads, args.connect_ms / 1000, args.query_ms / 1000)
+
+    print(f"{args.concurrency} concurrent clients, {args.requests} requests of {args.queries} queries, "
+          f"connect {args.connect_ms}ms, query {args.query_ms}ms, {args.server_threads} server threads")
+    print(f"{'':<28}{'p50 ms':>9}{'p99 ms':>9}{'req/s':>9}{'connects':>10}")
+
+    # Before: every get_db_connection call was a mysql.connector.connect
+    server = new_server()
+    with mock.patch.object(mysql.connector, 'connect', lambda **kwargs: StubConnection(server)):
+        unpooled = run_load(lambda: mysql.connector.connect(**db_config), args)
+    rows = [('new connection per request', unpooled, server.connects)]
+
+    # After: get_db_connection borrows from the process-wide ConnectionPool
+    server = new_server()
+    with mock.patch.object(pooling, 'connect', lambda **kwargs: StubConnection(server)):
+        pool = ConnectionPool(db_config, pool_size=args.pool_size, pool_name='bench_pool')
+        with mock.patch.object(advanced_timetable_logic, 'get_connection_pool', lambda: pool):
+            pooled = run_load(advanced_timetable_logic.get_db_connection, args)
+    rows.append((f"pool of {args.pool_size}", pooled, server.connects))
+
+    for name, result, connects in rows:
+        print(f"{name:<28}{result['p50'] * 1000:>9.1f}{result['p99'] * 1000:>9.1f}{result['throughput']:>9.0f}{connects:>10}")
+    metrics = pool.metrics()
+    print(f"pool: peak in use {metrics['peak_in_use']}, avg wait {metrics['avg_wait_ms']}ms, "
+          f"avg hold {metrics['avg_hold_ms']}ms, timeouts {metrics['timeouts']}")
+
+
+if __name__ == '__main__':
+    main()
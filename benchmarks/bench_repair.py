@@ -0,0 +1,98 @@
+"""
+Incremental repair (repair_timetables) against a full regeneration of the same
+section, on a synthetic institution generated once up front. Run from the
+repository root:
+
+    python -m benchmarks.bench_repair [--departments 8] [--sections 6] [--runs 5]
+
+Scenarios: nothing changed; one faculty member of the first section becomes
+unavailable for the day of their first class; one of the section's subjects is
+reassigned to another faculty member of the department. `rows loaded` is the
+number of current rows the repair read, out of every current row in the institution.
+"""
+import argparse
+import copy
+import logging
+import statistics
+import time
+from datetime import timedelta
+
+from benchmarks.synthetic import InMemoryTimetableGenerator, hard_conflicts, synthetic_institution
+
+
+def make_unavailable(institution, generator, section_id):
+    row = next(row for row in generator.current_entries() if row['section_id'] == section_id)
+    institution['unavailability'].append({'faculty_id': row['faculty_id'], 'day_of_week': row['day_of_week'],
+                                          'start_time': timedelta(hours=0), 'end_time': timedelta(hours=23)})
+
+
+def reassign_subject(institution, generator, section_id):
+    assignments = [fa for fa in institution['faculty_subjects'] if fa['section_id'] == section_id]
+    other_faculty = next(fa['faculty_id'] for fa in institution['faculty_subjects']
+                         if fa['faculty_id'] != assignments[0]['faculty_id'] and fa['section_id'] != section_id
+                         and fa['faculty_id'] // 10000 == assignments[0]['faculty_id'] // 10000)
+    assignments[0]['faculty_id'] = other_faculty
+    assignments[0]['faculty_name'] = f"Faculty {other_faculty}"
+
+
+SCENARIOS = [
+    ('no change', lambda institution, generator, section_id: None),
+    ('faculty unavailable for a day', make_unavailable),
+    ('subject reassigned', reassign_subject),
+]
+
+
+def run_scenario(base, change, runs):
+    timings, outcome = [], None
+    for _ in range(runs):
+        institution = copy.deepcopy(base)
+        generator = InMemoryTimetableGenerator(institution)
+        section_ids = [section['section_id'] for section in institution['sections']]
+        generator.generate_timetables_for_sections(section_ids, max_workers=1)
+        total_rows = len(generator.current_entries())
+        change(institution, generator, section_ids[0])
+        generator.rows_loaded = 0
+
+        start = time.perf_counter()
+        result = generator.repair_timetables([section_ids[0]])
+        timings.append(time.perf_counter() - start)
+        outcome = {
+            'sections_changed': result['sections_changed'], 'sessions_moved': result['sessions_moved'],
+            'rows_loaded': generator.rows_loaded, 'total_rows': total_rows,
+            'conflicts': len(hard_conflicts(generator.current_entries())),
+        }
+    return statistics.median(timings), outcome
+
+
+def run_regeneration(base, runs):
+    timings = []
+    for _ in range(runs):
+        institution = copy.deepcopy(base)
+        generator = InMemoryTimetableGenerator(institution)
+        section_id = institution['sections'][0]['section_id']
+        start = time.perf_counter()
+        generator.generate_timetables_for_sections([section_id], max_workers=1)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--departments', type=int, default=8)
+    parser.add_argument('--sections', type=int, default=6, help="sections per department")
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args(argv)
+    logging.getLogger('advanced_timetable_logic').setLevel(logging.WARNING)
+
+    base = synthetic_institution(departments=args.departments, sections_per_department=args.sections)
+    print(f"{args.departments} departments x {args.sections} sections, median of {args.runs} runs")
+    print(f"{'scenario':<32}{'ms':>9}{'changed':>9}{'moved':>7}{'rows loaded':>14}{'conflicts':>11}")
+    for name, change in SCENARIOS:
+        seconds, outcome = run_scenario(base, change, args.runs)
+        print(f"{name:<32}{seconds * 1000:>9.1f}{outcome['sections_changed']:>9}{outcome['sessions_moved']:>7}"
+              f"{outcome['rows_loaded']:>7}/{outcome['total_rows']:<6}{outcome['conflicts']:>11}")
+    print(f"{'full regeneration of the section':<32}{run_regeneration(base, args.runs) * 1000:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Synthetic institutions for the benchmarks and tests, built as the plain dicts the
+generator loads from the database, plus a TimetableGenerator that serves them
+(and keeps its saved timetables) in memory.
+"""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from advanced_timetable_logic import FACULTY_CONSTRAINT_DEFAULTS, ProblemSnapshot, TimetableGenerator
+
+TEACHING_DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+# One-hour periods, with a lunch break after the fourth
+PERIOD_START_HOURS = [9, 10, 11, 12, 14, 15, 16]
+SECTION_STRENGTH = 60
+
+
+def synthetic_institution(departments=1, sections_per_department=2, subjects_per_section=5,
+                          theory_sessions_per_week=3, lab_every=3, lab_duration_hours=2,
+                          subjects_per_faculty=2):
+    """
+    Rows shaped like the timeslots, rooms, sections and faculty_subjects queries.
+    Every section has its own theory room; every `lab_every`-th subject also has a
+    weekly lab in one of its department's labs. Each department has its own faculty
+    pool, `subjects_per_faculty` subjects per member, so departments share nothing.
+    """
+    timeslots = []
+    for day in TEACHING_DAYS:
+        for hour in PERIOD_START_HOURS:
+            timeslots.append({
+                'timeslot_id': len(timeslots) + 1, 'day_of_week': day, 'is_active': 1,
+                'start_time': timedelta(hours=hour), 'end_time': timedelta(hours=hour + 1),
+            })
+
+    rooms, sections, faculty_subjects = [], [], []
+    faculty_count = math.ceil(sections_per_department * subjects_per_section / subjects_per_faculty)
+    labs_per_department = max(1, math.ceil(sections_per_department / 2))
+    for department in range(departments):
+        labs = []
+        for lab in range(labs_per_department):
+            room_id = 1000 * (department + 1) + 500 + lab
+            rooms.append({'room_id': room_id, 'room_number': f"D{department + 1}-LAB{lab + 1}", 'room_type': 'Lab',
+                          'capacity': SECTION_STRENGTH, 'is_active': 1})
+            labs.append(room_id)
+        for index in range(sections_per_department):
+            section_id = 100 * (department + 1) + index + 1
+            room_id = 1000 * (department + 1) + index + 1
+            rooms.append({'room_id': room_id, 'room_number': f"D{department + 1}-{index + 1:03d}", 'room_type': 'Lecture',
+                          'capacity': SECTION_STRENGTH, 'is_active': 1})
+            sections.append({
+                'section_id': section_id, 'name': f"D{department + 1}-S{index + 1}", 'batch_id': department + 1,
+                'total_students': SECTION_STRENGTH, 'max_subsection_size': SECTION_STRENGTH // 2,
+                'academic_year_id': 1, 'semester': 1, 'department_name': f"Department {department + 1}",
+                'year_name': '2025-26', 'theory_room_id': room_id,
+            })
+            for subject in range(subjects_per_section):
+                has_lab = lab_every and subject % lab_every == 0
+                faculty_id = 10000 * (department + 1) + (index * subjects_per_section + subject) % faculty_count + 1
+                faculty_subjects.append({
+                    'faculty_subject_id': len(faculty_subjects) + 1, 'section_id': section_id, 'faculty_id': faculty_id,
+                    'batch_subject_id': section_id * 100 + subject + 1, 'subject_id': subject + 1,
+                    'subject_name': f"Subject {subject + 1}", 'subject_code': f"SUB{subject + 1:03d}", 'credits': 3,
+                    'theory_sessions_per_week': theory_sessions_per_week, 'lab_sessions_per_week': 1 if has_lab else 0,
+                    'has_lab': bool(has_lab), 'lab_duration_hours': lab_duration_hours, 'is_lab_continuous': 1,
+                    'preferred_lab_room_id': labs[index // 2 % len(labs)] if has_lab else None,
+                    'faculty_name': f"Faculty {faculty_id}",
+                })
+    return {'timeslots': timeslots, 'rooms': rooms, 'sections': sections,
+            'faculty_subjects': faculty_subjects, 'unavailability': []}
+
+
+def problem_batch(institution, section_ids=None):
+    """The dict TimetableGenerator._fetch_problem_data_for_sections returns, built without a database."""
+    snapshot = ProblemSnapshot({}, [dict(ts) for ts in institution['timeslots']],
+                               [dict(room) for room in institution['rooms']], list(institution['unavailability']))
+    section_info_by_id = {section['section_id']: section for section in institution['sections']}
+    if section_ids is None:
+        section_ids = list(section_info_by_id)
+    assignments_by_section = defaultdict(list)
+    for fa in institution['faculty_subjects']:
+        assignments_by_section[fa['section_id']].append(fa)
+    faculty_constraints = {
+        fa['faculty_id']: dict(FACULTY_CONSTRAINT_DEFAULTS)
+        for section_id in section_ids for fa in assignments_by_section[section_id]
+    }
+
+    sections, errors = {}, {}
+    for section_id in section_ids:
+        if section_id not in section_info_by_id:
+            errors[section_id] = f"Section ID {section_id} not found."
+        elif not assignments_by_section[section_id]:
+            errors[section_id] = f"No faculty assignments found for section {section_id}."
+        else:
+            faculty_assignments = assignments_by_section[section_id]
+            sections[section_id] = {
+                'section_info': section_info_by_id[section_id],
+                'faculty_assignments': faculty_assignments,
+                'all_timeslots': snapshot.timeslots,
+                'all_rooms': snapshot.rooms,
+                'all_rooms_list': snapshot.rooms,
+                'faculty_assignments_raw': {fa['faculty_subject_id']: fa for fa in faculty_assignments},
+                'faculty_constraints': faculty_constraints,
+                'faculty_unavailability': snapshot.faculty_unavailability,
+                'rooms_by_type': snapshot.rooms_by_type,
+                'room_capacities_by_type': snapshot.room_capacities_by_type,
+            }
+    return {
+        'sections': sections,
+        'errors': errors,
+        'all_timeslots': snapshot.timeslots,
+        'all_rooms': snapshot.rooms,
+        'faculty_constraints': faculty_constraints,
+        'faculty_unavailability': snapshot.faculty_unavailability,
+    }
+
+
+def hard_conflicts(entries):
+    """(resource, day, timeslot) keys booked more than once across `entries`."""
+    seen, conflicts = set(), []
+    for entry in entries:
+        for resource in (('section', entry['section_id']), ('faculty', entry['faculty_id']), ('room', entry['room_id'])):
+            key = resource + (entry['day_of_week'], entry['timeslot_id'])
+            if key in seen:
+                conflicts.append(key)
+            seen.add(key)
+    return conflicts
+
+
+class InMemoryTimetableGenerator(TimetableGenerator):
+    """
+    TimetableGenerator over a synthetic institution. Problem data comes from
+    `institution`, and generated or repaired timetables are kept in `rows` and
+    `current_logs` in place of the timetable and current_timetable tables.
+    Change `institution` between calls to simulate edits.
+    """
+
+    def __init__(self, institution, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.institution = institution
+        self.rows = []
+        self.current_logs = {}
+        # Current rows handed to repair_timetables, the in-memory counterpart of rows read
+        self.rows_loaded = 0
+        self._next_log_id = 1
+        self._next_entry_id = 1
+
+    def _fetch_problem_data_for_sections(self, section_ids):
+        batch = problem_batch(self.institution, section_ids)
+        self.all_timeslots = batch['all_timeslots']
+        self.all_rooms = batch['all_rooms']
+        self.faculty_constraints = batch['faculty_constraints']
+        self.faculty_unavailability = batch['faculty_unavailability']
+        return batch
+
+    def _fetch_problem_data(self, section_id):
+        batch = self._fetch_problem_data_for_sections([section_id])
+        if section_id in batch['errors']:
+            return {"error": batch['errors'][section_id]}
+        return batch['sections'][section_id]
+
+    def _cached_results(self, sections, problem_hashes):
+        return {}
+
+    def _new_row(self, section_id, log_id, entry, effective_from=None):
+        row = {
+            'entry_id': self._next_entry_id, 'section_id': section_id, 'faculty_id': entry['faculty_id'],
+            'batch_subject_id': entry['batch_subject_id'], 'timeslot_id': entry['timeslot_id'],
+            'day_of_week': entry['day_of_week'], 'room_id': entry['room_id'],
+            'is_lab_session': int(bool(entry.get('is_lab_session'))), 'log_id': log_id,
+            'calendar_start': self.calendar.start_date, 'calendar_end': self.calendar.end_date,
+            'effective_from': effective_from, 'effective_until': None,
+        }
+        self._next_entry_id += 1
+        self.rows.append(row)
+        return row
+
+    def save_batch_results(self, section_results):
+        log_ids = {}
+        for section_id, _, raw_timetable in section_results:
+            self.rows = [row for row in self.rows if row['section_id'] != section_id]
+            log_ids[section_id] = self.current_logs[section_id] = self._next_log_id
+            self._next_log_id += 1
+            for entry in raw_timetable:
+                self._new_row(section_id, log_ids[section_id], entry)
+        return log_ids
+
+    def _load_current_placements(self, section_ids=None, exclude_section_ids=None, faculty_ids=None, room_ids=None):
+        rows = [row for row in self.rows if self.current_logs.get(row['section_id']) == row['log_id']]
+        if section_ids is not None:
+            rows = [row for row in rows if row['section_id'] in section_ids]
+        if exclude_section_ids:
+            rows = [row for row in rows if row['section_id'] not in exclude_section_ids]
+        if faculty_ids is not None or room_ids is not None:
+            rows = [row for row in rows if row['faculty_id'] in (faculty_ids or ()) or row['room_id'] in (room_ids or ())]
+        self.rows_loaded += len(rows)
+        return [dict(row) for row in rows]
+
+    def save_repair_results(self, section_repairs):
+        log_ids = {}
+        rows_by_id = {row['entry_id']: row for row in self.rows}
+        for repair in section_repairs:
+            section_id = repair['section_id']
+            log_ids[section_id] = log_id = self.current_logs[section_id] = self._next_log_id
+            self._next_log_id += 1
+            retired = set(repair['retired_entry_ids'])
+            for row in self.rows:
+                if row['section_id'] == section_id and row['log_id'] == repair['old_log_id'] and row['entry_id'] not in retired:
+                    row['log_id'] = log_id
+            for entry_id in retired:
+                rows_by_id[entry_id]['effective_until'] = repair['repair_date'] - timedelta(days=1)
+            deleted = set(repair['deleted_entry_ids'])
+            self.rows = [row for row in self.rows if row['entry_id'] not in deleted]
+            for entry in repair['updated_rows']:
+                rows_by_id[entry['entry_id']].update(
+                    {key: entry[key] for key in ('faculty_id', 'room_id', 'timeslot_id', 'day_of_week')})
+            for entry in repair['replacement_rows']:
+                entry['entry_id'] = self._new_row(section_id, log_id, entry, repair['repair_date'])['entry_id']
+            for entry in repair['new_entries']:
+                entry['entry_id'] = self._new_row(section_id, log_id, entry, repair['new_entries_from'])['entry_id']
+        return log_ids
+
+    def current_entries(self):
+        """The current weekly rows of every section."""
+        return [dict(row) for row in self.rows if self.current_logs.get(row['section_id']) == row['log_id']]
@@ -0,0 +1,235 @@
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from datetime import datetime
+
+from mysql.connector import Error
+
+from advanced_timetable_logic import TimetableGenerator, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+def summarize_section_result(section, generation_result):
+    """Builds the per-section card shown on bulk_results.html from a generator result."""
+    generation_log = generation_result.get('generation_log') or {
+        'total_slots_required': 0,
+        'total_slots_assigned': 0,
+        'constraints_violated': [generation_result.get('error', 'Unknown error during bulk generation.')],
+        'generation_status': 'Failed'
+    }
+    return {
+        'section_id': section['section_id'],
+        'section_name': section.get('section_name'),
+        'department_name': section.get('department_name'),
+        'academic_year': section.get('academic_year'),
+        'semester': section.get('semester'),
+        'status': generation_log['generation_status'],
+        'error': generation_result.get('error'),
+        'details': {
+            'total_slots_assigned': generation_log.get('total_slots_assigned', 0),
+            'total_slots_required': generation_log.get('total_slots_required', 0),
+            'constraints_violated': generation_log.get('constraints_violated', [])
+        },
+        'log_id': generation_result.get('log_id')
+    }
+
+class GenerationJobQueue:
+    """
+    Runs timetable generation jobs on background threads. Jobs live in the
+    `generation_jobs` table, so a restarted process picks up whatever was
+    queued or left running by a worker that stopped heartbeating.
+    """
+    STALE_AFTER_SECONDS = 300
+    TERMINAL_STATUSES = ('Completed', 'Failed')
+
+    def __init__(self, num_workers=2, poll_interval=5):
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self._queue = queue.Queue()
+        # Job IDs on the local queue or being run here, so the sweeper does not queue them again
+        self._pending_ids = set()
+        self._lock = threading.Lock()
+        self._started_pid = None
+
+    def ensure_started(self):
+        """Starts the worker threads once per process and requeues unfinished jobs."""
+        if self._started_pid == os.getpid():
+            return
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            self._queue = queue.Queue()
+            self._pending_ids = set()
+            for index in range(self.num_workers):
+                # Only the first worker sweeps the table, so queued jobs are not put on the local queue repeatedly
+                worker = threading.Thread(target=self._worker_loop, args=(index == 0,), name=f"generation-worker-{index}", daemon=True)
+                worker.start()
+            logger.info(f"Started {self.num_workers} generation workers in process {os.getpid()}")
+
+    def enqueue(self, sections, start_date=None, created_by=None, semester_weeks=1):
+        """Stores a job for the given sections and returns its job_id."""
+        pending = [summarize_section_result(section, {'generation_log': {
+            'generation_status': 'Pending', 'total_slots_assigned': 0, 'total_slots_required': 0, 'constraints_violated': []
+        }}) for section in sections]
+        job_id = self._execute("""
+            INSERT INTO generation_jobs (status, section_ids, start_date, semester_weeks, total_sections, results, created_by)
+            VALUES ('Queued', %s, %s, %s, %s, %s, %s)
+        """, (json.dumps([section['section_id'] for section in sections]), start_date, semester_weeks, len(sections), json.dumps(pending), created_by), return_id=True)
+        self.ensure_started()
+        self._put(job_id)
+        logger.info(f"Queued generation job {job_id} for {len(sections)} sections")
+        return job_id
+
+    def get_job(self, job_id):
+        """Returns the job row with decoded results and progress/ETA figures, or None."""
+        job = self._execute("SELECT * FROM generation_jobs WHERE job_id = %s", (job_id,), fetch=True)
+        if not job:
+            return None
+        job = job[0]
+        job['section_ids'] = json.loads(job['section_ids']) if job['section_ids'] else []
+        job['results'] = json.loads(job['results']) if job['results'] else []
+
+        eta_seconds = None
+        if job['status'] == 'Running' and job['started_at'] and job['sections_done']:
+            elapsed = (datetime.now() - job['started_at']).total_seconds()
+            eta_seconds = round(elapsed / job['sections_done'] * (job['total_sections'] - job['sections_done']), 1)
+        job['eta_seconds'] = eta_seconds
+        job['progress_percent'] = round(job['sections_done'] / job['total_sections'] * 100, 1) if job['total_sections'] else 100.0
+        job['is_finished'] = job['status'] in self.TERMINAL_STATUSES
+        for column in ('start_date', 'created_at', 'started_at', 'heartbeat_at', 'finished_at'):
+            if job.get(column):
+                job[column] = job[column].isoformat()
+        return job
+
+    def _execute(self, query, params=None, fetch=False, return_id=False):
+        conn = get_db_connection()
+        if not conn:
+            raise Error("Database connection failed")
+        cursor = conn.cursor(dictionary=True, buffered=True)
+        try:
+            cursor.execute(query, params)
+            if fetch:
+                return cursor.fetchall()
+            conn.commit()
+            return cursor.lastrowid if return_id else cursor.rowcount
+        finally:
+            cursor.close()
+            conn.close()
+
+    def _put(self, job_id):
+        """Puts a job on the local queue unless it is already waiting there or running here."""
+        with self._lock:
+            if job_id in self._pending_ids:
+                return False
+            self._pending_ids.add(job_id)
+        self._queue.put(job_id)
+        return True
+
+    def _requeue_unfinished(self):
+        """Queues jobs that are waiting or whose worker stopped heartbeating."""
+        self._execute("""
+            UPDATE generation_jobs SET status = 'Queued', worker_id = NULL
+            WHERE status = 'Running'
+              AND (heartbeat_at IS NULL OR heartbeat_at < NOW() - INTERVAL %s SECOND)
+        """, (self.STALE_AFTER_SECONDS,))
+        waiting = self._execute("SELECT job_id FROM generation_jobs WHERE status = 'Queued' ORDER BY job_id", fetch=True)
+        requeued = sum(self._put(row['job_id']) for row in waiting)
+        if requeued:
+            logger.info(f"Requeued {requeued} unfinished generation jobs")
+
+    def _claim(self, job_id, worker_id):
+        """Atomically moves a queued job to Running; False if another worker got it first."""
+        claimed = self._execute("""
+            UPDATE generation_jobs
+            SET status = 'Running', worker_id = %s, started_at = NOW(), heartbeat_at = NOW(),
+                sections_done = 0, slots_assigned = 0, slots_required = 0, error = NULL
+            WHERE job_id = %s AND status = 'Queued'
+        """, (worker_id, job_id))
+        return claimed == 1
+
+    def _worker_loop(self, sweeper):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}:{threading.current_thread().name}"
+        if sweeper:
+            try:
+                self._requeue_unfinished()
+            except Error as e:
+                logger.error(f"Could not requeue unfinished generation jobs: {e}", exc_info=True)
+
+        while True:
+            try:
+                job_id = self._queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                if not sweeper:
+                    continue
+                try:
+                    self._requeue_unfinished()
+                except Error as e:
+                    logger.error(f"Could not poll for generation jobs: {e}", exc_info=True)
+                continue
+
+            try:
+                if self._claim(job_id, worker_id):
+                    self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"Generation job {job_id} crashed: {e}", exc_info=True)
+                try:
+                    self._execute("""
+                        UPDATE generation_jobs SET status = 'Failed', error = %s, finished_at = NOW()
+                        WHERE job_id = %s
+                    """, (str(e), job_id))
+                except Error:
+                    pass
+            finally:
+                with self._lock:
+                    self._pending_ids.discard(job_id)
+
+    def _run_job(self, job_id):
+        job = self.get_job(job_id)
+        sections = {result['section_id']: result for result in job['results']}
+        start_date = datetime.fromisoformat(job['start_date']).date() if job['start_date'] else None
+        progress = {'slots_assigned': 0, 'slots_required': 0}
+
+        def on_section_done(generation_result, sections_done, total_sections):
+            section = sections[generation_result['section_id']]
+            sections[section['section_id']] = summarize_section_result(section, generation_result)
+            generation_log = generation_result.get('generation_log') or {}
+            progress['slots_assigned'] += generation_log.get('total_slots_assigned', 0)
+            progress['slots_required'] += int(generation_log.get('total_slots_required', 0))
+            self._execute("""
+                UPDATE generation_jobs
+                SET sections_done = %s, slots_assigned = %s, slots_required = %s, results = %s, heartbeat_at = NOW()
+                WHERE job_id = %s
+            """, (sections_done, progress['slots_assigned'], progress['slots_required'],
+                  json.dumps(list(sections.values())), job_id))
+
+        logger.info(f"Running generation job {job_id} for {job['total_sections']} sections")
+        batch_result = TimetableGenerator().generate_timetables_for_sections(
+            job['section_ids'], start_date=start_date, semester_weeks=job['semester_weeks'], progress_callback=on_section_done
+        )
+
+        if 'error' in batch_result:
+            # Sections already reported as Failed, or reused with their stored log, keep their
+            # result; the rest were never solved or their rows were not saved
+            for section in sections.values():
+                if section['status'] != 'Failed' and not section.get('log_id'):
+                    section['status'] = 'Failed'
+                    section['error'] = batch_result['error']
+            self._execute("""
+                UPDATE generation_jobs SET status = 'Failed', error = %s, results = %s, finished_at = NOW()
+                WHERE job_id = %s
+            """, (batch_result['error'], json.dumps(list(sections.values())), job_id))
+            return
+
+        for generation_result in batch_result['results']:
+            section = sections[generation_result['section_id']]
+            sections[section['section_id']] = summarize_section_result(section, generation_result)
+        self._execute("""
+            UPDATE generation_jobs
+            SET status = 'Completed', sections_done = total_sections, results = %s, finished_at = NOW(), heartbeat_at = NOW()
+            WHERE job_id = %s
+        """, (json.dumps(list(sections.values())), job_id))
+        logger.info(f"Generation job {job_id} completed in {batch_result['generation_seconds']:.2f}s")
@@ -0,0 +1,215 @@
+"""
+Applies the numbered SQL files in migrations/ to the configured database.
+
+    python migrate.py            apply pending migrations
+    python migrate.py --status   list applied and pending migrations
+    python migrate.py --check    EXPLAIN the hot timetable queries and report full scans
+
+reclassify_tables.sql is the full schema for a fresh install; the migrations
+bring an existing database up to it. They are written to be safe to re-run
+(IF NOT EXISTS), so running them against a fresh dump only records them.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sys
+
+import mysql.connector
+from mysql.connector import Error
+
+from advanced_timetable_logic import db_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS `schema_migrations` (
+      `version` int(11) NOT NULL,
+      `name` varchar(255) NOT NULL,
+      `checksum` char(64) NOT NULL,
+      `applied_at` datetime DEFAULT current_timestamp(),
+      PRIMARY KEY (`version`)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci
+"""
+
+# Queries that run on every dashboard load or export, with representative
+# parameters. --check fails if the timetable/log tables are read with a full scan.
+# fetch_room_timetable_data is left out: it reads most of the table by design.
+HOT_QUERIES = [
+    ('load_specific_timetable_raw',
+     "SELECT t.entry_id FROM timetable t WHERE t.log_id = %s ORDER BY t.date", (1,)),
+    ('latest_log_per_section',
+     """SELECT log_id FROM timetable_generation_log
+        WHERE section_id = %s AND status IN ('Success', 'Partial')
+        ORDER BY generation_date DESC LIMIT 1""", (1,)),
+    ('resolve_timetable_section',
+     """SELECT t.entry_id FROM current_timetable ct
+        JOIN timetable t ON t.section_id = ct.section_id AND (t.log_id = ct.log_id OR t.effective_until IS NOT NULL)
+        WHERE ct.status IN ('Success', 'Partial') AND t.section_id = %s""", (1,)),
+    ('resolve_timetable_faculty',
+     """SELECT t.entry_id FROM current_timetable ct
+        JOIN timetable t ON t.section_id = ct.section_id AND (t.log_id = ct.log_id OR t.effective_until IS NOT NULL)
+        WHERE ct.status IN ('Success', 'Partial') AND (t.faculty_id = %s OR t.entry_id IN (
+            SELECT te.entry_id FROM timetable_exception te WHERE te.faculty_id = %s AND te.exception_date >= %s))""",
+     (1, 1, '2025-01-01')),
+    ('resolve_timetable_exceptions',
+     """SELECT te.entry_id FROM timetable_exception te
+        WHERE te.entry_id IN (%s, %s) AND te.exception_date >= %s AND te.exception_date <= %s""",
+     (1, 2, '2025-01-01', '2025-01-07')),
+    ('repair_colliding_placements',
+     """SELECT t.entry_id FROM current_timetable ct
+        JOIN timetable t ON t.section_id = ct.section_id AND t.log_id = ct.log_id
+        WHERE ct.status IN ('Success', 'Partial') AND ct.section_id NOT IN (%s)
+          AND (t.faculty_id IN (%s, %s) OR t.room_id IN (%s, %s))""", (1, 1, 2, 1, 2)),
+    ('faculty_dashboard_completions',
+     """SELECT te.entry_id FROM timetable_exception te JOIN timetable t ON te.entry_id = t.entry_id
+        WHERE te.is_completed = 1 AND (te.faculty_id = %s OR te.faculty_id IS NULL AND t.faculty_id = %s)
+        ORDER BY te.exception_date DESC LIMIT 5""", (1, 1)),
+    ('reschedule_options_busy_faculty',
+     "SELECT faculty_id FROM timetable WHERE faculty_id = %s AND day_of_week = %s AND timeslot_id = %s", (1, 'Monday', 1)),
+    ('swap_options',
+     "SELECT t.entry_id FROM timetable t WHERE t.section_id = %s AND t.batch_subject_id = %s AND t.faculty_id != %s", (1, 1, 1)),
+    ('cancellation_reason',
+     "SELECT reason FROM cancellations WHERE timetable_id = %s", (1,)),
+    ('hod_progress_filtered',
+     """SELECT pr.progress_id FROM subject_progress_rollup pr
+        WHERE pr.department_id = %s AND pr.year = %s AND pr.semester = %s GROUP BY pr.batch_subject_id""", (1, 1, 1)),
+    ('hod_lagging_subjects',
+     """SELECT pr.progress_id FROM subject_progress_rollup pr
+        WHERE pr.department_id = %s AND pr.completion_ratio < 0.5 ORDER BY pr.completion_ratio""", (1,)),
+]
+CHECKED_TABLES = {
+    't', 'tt', 'timetable', 'timetable_generation_log', 'cancellations', 'pr', 'subject_progress_rollup',
+    'te', 'timetable_exception'
+}
+
+def load_migrations():
+    """Returns [(version, name, path, checksum)] for every file in migrations/, in version order."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if not match:
+            continue
+        path = os.path.join(MIGRATIONS_DIR, filename)
+        with open(path, 'rb') as f:
+            checksum = hashlib.sha256(f.read()).hexdigest()
+        migrations.append((int(match.group(1)), match.group(2), path, checksum))
+    migrations.sort()
+    versions = [migration[0] for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration version in {MIGRATIONS_DIR}")
+    return migrations
+
+def split_statements(sql):
+    """Splits a migration file into statements on ';' at end of line, dropping '--' comments."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    statements = re.split(r';\s*$', '\n'.join(lines), flags=re.MULTILINE)
+    return [statement.strip() for statement in statements if statement.strip()]
+
+def applied_migrations(cursor):
+    cursor.execute(SCHEMA_MIGRATIONS_DDL)
+    cursor.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    return {row['version']: row for row in cursor.fetchall()}
+
+def apply_pending(conn):
+    """Applies every migration not yet recorded in schema_migrations. Returns the versions applied."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        applied = applied_migrations(cursor)
+        newly_applied = []
+        for version, name, path, checksum in load_migrations():
+            if version in applied:
+                if applied[version]['checksum'] != checksum:
+                    logger.warning(f"Migration {version:03d}_{name} changed after it was applied")
+                continue
+            with open(path, encoding='utf-8') as f:
+                statements = split_statements(f.read())
+            logger.info(f"Applying migration {version:03d}_{name} ({len(statements)} statements)")
+            # DDL commits implicitly in MySQL/MariaDB, so a failed migration is not
+            # rolled back; its statements are idempotent and it is simply retried
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (version, name, checksum)
+            )
+            conn.commit()
+            newly_applied.append(version)
+        return newly_applied
+    finally:
+        cursor.close()
+
+def print_status(conn):
+    cursor = conn.cursor(dictionary=True)
+    try:
+        applied = applied_migrations(cursor)
+    finally:
+        cursor.close()
+    for version, name, path, checksum in load_migrations():
+        row = applied.get(version)
+        if row is None:
+            state = 'pending'
+        elif row['checksum'] != checksum:
+            state = f"applied {row['applied_at']} (file changed since)"
+        else:
+            state = f"applied {row['applied_at']}"
+        print(f"{version:03d}_{name}: {state}")
+
+def check_hot_queries(conn):
+    """
+    EXPLAINs each hot query and returns [(query_name, table, plan_row)] for reads of
+    the timetable tables that use no index. Run it against a populated database: on
+    a near-empty one the optimizer may legitimately prefer a full scan.
+    """
+    problems = []
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for name, query, params in HOT_QUERIES:
+            cursor.execute("EXPLAIN " + query, params)
+            for plan_row in cursor.fetchall():
+                if plan_row.get('table') in CHECKED_TABLES and plan_row.get('type') == 'ALL':
+                    problems.append((name, plan_row['table'], plan_row))
+    finally:
+        cursor.close()
+    return problems
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply database migrations from migrations/.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--status', action='store_true', help="list applied and pending migrations")
+    mode.add_argument('--check', action='store_true', help="EXPLAIN hot queries and fail on full table scans")
+    args = parser.parse_args(argv)
+
+    try:
+        conn = mysql.connector.connect(**db_config)
+    except Error as e:
+        logger.error(f"Could not connect to the database: {e}")
+        return 1
+
+    try:
+        if args.status:
+            print_status(conn)
+            return 0
+        if args.check:
+            problems = check_hot_queries(conn)
+            for name, table, plan_row in problems:
+                print(f"FULL SCAN in {name} on {table}: possible_keys={plan_row.get('possible_keys')} rows={plan_row.get('rows')}")
+            if not problems:
+                print(f"All {len(HOT_QUERIES)} hot queries use an index.")
+            return 1 if problems else 0
+        newly_applied = apply_pending(conn)
+        print(f"Applied {len(newly_applied)} migration(s)." if newly_applied else "Database is up to date.")
+        return 0
+    except Error as e:
+        logger.error(f"Migration failed: {e}", exc_info=True)
+        return 1
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+--
+-- Background queue for bulk timetable generation (generation_jobs.py).
+--
+CREATE TABLE IF NOT EXISTS `generation_jobs` (
+  `job_id` int(11) NOT NULL AUTO_INCREMENT,
+  `status` enum('Queued','Running','Completed','Failed') NOT NULL DEFAULT 'Queued',
+  `section_ids` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL CHECK (json_valid(`section_ids`)),
+  `start_date` date DEFAULT NULL,
+  `total_sections` int(11) NOT NULL DEFAULT 0,
+  `sections_done` int(11) NOT NULL DEFAULT 0,
+  `slots_assigned` int(11) NOT NULL DEFAULT 0,
+  `slots_required` int(11) NOT NULL DEFAULT 0,
+  `results` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL,
+  `error` text DEFAULT NULL,
+  `created_by` int(11) DEFAULT NULL,
+  `worker_id` varchar(100) DEFAULT NULL,
+  `created_at` datetime DEFAULT current_timestamp(),
+  `started_at` datetime DEFAULT NULL,
+  `heartbeat_at` datetime DEFAULT NULL,
+  `finished_at` datetime DEFAULT NULL,
+  PRIMARY KEY (`job_id`),
+  KEY `status_heartbeat` (`status`,`heartbeat_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
@@ -0,0 +1,5 @@
+--
+-- Search/optimisation statistics recorded for each generation run.
+--
+ALTER TABLE `timetable_generation_log`
+  ADD COLUMN IF NOT EXISTS `solver_stats` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL;
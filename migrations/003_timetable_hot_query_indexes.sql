@@ -0,0 +1,33 @@
+--
+-- Composite indexes for the timetable reads that run on every dashboard load
+-- and export. Each key lists the queries it serves.
+--
+
+-- load_specific_timetable_raw, view/export routes: WHERE t.log_id = ? ORDER BY t.date
+ALTER TABLE `timetable`
+  ADD KEY IF NOT EXISTS `log_date` (`log_id`,`date`);
+
+-- CR dashboard and faculty dashboard: WHERE t.section_id = ? AND t.log_id = ? [AND subsection]
+ALTER TABLE `timetable`
+  ADD KEY IF NOT EXISTS `section_log_subsection` (`section_id`,`log_id`,`subsection_id`);
+
+-- get_reschedule_options: faculty busy at (day_of_week, timeslot_id)
+ALTER TABLE `timetable`
+  ADD KEY IF NOT EXISTS `faculty_day_timeslot` (`faculty_id`,`day_of_week`,`timeslot_id`);
+
+-- faculty_dashboard recent completions: WHERE t.faculty_id = ? AND t.is_completed = 1 ORDER BY t.date DESC
+ALTER TABLE `timetable`
+  ADD KEY IF NOT EXISTS `faculty_completed_date` (`faculty_id`,`is_completed`,`date`);
+
+-- fetch_room_timetable_data: WHERE t.is_cancelled = 0 AND t.is_completed = 0
+-- (pays off once most past sessions are marked completed or cancelled)
+ALTER TABLE `timetable`
+  ADD KEY IF NOT EXISTS `cancelled_completed` (`is_cancelled`,`is_completed`);
+
+-- Department progress and swap options: section + subject, optionally in a date range
+ALTER TABLE `timetable`
+  ADD KEY IF NOT EXISTS `section_subject_date` (`section_id`,`batch_subject_id`,`date`);
+
+-- Latest Success/Partial log per section (view_timetable, exports, dashboards)
+ALTER TABLE `timetable_generation_log`
+  ADD KEY IF NOT EXISTS `section_status_date` (`section_id`,`status`,`generation_date`);
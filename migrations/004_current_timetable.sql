@@ -0,0 +1,27 @@
+--
+-- Pointer from each section to the generation log whose rows are in `timetable`.
+-- Maintained by TimetableGenerator.save_batch_results in the same transaction
+-- that replaces the section's timetable.
+--
+CREATE TABLE IF NOT EXISTS `current_timetable` (
+  `section_id` int(11) NOT NULL,
+  `log_id` int(11) NOT NULL,
+  `status` enum('Success','Failed','Partial') NOT NULL,
+  `updated_at` datetime DEFAULT current_timestamp(),
+  PRIMARY KEY (`section_id`),
+  UNIQUE KEY `log_id` (`log_id`),
+  CONSTRAINT `current_timetable_ibfk_1` FOREIGN KEY (`section_id`) REFERENCES `sections` (`section_id`) ON DELETE CASCADE,
+  CONSTRAINT `current_timetable_ibfk_2` FOREIGN KEY (`log_id`) REFERENCES `timetable_generation_log` (`log_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- Backfill from the newest log per section, which is what the old
+-- MAX(log_id) / ORDER BY generation_date DESC lookups resolved to
+INSERT INTO `current_timetable` (`section_id`, `log_id`, `status`)
+SELECT tgl.section_id, tgl.log_id, tgl.status
+FROM timetable_generation_log tgl
+JOIN (
+    SELECT section_id, MAX(log_id) AS log_id
+    FROM timetable_generation_log
+    GROUP BY section_id
+) latest ON latest.log_id = tgl.log_id
+ON DUPLICATE KEY UPDATE log_id = VALUES(log_id), status = VALUES(status);
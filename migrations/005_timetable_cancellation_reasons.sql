@@ -0,0 +1,12 @@
+--
+-- Latest cancellation per timetable entry, so timetable reads can LEFT JOIN the
+-- reason instead of querying cancellations once per cancelled row. MERGE keeps
+-- it a rewrite of the caller's query that uses the `timetable_id` index.
+--
+CREATE OR REPLACE ALGORITHM=MERGE SQL SECURITY INVOKER VIEW `timetable_cancellation_reasons` AS
+SELECT c.timetable_id, c.cancellation_id, c.reason, c.canceled_by, c.timestamp
+FROM cancellations c
+WHERE NOT EXISTS (
+    SELECT 1 FROM cancellations newer
+    WHERE newer.timetable_id = c.timetable_id AND newer.cancellation_id > c.cancellation_id
+);
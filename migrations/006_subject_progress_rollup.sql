@@ -0,0 +1,42 @@
+--
+-- subject_progress denormalised with the department, year and semester of its
+-- section's batch, one row per (department, progress row). The HOD progress and
+-- lagging-subject dashboards read it with range scans on completion_ratio
+-- instead of joining through sections/batches/batch_departments and computing
+-- the ratio per row. Kept in step by update_lecture_status and cancel_class;
+-- /api/admin/progress_rollup/check recomputes it and reports (or repairs) drift.
+--
+CREATE TABLE IF NOT EXISTS `subject_progress_rollup` (
+  `department_id` int(11) NOT NULL,
+  `progress_id` int(11) NOT NULL,
+  `section_id` int(11) NOT NULL,
+  `batch_subject_id` int(11) NOT NULL,
+  `faculty_id` int(11) NOT NULL,
+  `year` int(11) NOT NULL,
+  `semester` int(11) DEFAULT NULL,
+  `planned_sessions` int(11) NOT NULL,
+  `completed_sessions` int(11) NOT NULL DEFAULT 0,
+  `completion_ratio` decimal(9,4) GENERATED ALWAYS AS (`completed_sessions` / nullif(`planned_sessions`,0)) STORED,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`department_id`, `progress_id`),
+  KEY `progress_id` (`progress_id`),
+  KEY `department_ratio` (`department_id`, `completion_ratio`),
+  KEY `department_semester_ratio` (`department_id`, `year`, `semester`, `completion_ratio`),
+  KEY `department_faculty_ratio` (`department_id`, `faculty_id`, `completion_ratio`),
+  KEY `department_section_ratio` (`department_id`, `section_id`, `completion_ratio`),
+  CONSTRAINT `subject_progress_rollup_ibfk_1` FOREIGN KEY (`progress_id`) REFERENCES `subject_progress` (`progress_id`) ON DELETE CASCADE,
+  CONSTRAINT `subject_progress_rollup_ibfk_2` FOREIGN KEY (`department_id`) REFERENCES `departments` (`department_id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+INSERT INTO `subject_progress_rollup`
+  (`department_id`, `progress_id`, `section_id`, `batch_subject_id`, `faculty_id`, `year`, `semester`, `planned_sessions`, `completed_sessions`)
+SELECT bd.department_id, sp.progress_id, sp.section_id, sp.batch_subject_id, sp.faculty_id,
+       b.year, b.semester, sp.planned_sessions, COALESCE(sp.completed_sessions, 0)
+FROM subject_progress sp
+JOIN sections sec ON sp.section_id = sec.section_id
+JOIN batches b ON sec.batch_id = b.batch_id
+JOIN batch_departments bd ON b.batch_id = bd.batch_id
+ON DUPLICATE KEY UPDATE
+  `section_id` = VALUES(`section_id`), `batch_subject_id` = VALUES(`batch_subject_id`), `faculty_id` = VALUES(`faculty_id`),
+  `year` = VALUES(`year`), `semester` = VALUES(`semester`),
+  `planned_sessions` = VALUES(`planned_sessions`), `completed_sessions` = VALUES(`completed_sessions`);
@@ -0,0 +1,15 @@
+--
+-- Each generation log stores one row per weekly session; calendar_start and
+-- calendar_end are the semester span those rows repeat over. Readers expand them
+-- into dated occurrences, skipping holidays that affect the timetable. Logs
+-- without a calendar keep their rows as single dated entries.
+--
+ALTER TABLE `timetable_generation_log`
+  ADD COLUMN IF NOT EXISTS `calendar_start` date DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS `calendar_end` date DEFAULT NULL;
+
+ALTER TABLE `generation_jobs`
+  ADD COLUMN IF NOT EXISTS `semester_weeks` int(11) NOT NULL DEFAULT 1 AFTER `start_date`;
+
+ALTER TABLE `holidays`
+  ADD KEY IF NOT EXISTS `date_affects_timetable` (`date`, `affects_timetable`);
@@ -0,0 +1,47 @@
+--
+-- Per-date changes to the weekly timetable. `timetable` keeps one row per weekly
+-- session (the template); a cancellation, completion or substitution of one
+-- dated occurrence is a row here, keyed by (entry_id, exception_date), and
+-- readers overlay it on the expanded template. faculty_id is the substitute
+-- teaching that occurrence, NULL when the template faculty teaches it.
+--
+CREATE TABLE IF NOT EXISTS `timetable_exception` (
+  `exception_id` int(11) NOT NULL AUTO_INCREMENT,
+  `entry_id` int(11) NOT NULL,
+  `exception_date` date NOT NULL,
+  `is_cancelled` tinyint(1) NOT NULL DEFAULT 0,
+  `is_completed` tinyint(1) NOT NULL DEFAULT 0,
+  `is_rescheduled` tinyint(1) NOT NULL DEFAULT 0,
+  `faculty_id` int(11) DEFAULT NULL,
+  `cancellation_id` int(11) DEFAULT NULL,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp(),
+  PRIMARY KEY (`exception_id`),
+  UNIQUE KEY `entry_date` (`entry_id`, `exception_date`),
+  KEY `faculty_date` (`faculty_id`, `exception_date`),
+  KEY `completed_date` (`is_completed`, `exception_date`),
+  KEY `cancellation_id` (`cancellation_id`),
+  CONSTRAINT `timetable_exception_ibfk_1` FOREIGN KEY (`entry_id`) REFERENCES `timetable` (`entry_id`) ON DELETE CASCADE,
+  CONSTRAINT `timetable_exception_ibfk_2` FOREIGN KEY (`faculty_id`) REFERENCES `users` (`user_id`) ON DELETE SET NULL,
+  CONSTRAINT `timetable_exception_ibfk_3` FOREIGN KEY (`cancellation_id`) REFERENCES `cancellations` (`cancellation_id`) ON DELETE SET NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- The occurrence a cancellation (and its substitute requests) applies to
+ALTER TABLE `cancellations`
+  ADD COLUMN IF NOT EXISTS `class_date` date DEFAULT NULL AFTER `timetable_id`;
+
+UPDATE `cancellations` c
+JOIN `timetable` t ON t.entry_id = c.timetable_id
+SET c.class_date = t.date
+WHERE c.class_date IS NULL;
+
+-- Status flags set on template rows so far belong to the row's stored date;
+-- move them to exceptions and clear them, so the template carries no per-date state
+INSERT IGNORE INTO `timetable_exception` (`entry_id`, `exception_date`, `is_cancelled`, `is_completed`, `is_rescheduled`, `cancellation_id`)
+SELECT t.entry_id, t.date, t.is_cancelled, t.is_completed, t.is_rescheduled, tcr.cancellation_id
+FROM timetable t
+LEFT JOIN timetable_cancellation_reasons tcr ON tcr.timetable_id = t.entry_id
+WHERE t.date IS NOT NULL AND (t.is_cancelled = 1 OR t.is_completed = 1 OR t.is_rescheduled = 1);
+
+UPDATE `timetable` t
+JOIN `timetable_exception` te ON te.entry_id = t.entry_id AND te.exception_date = t.date
+SET t.is_cancelled = 0, t.is_completed = 0, t.is_rescheduled = 0;
@@ -0,0 +1,9 @@
+--
+-- sha256 of the canonical problem a log was generated from: the sections, their
+-- faculty assignments, rooms, timeslots, faculty constraints and unavailability,
+-- calendar, solver limits and seed. Generation hands back the section's current
+-- log instead of solving again when the hash still matches. Logs written by an
+-- incremental repair leave it NULL, so they are never served as a seeded result.
+--
+ALTER TABLE `timetable_generation_log`
+  ADD COLUMN IF NOT EXISTS `problem_hash` char(64) DEFAULT NULL;
@@ -0,0 +1,15 @@
+--
+-- Dates a weekly timetable row is in effect, NULL for its whole semester calendar.
+-- When an incremental repair moves, reassigns or drops a session that has already
+-- been taught, it end-dates the old row, leaving it on the log it came from, and
+-- inserts the replacement from the repair date on. resolve_timetable expands a
+-- section's end-dated rows alongside its current ones, so past occurrences and
+-- their exceptions keep resolving to the session as it was held.
+--
+ALTER TABLE `timetable`
+  ADD COLUMN IF NOT EXISTS `effective_from` date DEFAULT NULL AFTER `date`,
+  ADD COLUMN IF NOT EXISTS `effective_until` date DEFAULT NULL AFTER `effective_from`;
+
+-- resolve_timetable: a section's end-dated rows
+ALTER TABLE `timetable`
+  ADD KEY IF NOT EXISTS `section_effective_until` (`section_id`,`effective_until`);
@@ -96,6 +96,7 @@ CREATE TABLE `batch_subjects` (
 CREATE TABLE `cancellations` (
   `cancellation_id` int(11) NOT NULL,
   `timetable_id` int(11) NOT NULL,
+  `class_date` date DEFAULT NULL,
   `reason` text NOT NULL,
   `canceled_by` int(11) NOT NULL,
   `suggested_faculty_id` int(11) DEFAULT NULL,
@@ -116,6 +117,19 @@ CREATE TABLE `credit_session_rules` (
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `current_timetable`
+--
+
+CREATE TABLE `current_timetable` (
+  `section_id` int(11) NOT NULL,
+  `log_id` int(11) NOT NULL,
+  `status` enum('Success','Failed','Partial') NOT NULL,
+  `updated_at` datetime DEFAULT current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `departments`
 --
@@ -190,6 +204,32 @@ CREATE TABLE `faculty_workload` (
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `generation_jobs`
+--
+
+CREATE TABLE `generation_jobs` (
+  `job_id` int(11) NOT NULL,
+  `status` enum('Queued','Running','Completed','Failed') NOT NULL DEFAULT 'Queued',
+  `section_ids` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL CHECK (json_valid(`section_ids`)),
+  `start_date` date DEFAULT NULL,
+  `semester_weeks` int(11) NOT NULL DEFAULT 1,
+  `total_sections` int(11) NOT NULL DEFAULT 0,
+  `sections_done` int(11) NOT NULL DEFAULT 0,
+  `slots_assigned` int(11) NOT NULL DEFAULT 0,
+  `slots_required` int(11) NOT NULL DEFAULT 0,
+  `results` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL,
+  `error` text DEFAULT NULL,
+  `created_by` int(11) DEFAULT NULL,
+  `worker_id` varchar(100) DEFAULT NULL,
+  `created_at` datetime DEFAULT current_timestamp(),
+  `started_at` datetime DEFAULT NULL,
+  `heartbeat_at` datetime DEFAULT NULL,
+  `finished_at` datetime DEFAULT NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `holidays`
 --
@@ -389,6 +429,26 @@ CREATE TABLE `subject_progress` (
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `subject_progress_rollup`
+--
+
+CREATE TABLE `subject_progress_rollup` (
+  `department_id` int(11) NOT NULL,
+  `progress_id` int(11) NOT NULL,
+  `section_id` int(11) NOT NULL,
+  `batch_subject_id` int(11) NOT NULL,
+  `faculty_id` int(11) NOT NULL,
+  `year` int(11) NOT NULL,
+  `semester` int(11) DEFAULT NULL,
+  `planned_sessions` int(11) NOT NULL,
+  `completed_sessions` int(11) NOT NULL DEFAULT 0,
+  `completion_ratio` decimal(9,4) GENERATED ALWAYS AS (`completed_sessions` / nullif(`planned_sessions`,0)) STORED,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `subsections`
 --
@@ -444,6 +504,8 @@ CREATE TABLE `timetable` (
   `subsection_id` int(11) DEFAULT NULL,
   `week_number` int(11) DEFAULT 1,
   `date` date DEFAULT NULL,
+  `effective_from` date DEFAULT NULL,
+  `effective_until` date DEFAULT NULL,
   `is_rescheduled` tinyint(1) DEFAULT 0,
   `created_at` datetime DEFAULT current_timestamp(),
   `modified_at` datetime DEFAULT NULL,
@@ -455,6 +517,24 @@ CREATE TABLE `timetable` (
 
 -- --------------------------------------------------------
 
+--
+-- Table structure for table `timetable_exception`
+--
+
+CREATE TABLE `timetable_exception` (
+  `exception_id` int(11) NOT NULL,
+  `entry_id` int(11) NOT NULL,
+  `exception_date` date NOT NULL,
+  `is_cancelled` tinyint(1) NOT NULL DEFAULT 0,
+  `is_completed` tinyint(1) NOT NULL DEFAULT 0,
+  `is_rescheduled` tinyint(1) NOT NULL DEFAULT 0,
+  `faculty_id` int(11) DEFAULT NULL,
+  `cancellation_id` int(11) DEFAULT NULL,
+  `updated_at` datetime DEFAULT current_timestamp() ON UPDATE current_timestamp()
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+-- --------------------------------------------------------
+
 --
 -- Table structure for table `timetable_generation_log`
 --
@@ -467,7 +547,11 @@ CREATE TABLE `timetable_generation_log` (
   `constraints_violated` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL,
   `total_slots_assigned` int(11) DEFAULT 0,
   `total_slots_required` int(11) DEFAULT 0,
-  `generation_time_seconds` decimal(10,3) DEFAULT NULL
+  `generation_time_seconds` decimal(10,3) DEFAULT NULL,
+  `solver_stats` longtext CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL,
+  `calendar_start` date DEFAULT NULL,
+  `calendar_end` date DEFAULT NULL,
+  `problem_hash` char(64) DEFAULT NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 
 -- --------------------------------------------------------
@@ -514,6 +598,14 @@ CREATE TABLE `user_sessions` (
   `is_active` tinyint(1) DEFAULT 1
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 
+-- --------------------------------------------------------
+
+--
+-- Structure for view `timetable_cancellation_reasons`
+--
+
+CREATE ALGORITHM=MERGE SQL SECURITY INVOKER VIEW `timetable_cancellation_reasons` AS select `c`.`timetable_id` AS `timetable_id`,`c`.`cancellation_id` AS `cancellation_id`,`c`.`reason` AS `reason`,`c`.`canceled_by` AS `canceled_by`,`c`.`timestamp` AS `timestamp` from `cancellations` `c` where !exists(select 1 from `cancellations` `newer` where `newer`.`timetable_id` = `c`.`timetable_id` and `newer`.`cancellation_id` > `c`.`cancellation_id` limit 1) ;
+
 --
 -- Indexes for dumped tables
 --
@@ -570,6 +662,13 @@ ALTER TABLE `cancellations`
 ALTER TABLE `credit_session_rules`
   ADD PRIMARY KEY (`credits`);
 
+--
+-- Indexes for table `current_timetable`
+--
+ALTER TABLE `current_timetable`
+  ADD PRIMARY KEY (`section_id`),
+  ADD UNIQUE KEY `log_id` (`log_id`);
+
 --
 -- Indexes for table `departments`
 --
@@ -609,11 +708,19 @@ ALTER TABLE `faculty_workload`
   ADD PRIMARY KEY (`workload_id`),
   ADD KEY `faculty_id` (`faculty_id`);
 
+--
+-- Indexes for table `generation_jobs`
+--
+ALTER TABLE `generation_jobs`
+  ADD PRIMARY KEY (`job_id`),
+  ADD KEY `status_heartbeat` (`status`,`heartbeat_at`);
+
 --
 -- Indexes for table `holidays`
 --
 ALTER TABLE `holidays`
-  ADD PRIMARY KEY (`holiday_id`);
+  ADD PRIMARY KEY (`holiday_id`),
+  ADD KEY `date_affects_timetable` (`date`,`affects_timetable`);
 
 --
 -- Indexes for table `lecture_trackers`
@@ -704,6 +811,17 @@ ALTER TABLE `subject_progress`
   ADD KEY `batch_subject_id` (`batch_subject_id`),
   ADD KEY `faculty_id` (`faculty_id`);
 
+--
+-- Indexes for table `subject_progress_rollup`
+--
+ALTER TABLE `subject_progress_rollup`
+  ADD PRIMARY KEY (`department_id`,`progress_id`),
+  ADD KEY `progress_id` (`progress_id`),
+  ADD KEY `department_ratio` (`department_id`,`completion_ratio`),
+  ADD KEY `department_semester_ratio` (`department_id`,`year`,`semester`,`completion_ratio`),
+  ADD KEY `department_faculty_ratio` (`department_id`,`faculty_id`,`completion_ratio`),
+  ADD KEY `department_section_ratio` (`department_id`,`section_id`,`completion_ratio`);
+
 --
 -- Indexes for table `subsections`
 --
@@ -735,14 +853,32 @@ ALTER TABLE `timetable`
   ADD KEY `batch_subject_id` (`batch_subject_id`),
   ADD KEY `timeslot_id` (`timeslot_id`),
   ADD KEY `room_id` (`room_id`),
-  ADD KEY `subsection_id` (`subsection_id`);
+  ADD KEY `subsection_id` (`subsection_id`),
+  ADD KEY `log_date` (`log_id`,`date`),
+  ADD KEY `section_log_subsection` (`section_id`,`log_id`,`subsection_id`),
+  ADD KEY `section_effective_until` (`section_id`,`effective_until`),
+  ADD KEY `faculty_day_timeslot` (`faculty_id`,`day_of_week`,`timeslot_id`),
+  ADD KEY `faculty_completed_date` (`faculty_id`,`is_completed`,`date`),
+  ADD KEY `cancelled_completed` (`is_cancelled`,`is_completed`),
+  ADD KEY `section_subject_date` (`section_id`,`batch_subject_id`,`date`);
+
+--
+-- Indexes for table `timetable_exception`
+--
+ALTER TABLE `timetable_exception`
+  ADD PRIMARY KEY (`exception_id`),
+  ADD UNIQUE KEY `entry_date` (`entry_id`,`exception_date`),
+  ADD KEY `faculty_date` (`faculty_id`,`exception_date`),
+  ADD KEY `completed_date` (`is_completed`,`exception_date`),
+  ADD KEY `cancellation_id` (`cancellation_id`);
 
 --
 -- Indexes for table `timetable_generation_log`
 --
 ALTER TABLE `timetable_generation_log`
   ADD PRIMARY KEY (`log_id`),
-  ADD KEY `section_id` (`section_id`);
+  ADD KEY `section_id` (`section_id`),
+  ADD KEY `section_status_date` (`section_id`,`status`,`generation_date`);
 
 --
 -- Indexes for table `users`
@@ -831,6 +967,12 @@ ALTER TABLE `faculty_unavailability`
 ALTER TABLE `faculty_workload`
   MODIFY `workload_id` int(11) NOT NULL AUTO_INCREMENT;
 
+--
+-- AUTO_INCREMENT for table `generation_jobs`
+--
+ALTER TABLE `generation_jobs`
+  MODIFY `job_id` int(11) NOT NULL AUTO_INCREMENT;
+
 --
 -- AUTO_INCREMENT for table `holidays`
 --
@@ -921,6 +1063,12 @@ ALTER TABLE `timeslots`
 ALTER TABLE `timetable`
   MODIFY `entry_id` int(11) NOT NULL AUTO_INCREMENT;
 
+--
+-- AUTO_INCREMENT for table `timetable_exception`
+--
+ALTER TABLE `timetable_exception`
+  MODIFY `exception_id` int(11) NOT NULL AUTO_INCREMENT;
+
 --
 -- AUTO_INCREMENT for table `timetable_generation_log`
 --
@@ -973,6 +1121,13 @@ ALTER TABLE `cancellations`
   ADD CONSTRAINT `cancellations_ibfk_2` FOREIGN KEY (`canceled_by`) REFERENCES `users` (`user_id`) ON DELETE CASCADE,
   ADD CONSTRAINT `cancellations_ibfk_3` FOREIGN KEY (`suggested_faculty_id`) REFERENCES `users` (`user_id`) ON DELETE SET NULL;
 
+--
+-- Constraints for table `current_timetable`
+--
+ALTER TABLE `current_timetable`
+  ADD CONSTRAINT `current_timetable_ibfk_1` FOREIGN KEY (`section_id`) REFERENCES `sections` (`section_id`) ON DELETE CASCADE,
+  ADD CONSTRAINT `current_timetable_ibfk_2` FOREIGN KEY (`log_id`) REFERENCES `timetable_generation_log` (`log_id`) ON DELETE CASCADE;
+
 --
 -- Constraints for table `departments`
 --
@@ -1058,6 +1213,13 @@ ALTER TABLE `subject_progress`
   ADD CONSTRAINT `subject_progress_ibfk_2` FOREIGN KEY (`batch_subject_id`) REFERENCES `batch_subjects` (`batch_subject_id`) ON DELETE CASCADE,
   ADD CONSTRAINT `subject_progress_ibfk_3` FOREIGN KEY (`faculty_id`) REFERENCES `users` (`user_id`) ON DELETE CASCADE;
 
+--
+-- Constraints for table `subject_progress_rollup`
+--
+ALTER TABLE `subject_progress_rollup`
+  ADD CONSTRAINT `subject_progress_rollup_ibfk_1` FOREIGN KEY (`progress_id`) REFERENCES `subject_progress` (`progress_id`) ON DELETE CASCADE,
+  ADD CONSTRAINT `subject_progress_rollup_ibfk_2` FOREIGN KEY (`department_id`) REFERENCES `departments` (`department_id`) ON DELETE CASCADE;
+
 --
 -- Constraints for table `subsections`
 --
@@ -1082,6 +1244,14 @@ ALTER TABLE `timetable`
   ADD CONSTRAINT `timetable_ibfk_5` FOREIGN KEY (`room_id`) REFERENCES `rooms` (`room_id`) ON DELETE SET NULL,
   ADD CONSTRAINT `timetable_ibfk_6` FOREIGN KEY (`subsection_id`) REFERENCES `subsections` (`subsection_id`) ON DELETE CASCADE;
 
+--
+-- Constraints for table `timetable_exception`
+--
+ALTER TABLE `timetable_exception`
+  ADD CONSTRAINT `timetable_exception_ibfk_1` FOREIGN KEY (`entry_id`) REFERENCES `timetable` (`entry_id`) ON DELETE CASCADE,
+  ADD CONSTRAINT `timetable_exception_ibfk_2` FOREIGN KEY (`faculty_id`) REFERENCES `users` (`user_id`) ON DELETE SET NULL,
+  ADD CONSTRAINT `timetable_exception_ibfk_3` FOREIGN KEY (`cancellation_id`) REFERENCES `cancellations` (`cancellation_id`) ON DELETE SET NULL;
+
 --
 -- Constraints for table `timetable_generation_log`
 --
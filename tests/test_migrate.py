@@ -0,0 +1,28 @@
+"""
+migrate.py --check as a test: the hot queries must not full-scan the timetable
+tables. Needs the configured MySQL database with the migrations applied, and is
+skipped when it cannot be reached.
+"""
+import pytest
+
+mysql_connector = pytest.importorskip('mysql.connector')
+
+import migrate
+from advanced_timetable_logic import db_config
+
+
+@pytest.fixture(scope='module')
+def conn():
+    try:
+        conn = mysql_connector.connect(**db_config, connection_timeout=2)
+    except mysql_connector.Error as e:
+        pytest.skip(f"No database configured: {e}")
+    yield conn
+    conn.close()
+
+
+def test_hot_queries_use_an_index(conn):
+    problems = migrate.check_hot_queries(conn)
+    assert problems == [], [
+        f"{name} on {table}: possible_keys={plan_row.get('possible_keys')}" for name, table, plan_row in problems
+    ]
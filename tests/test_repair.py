@@ -0,0 +1,43 @@
+"""
+Incremental repair on an in-memory synthetic institution: what the saved rows
+resolve to once the semester is under way.
+"""
+from datetime import date, timedelta
+
+import pytest
+
+import advanced_timetable_logic as atl
+from benchmarks.synthetic import InMemoryTimetableGenerator, hard_conflicts, synthetic_institution
+
+
+@pytest.fixture(autouse=True)
+def no_holidays(monkeypatch):
+    monkeypatch.setattr(atl, 'load_holidays', lambda start_date, end_date: frozenset())
+
+
+def resolved(generator, institution):
+    """Dated occurrences of the current rows, as resolve_timetable expands them."""
+    start_times = {ts['timeslot_id']: ts['start_time'] for ts in institution['timeslots']}
+    rows = [dict(row, entry_date=None, start_time=start_times[row['timeslot_id']]) for row in generator.current_entries()]
+    return atl.expand_weekly_entries(rows)
+
+
+def test_session_added_mid_semester_starts_on_the_repair_date():
+    institution = synthetic_institution(sections_per_department=1, subjects_per_section=3, lab_every=0)
+    section_id = institution['sections'][0]['section_id']
+    generator = InMemoryTimetableGenerator(institution)
+    semester_start = date.today() - timedelta(weeks=3)
+    generator.generate_timetables_for_sections([section_id], start_date=semester_start, semester_weeks=8, max_workers=1)
+
+    added = dict(institution['faculty_subjects'][0], faculty_subject_id=99, batch_subject_id=section_id * 100 + 99,
+                 subject_id=99, subject_name="Subject 99", subject_code="SUB099")
+    institution['faculty_subjects'].append(added)
+    result = generator.repair_timetables([section_id])
+
+    assert result['results'][0]['repair']['added'] == added['theory_sessions_per_week']
+    occurrences = resolved(generator, institution)
+    added_dates = [o['entry_date'] for o in occurrences if o['batch_subject_id'] == added['batch_subject_id']]
+    assert added_dates and min(added_dates) >= date.today()
+    # The sessions that were already there still resolve from the start of the semester
+    assert min(o['entry_date'] for o in occurrences) < semester_start + timedelta(days=7)
+    assert hard_conflicts(generator.current_entries()) == []
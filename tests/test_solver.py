@@ -0,0 +1,221 @@
+"""
+Regression tests for the solver on synthetic in-memory problems: SlotOccupancy
+masks, the bounded backtracking search, the soft-constraint annealing and the
+portfolio of seeded attempts.
+"""
+import time as time_module
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import time, timedelta
+
+import pytest
+
+import advanced_timetable_logic as atl
+from advanced_timetable_logic import SlotOccupancy, TimetableGenerator
+from benchmarks.synthetic import InMemoryTimetableGenerator, hard_conflicts, problem_batch, synthetic_institution
+
+
+def make_occupancy():
+    # Monday-Friday, 9-13 and 14-17, as in every synthetic institution
+    return SlotOccupancy(synthetic_institution()['timeslots'])
+
+
+def ordinal(occupancy, day_index, hour):
+    return next(i for i, (start, _) in enumerate(occupancy.slot_times)
+                if occupancy.slot_keys[i][0] == day_index and start == time(hour))
+
+
+def prepared_generator(institution, section_id, **kwargs):
+    generator = TimetableGenerator(**kwargs)
+    batch = problem_batch(institution)
+    generator.faculty_constraints = batch['faculty_constraints']
+    generator.problem_data = generator._prepare_problem_data(batch['sections'][section_id])
+    occupancy = SlotOccupancy(batch['all_timeslots'])
+    for assignment in generator.problem_data['assignments']:
+        generator._register_faculty(occupancy, assignment['faculty_id'])
+    return generator, occupancy
+
+
+class TestSlotOccupancy:
+    def test_ordinals_run_day_by_day_in_period_order(self):
+        occupancy = make_occupancy()
+        assert len(occupancy.slot_keys) == 35
+        assert [occupancy.popcount(mask) for mask in occupancy.day_masks] == [7, 7, 7, 7, 7, 0]
+        assert occupancy.day_masks[1] == ((1 << 7) - 1) << 7
+        assert [start for start, _ in occupancy.slot_times[:7]] == [time(h) for h in (9, 10, 11, 12, 14, 15, 16)]
+
+    def test_blocks_never_cross_a_day_or_a_gap_when_continuous(self):
+        occupancy = make_occupancy()
+        starts = set(occupancy.iter_bits(occupancy.free_starts('s', 'f', 'r', 2, continuous=False)))
+        continuous = set(occupancy.iter_bits(occupancy.free_starts('s', 'f', 'r', 2, continuous=True)))
+        last_period = ordinal(occupancy, 0, 16)
+        before_lunch = ordinal(occupancy, 0, 12)
+        assert last_period not in starts
+        assert before_lunch in starts and before_lunch not in continuous
+        assert continuous == starts - {ordinal(occupancy, day, 12) for day in range(5)}
+
+    def test_occupy_blocks_every_resource_and_release_restores(self):
+        occupancy = make_occupancy()
+        empty = occupancy.free_starts('s1', 'f1', 'r1', 1)
+        start = ordinal(occupancy, 2, 10)
+        occupancy.occupy('s1', 'f1', 'r1', start, 2)
+        for section_id, faculty_id, room_id in (('s1', 'f2', 'r2'), ('s2', 'f1', 'r2'), ('s2', 'f2', 'r1')):
+            free = occupancy.free_starts(section_id, faculty_id, room_id, 1)
+            assert not free >> start & 1 and not free >> (start + 1) & 1
+            assert free >> (start + 2) & 1
+        assert occupancy.free_starts('s2', 'f2', 'r2', 1) == empty
+        occupancy.release('s1', 'f1', 'r1', start, 2)
+        assert occupancy.free_starts('s1', 'f1', 'r1', 1) == empty
+
+    def test_faculty_unavailability_days_and_hour_limits(self):
+        occupancy = make_occupancy()
+        constraints = {'available_days': ['Monday', 'Tuesday'], 'max_hours_per_day': 2, 'max_hours_per_week': 3}
+        occupancy.register_faculty('f1', constraints, [('Monday', time(10, 30), time(11, 30))])
+        blocked = occupancy.faculty_blocked('f1', 1)
+        assert blocked & occupancy.day_masks[2] == occupancy.day_masks[2]
+        assert blocked >> ordinal(occupancy, 0, 10) & 1 and blocked >> ordinal(occupancy, 0, 11) & 1
+        assert not blocked >> ordinal(occupancy, 0, 9) & 1
+
+        occupancy.occupy('s1', 'f1', 'r1', ordinal(occupancy, 1, 9), 2)
+        assert occupancy.faculty_blocked('f1', 1) & occupancy.day_masks[1] == occupancy.day_masks[1]
+        assert occupancy.free_starts('s1', 'f1', 'r2', 2) == 0
+        assert occupancy.free_starts('s1', 'f1', 'r2', 2, enforce_constraints=False) != 0
+
+
+class TestBacktrackingSearch:
+    def tight_section(self):
+        """
+        One Monday morning of four periods: a two-hour lab, and two lectures, one of them
+        by a faculty member who is only free for the first two periods.
+        """
+        institution = synthetic_institution(subjects_per_section=3, theory_sessions_per_week=1, lab_every=3)
+        institution['sections'] = institution['sections'][:1]
+        section_id = institution['sections'][0]['section_id']
+        institution['timeslots'] = [ts for ts in institution['timeslots']
+                                    if ts['day_of_week'] == 'Monday' and ts['start_time'] < timedelta(hours=13)]
+        subjects = [fa for fa in institution['faculty_subjects'] if fa['section_id'] == section_id]
+        institution['faculty_subjects'] = subjects
+        subjects[0]['theory_sessions_per_week'] = 0
+        for faculty_id, fa in enumerate(subjects, start=1):
+            fa['faculty_id'] = faculty_id
+        institution['unavailability'] = [{'faculty_id': 2, 'day_of_week': 'Monday',
+                                          'start_time': timedelta(hours=11), 'end_time': timedelta(hours=13)}]
+        return institution, section_id
+
+    def test_search_repairs_a_greedy_dead_end(self):
+        institution, section_id = self.tight_section()
+        generator, occupancy = prepared_generator(institution, section_id)
+        by_faculty = {assignment['faculty_id']: assignment for assignment in generator.problem_data['assignments']}
+        lab, restricted, free = by_faculty[1], by_faculty[2], by_faculty[3]
+        lab_room = lab['preferred_room_id']
+        theory_room = generator.problem_data['section_info']['theory_room_id']
+
+        # What greedy does: the lab takes the first two periods, the free lecture the third
+        occupancy.occupy(section_id, 1, lab_room, 0, 2)
+        occupancy.occupy(section_id, 3, theory_room, 2, 1)
+        assert not generator._find_available_slot(restricted, theory_room, occupancy)
+
+        placements, unplaced = generator._search_placements(
+            occupancy, [(lab, lab_room, 0), (free, theory_room, 2)], [(restricted, theory_room)])
+
+        assert unplaced == []
+        starts = {assignment['faculty_id']: start for assignment, _, start in placements}
+        assert starts[1] == 2
+        assert starts[2] in (0, 1)
+        entries = [entry for assignment, room_id, start in placements
+                   for entry in generator._placement_entries(occupancy, assignment, room_id, start)]
+        assert len(entries) == 4
+        assert hard_conflicts(entries) == []
+
+    def test_generation_places_every_session_of_the_tight_section(self):
+        institution, section_id = self.tight_section()
+        generator = TimetableGenerator()
+        batch = problem_batch(institution)
+        generator.faculty_constraints = batch['faculty_constraints']
+        results, _ = generator._solve_section_group([section_id], batch['sections'], batch['all_timeslots'],
+                                                    generator._semester_calendar(None, 1))
+        assert results[0]['status'] == 'Success'
+        assert hard_conflicts(results[0]['raw_timetable']) == []
+
+
+class TestAnnealing:
+    @staticmethod
+    def solve(institution, seed, optimize_iterations):
+        generator = TimetableGenerator(optimize_iterations=optimize_iterations, optimize_time_budget=5.0, seed=seed)
+        batch = problem_batch(institution)
+        generator.faculty_constraints = batch['faculty_constraints']
+        group = sorted(batch['sections'])
+        results, _ = generator._solve_section_group(group, batch['sections'], batch['all_timeslots'],
+                                                    generator._semester_calendar(None, 1))
+        return results
+
+    @pytest.mark.parametrize('seed', [0, 1, 2])
+    def test_annealing_never_worsens_hard_constraints(self, seed):
+        institution = synthetic_institution(sections_per_department=4)
+        faculty_id = institution['faculty_subjects'][0]['faculty_id']
+        institution['unavailability'] = [{'faculty_id': faculty_id, 'day_of_week': 'Wednesday',
+                                          'start_time': timedelta(hours=9), 'end_time': timedelta(hours=17)}]
+        greedy = self.solve(institution, seed, optimize_iterations=0)
+        annealed = self.solve(institution, seed, optimize_iterations=3000)
+
+        for before, after in zip(greedy, annealed):
+            before_stats = before['generation_log']['solver_stats']
+            after_stats = after['generation_log']['solver_stats']
+            assert after_stats['hard_penalty'] == before_stats['hard_penalty']
+            assert len(after['raw_timetable']) == len(before['raw_timetable'])
+            assert after_stats['optimizer']['final_score'] <= after_stats['optimizer']['initial_score']
+        # Same seed, so the first section anneals exactly the greedy result
+        assert (annealed[0]['generation_log']['solver_stats']['optimizer']['initial_score']
+                == greedy[0]['generation_log']['solver_stats']['optimizer']['final_score'])
+
+        entries = [entry for result in annealed for entry in result['raw_timetable']]
+        assert hard_conflicts(entries) == []
+        assert not any(entry['faculty_id'] == faculty_id and entry['day_of_week'] == 'Wednesday' for entry in entries)
+        daily_hours = Counter((entry['faculty_id'], entry['day_of_week']) for entry in entries)
+        assert max(daily_hours.values()) <= 4
+
+
+class TestProblemHash:
+    @staticmethod
+    def generate(**kwargs):
+        institution = synthetic_institution(sections_per_department=2)
+        generator = InMemoryTimetableGenerator(institution, **kwargs)
+        return generator.generate_timetables_for_sections([s['section_id'] for s in institution['sections']], max_workers=1)
+
+    def test_runs_within_their_limits_are_hashed_for_reuse(self):
+        result = self.generate(optimize_iterations=200, optimize_time_budget=5.0)
+        for section in result['results']:
+            assert not section['generation_log']['solver_stats']['optimizer']['stopped_on_time']
+            assert section['generation_log']['problem_hash']
+
+    def test_runs_cut_short_by_a_time_budget_are_not_hashed(self):
+        result = self.generate(optimize_iterations=200, optimize_time_budget=0.0)
+        for section in result['results']:
+            assert section['generation_log']['solver_stats']['optimizer']['stopped_on_time']
+            assert section['generation_log']['problem_hash'] is None
+
+
+class SlowStartExecutor(ThreadPoolExecutor):
+    """Stands in for the portfolio's ProcessPoolExecutor with workers that take a while to come up."""
+
+    def __init__(self, max_workers, mp_context, initializer, initargs):
+        def slow_initializer(*args):
+            time_module.sleep(0.2)
+            initializer(*args)
+        super().__init__(max_workers=max_workers, initializer=slow_initializer, initargs=initargs)
+
+
+class TestPortfolio:
+    def test_zero_time_budget_waits_for_the_first_parallel_attempt(self, monkeypatch):
+        # No attempt has started when the budget runs out, so all of them could be cancelled
+        monkeypatch.setattr(atl, 'ProcessPoolExecutor', SlowStartExecutor)
+        monkeypatch.setattr(atl, '_portfolio_stop_event', None)
+        institution = synthetic_institution(sections_per_department=1)
+        section_id = institution['sections'][0]['section_id']
+        generator = InMemoryTimetableGenerator(institution)
+        result = generator.generate_timetable_portfolio(section_id, attempts=4, time_budget=0, max_workers=2)
+
+        assert "error" not in result, result["error"]
+        assert result['portfolio']['workers'] == 2
+        assert result['portfolio']['finished'] >= 1 and result['portfolio']['failed'] == 0
+        assert generator.current_entries() and hard_conflicts(generator.current_entries()) == []
@@ -0,0 +1,8 @@
+"""
+Entry point for a production WSGI server, e.g. `gunicorn wsgi:app`. Each worker
+process that imports this module starts its own generation job workers, so do not
+preload the app in a master process (no gunicorn --preload).
+"""
+from app import app, generation_job_queue
+
+generation_job_queue.ensure_started()